@@ -16,6 +16,9 @@
 
 import streamlit as st
 
+from st_fuzzy_match_cache import get_matches
+from utils.utils import get_fingerprint
+
 # SET PAGE CONFIG
 st.set_page_config(
     page_title="Streamlit fuzzy match",
@@ -29,6 +32,44 @@ st.set_page_config(
 # Ref: https://discuss.streamlit.io/t/multi-page-apps-with-widget-state-preservation-the-simple-way/22303/2?       # noqa: E501
 st.session_state.update(st.session_state)
 
+# FIND MATCHES
+# NB: Results are cached, so rerunning the page, or returning to it with the same
+# datasets and options, doesn't match again
+if 'match_column_count' not in st.session_state:
+    st.switch_page("st_fuzzy_match_setup.py")
+
+df_left = st.session_state['df_left']
+df_right = st.session_state['df_right']
+
+match_columns = [
+    (
+        st.session_state["selectbox_match_column_df_left_" + str(i)],
+        st.session_state["selectbox_match_column_df_right_" + str(i)],
+        st.session_state["selectbox_match_type_" + str(i)].lower(),
+    )
+    for i in range(st.session_state['match_column_count'])
+]
+
+df_matches = get_matches(
+    df_left,
+    df_right,
+    get_fingerprint(df_left, [column_left for column_left, _, _ in match_columns]),
+    get_fingerprint(df_right, [column_right for _, column_right, _ in match_columns]),
+    match_columns,
+    score_cutoff=st.session_state['slider_score_cutoff'],
+    limit=int(st.session_state['number_input_match_limit']),
+    clean_strings=st.session_state['checkbox_clean_strings'],
+    require_unique_matches=st.session_state['checkbox_require_unique_matches'],
+    auto_accept_100_pct_matches=st.session_state['checkbox_auto_accept_100_pct_matches'],
+)
+
+# DISPLAY MATCHES
+st.metric(
+    "Matches found",
+    df_matches.shape[0],
+)
+st.dataframe(df_matches)
+
 # SET UP PAGE NAVIGATION
 if st.button("Back", type="secondary"):
     st.switch_page("st_fuzzy_match_setup.py")
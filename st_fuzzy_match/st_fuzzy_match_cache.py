@@ -0,0 +1,140 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+    Purpose
+        Cached matching for the Streamlit fuzzy matching app
+    Inputs
+        None
+    Outputs
+        None
+    Parameters
+        - CACHE_TTL: The number of seconds cached results are kept for
+        - CACHE_MAX_ENTRIES: The number of cached results kept
+        - MATCH_SCORE_CUTOFF_FLOOR, MATCH_LIMIT_CEILING: The loosest score cutoff
+        and largest match limit the shared MatchCache finds matches with
+    Notes
+        - Results are cached using st.cache_data, keyed by fingerprints of the
+        match columns of df_left and df_right rather than by the dataframes
+        themselves, along with the match options
+        - A MatchCache shared between sessions using st.cache_resource serves
+        changes to score cutoff and match limit without matching again, where
+        matching on a single fuzzy column without auto-accepting 100% matches
+        - Both caches are bounded by CACHE_TTL and their number of entries, so
+        memory use on a shared server is bounded
+'''
+
+import threading
+from typing import Hashable
+
+import pandas as pd
+import streamlit as st
+
+from utils.utils import MatchCache, assign_unique, fuzzy_match, fuzzy_match_compound
+
+CACHE_TTL = 60 * 60
+CACHE_MAX_ENTRIES = 32
+MATCH_SCORE_CUTOFF_FLOOR = 50
+MATCH_LIMIT_CEILING = 10
+
+
+# Define function to get the MatchCache shared between sessions
+@st.cache_resource(ttl=CACHE_TTL)
+def get_match_cache() -> tuple[MatchCache, threading.Lock]:
+    '''
+        Get the MatchCache shared between sessions, and a lock guarding it.
+
+            Returns:
+                - match_cache: The MatchCache
+                - lock: A lock to hold while using match_cache, as sessions run
+                in separate threads
+    '''
+    return (
+        MatchCache(
+            score_cutoff=MATCH_SCORE_CUTOFF_FLOOR,
+            limit=MATCH_LIMIT_CEILING,
+            max_entries=CACHE_MAX_ENTRIES,
+        ),
+        threading.Lock(),
+    )
+
+
+# Define function to find matches, caching results
+@st.cache_data(ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, show_spinner="Finding matches")
+def get_matches(
+    _df_left: pd.DataFrame,
+    _df_right: pd.DataFrame,
+    fingerprint_left: str,
+    fingerprint_right: str,
+    match_columns: list[tuple[Hashable, Hashable, str]],
+    score_cutoff: int,
+    limit: int,
+    clean_strings: bool,
+    require_unique_matches: bool,
+    auto_accept_100_pct_matches: bool,
+) -> pd.DataFrame:
+    '''
+        Find matches using the options from the setup page.
+
+            Parameters:
+                - _df_left, _df_right: The left and right datasets. These
+                aren't hashed by st.cache_data
+                - fingerprint_left, fingerprint_right: Fingerprints of the
+                match columns of _df_left and _df_right, as returned by
+                get_fingerprint(), which stand in for them in the cache key
+                - match_columns: A list of (column_left, column_right,
+                match_type) tuples, where match_type is "exact", "date" or
+                "fuzzy"
+                - score_cutoff, limit, clean_strings: See fuzzy_match()
+                - require_unique_matches: Whether each row of either dataset
+                can only be matched once. See assign_unique()
+                - auto_accept_100_pct_matches: Whether to resolve rows with
+                enough identical matches without fuzzy matching. See
+                fuzzy_match()
+
+            Returns:
+                - df_matches: A dataframe of matches. See fuzzy_match()
+    '''
+    if len(match_columns) == 1 and match_columns[0][2] == 'fuzzy':
+        column_left, column_right, _ = match_columns[0]
+
+        # NB: MatchCache doesn't support exact_first, as which rows are resolved by
+        # identical matches depends on limit
+        if auto_accept_100_pct_matches:
+            df_matches = fuzzy_match(
+                _df_left,
+                _df_right,
+                column_left,
+                column_right,
+                score_cutoff=score_cutoff,
+                limit=limit,
+                clean_strings=clean_strings,
+                exact_first=True,
+            )
+        else:
+            match_cache, lock = get_match_cache()
+
+            with lock:
+                df_matches = match_cache.fuzzy_match(
+                    _df_left,
+                    _df_right,
+                    column_left,
+                    column_right,
+                    score_cutoff=score_cutoff,
+                    limit=limit,
+                    clean_strings=clean_strings,
+                )
+    else:
+        df_matches = fuzzy_match_compound(
+            _df_left,
+            _df_right,
+            match_columns,
+            score_cutoff=score_cutoff,
+            limit=limit,
+            clean_strings=clean_strings,
+        )
+
+    if require_unique_matches:
+        df_matches = assign_unique(df_matches)
+
+    return df_matches
@@ -178,6 +178,10 @@ with st.expander("Advanced options"):
         "Auto-accept 100% matches",
         value=False,
         key="checkbox_auto_accept_100_pct_matches",
+        help="""
+            If checked, records with enough identical matches in the right dataset
+            (after any cleaning) are matched to these without fuzzy matching
+        """,
     )
 
     # Clean strings
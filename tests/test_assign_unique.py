@@ -0,0 +1,163 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+from utils.utils import assign_unique, fuzzy_match
+
+
+def test_greedy():
+    '''
+        Test matches from fuzzy_match() where rows of df_right are matched to
+        several rows of df_left, method='greedy'
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['five', 'fives', 'four', 'six'],
+        'col_b': [1, 2, 3, 4]
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['five', 'four', 'fivess'],
+        'col_b': ['a', 'b', 'c']
+    })
+
+    # Use function
+    df_matches = assign_unique(
+        fuzzy_match(
+            df_left,
+            df_right,
+            'col_a',
+            'col_a',
+            score_cutoff=70,
+            limit=None
+        )
+    )
+
+    # Add expected output
+    df_expected = pd.DataFrame(
+        index=pd.MultiIndex.from_arrays(
+            [
+                [0, 1, 2],
+                [0, 2, 1],
+            ],
+            names=['df_left_id', 'df_right_id']
+        ),
+        data={
+            'match_string': ['five', 'fivess', 'four'],
+            'match_score': [100.000000, 90.909091, 100.000000],
+        }
+    )
+
+    # Test output
+    pdt.assert_frame_equal(df_matches, df_expected)
+
+    return
+
+
+def test_drop_na_false():
+    '''
+        Test matches from fuzzy_match() where rows of df_right are matched to
+        several rows of df_left, drop_na=False
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['five', 'fives', 'six'],
+        'col_b': [1, 2, 3]
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['five', 'four'],
+        'col_b': ['a', 'b']
+    })
+
+    # Use function
+    df_matches = assign_unique(
+        fuzzy_match(
+            df_left,
+            df_right,
+            'col_a',
+            'col_a',
+            score_cutoff=70,
+            limit=None,
+            drop_na=False
+        ),
+        drop_na=False
+    )
+
+    # Add expected output
+    df_expected = pd.DataFrame(
+        index=pd.MultiIndex.from_arrays(
+            [
+                [0, 1, 2],
+                [0.0, np.NaN, np.NaN],
+            ],
+            names=['df_left_id', 'df_right_id']
+        ),
+        data={
+            'match_string': ['five', np.NaN, np.NaN],
+            'match_score': [100.000000, np.NaN, np.NaN],
+        }
+    )
+
+    # Test output
+    pdt.assert_frame_equal(df_matches, df_expected)
+
+    return
+
+
+def test_optimal():
+    '''
+        Test matches where greedy assignment doesn't give the largest total
+        score, method='optimal'
+    '''
+
+    # Create dataframe
+    df_matches = pd.DataFrame(
+        index=pd.MultiIndex.from_arrays(
+            [
+                [0, 0, 1, 2],
+                [0, 1, 0, 2],
+            ],
+            names=['df_left_id', 'df_right_id']
+        ),
+        data={
+            'match_score': [100.0, 95.0, 96.0, 90.0],
+        }
+    )
+
+    # Use function
+    df_greedy = assign_unique(df_matches, method='greedy')
+    df_optimal = assign_unique(df_matches, method='optimal')
+
+    # Test output
+    pdt.assert_frame_equal(df_greedy, df_matches.iloc[[0, 3]])
+    pdt.assert_frame_equal(df_optimal, df_matches.iloc[[1, 2, 3]])
+
+    return
+
+
+def test_method_invalid():
+    '''
+        Test invalid value for method
+    '''
+
+    # Create dataframe
+    df_matches = pd.DataFrame(
+        index=pd.MultiIndex.from_arrays(
+            [[0], [0]],
+            names=['df_left_id', 'df_right_id']
+        ),
+        data={
+            'match_score': [100.0],
+        }
+    )
+
+    # Use function
+    with pytest.raises(ValueError):
+        assign_unique(df_matches, method='invalid')
+
+    return
@@ -0,0 +1,509 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+from rapidfuzz import fuzz
+
+from utils.utils import FuzzyIndex, fuzzy_match, fuzzy_merge
+
+
+def test_query():
+    '''
+        Test query() against a non-empty, non-MultiIndex df_right,
+        where matches exist
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two', 'three', 'four', 'five'],
+        'col_b': [1, 2, 3, 4, 5]
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'three', 'fours', 'five', 'five'],
+        'col_b': ['a', 'b', 'c', 'd', 'e', 'f']
+    })
+
+    # Use function
+    index = FuzzyIndex(df_right, 'col_a')
+    df_matches = index.query(
+        df_left,
+        'col_a',
+        score_cutoff=80,
+        limit=2
+    )
+
+    # Add expected output
+    df_expected = pd.DataFrame(
+        index=pd.MultiIndex.from_arrays(
+            [
+                [0, 2, 3, 4, 4],
+                [0, 2, 3, 4, 5],
+            ],
+            names=['df_left_id', 'df_right_id']
+        ),
+        data={
+            'match_string': ['one', 'three', 'fours', 'five', 'five'],
+            'match_score': pd.to_numeric(
+                [100.000000, 100.000000, 88.888889, 100.000000, 100.000000]
+            )
+        }
+    )
+
+    # Test output
+    pdt.assert_frame_equal(df_matches, df_expected)
+
+    return
+
+
+def test_query_scorer_and_blocking():
+    '''
+        Test query() uses the scorer and blocking the index was built with
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two', 'three', 'four', 'five'],
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'three', 'fours', 'five', 'five'],
+    })
+
+    # Use function
+    index = FuzzyIndex(df_right, 'col_a', scorer=fuzz.ratio, blocking='qgram')
+    df_matches = index.query(df_left, 'col_a', score_cutoff=60, limit=2)
+
+    # Add expected output
+    df_expected = fuzzy_match(
+        df_left,
+        df_right,
+        'col_a',
+        'col_a',
+        score_cutoff=60,
+        limit=2,
+        scorer=fuzz.ratio
+    )
+
+    # Test output
+    pdt.assert_frame_equal(df_matches, df_expected)
+    assert df_matches.attrs['stats']['pairs_pruned'] > 0
+
+    return
+
+
+def test_fuzzy_match_and_fuzzy_merge():
+    '''
+        Test fuzzy_match() and fuzzy_merge() given an index in place of df_right
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two', 'three', 'four', 'five'],
+        'col_b': [1, 2, 3, 4, 5]
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['One', 'too', 'three', 'fours', 'five', 'five'],
+        'col_b': ['a', 'b', 'c', 'd', 'e', 'f']
+    })
+
+    # Use function
+    # NB: The index's clean_strings is used in place of that passed
+    index = FuzzyIndex(df_right, 'col_a', clean_strings=True)
+
+    # Test output
+    pdt.assert_frame_equal(
+        fuzzy_match(df_left, index, 'col_a', 'col_a', limit=2, clean_strings=False),
+        fuzzy_match(df_left, df_right, 'col_a', 'col_a', limit=2),
+    )
+    pdt.assert_frame_equal(
+        fuzzy_merge(df_left, index, 'col_a', 'col_a', limit=2),
+        fuzzy_merge(df_left, df_right, 'col_a', 'col_a', limit=2),
+    )
+
+    return
+
+
+def test_column_not_in_df():
+    '''
+        Test column_right not in df_right
+    '''
+
+    # Create dataframe
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'three', 'fours', 'five', 'five'],
+    })
+
+    # Use function
+    with pytest.raises(KeyError):
+        FuzzyIndex(df_right, 'col_b')
+
+    return
+
+
+def test_blocking_invalid():
+    '''
+        Test invalid value for blocking
+    '''
+
+    # Create dataframe
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'three', 'fours', 'five', 'five'],
+    })
+
+    # Use function
+    with pytest.raises(ValueError):
+        FuzzyIndex(df_right, 'col_a', blocking='invalid')
+
+    return
+
+
+def test_blocking_length():
+    '''
+        Test blocking='length' doesn't build a q-gram index
+    '''
+
+    # Create dataframe
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'three', 'fours', 'five', 'five'],
+    })
+
+    # Use function
+    index = FuzzyIndex(df_right, 'col_a', blocking='length')
+
+    # Test output
+    assert index._qgram_indexes == {}
+
+    return
+
+
+def test_add():
+    '''
+        Test add() gives the same matches as building the index from all rows
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two', 'three', 'four', 'five'],
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'three', 'fours', 'five', 'five'],
+    })
+
+    # Use function
+    index = FuzzyIndex(df_right.iloc[:3], 'col_a', blocking='qgram')
+    index.add(df_right.iloc[3:])
+    df_matches = index.query(df_left, 'col_a', score_cutoff=60, limit=2)
+
+    # Test output
+    pdt.assert_frame_equal(
+        df_matches,
+        fuzzy_match(df_left, df_right, 'col_a', 'col_a', score_cutoff=60, limit=2)
+    )
+    assert len(index) == 6
+
+    return
+
+
+def test_add_existing_id():
+    '''
+        Test add() with rows already in the index
+    '''
+
+    # Create dataframe
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'three', 'fours', 'five', 'five'],
+    })
+
+    # Use function
+    index = FuzzyIndex(df_right, 'col_a')
+    with pytest.raises(ValueError):
+        index.add(df_right.iloc[[0]])
+
+    return
+
+
+def test_remove():
+    '''
+        Test remove() gives the same matches as building the index from the
+        rows left
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two', 'three', 'four', 'five'],
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'three', 'fours', 'five', 'five'],
+    })
+
+    # Use function
+    index = FuzzyIndex(df_right, 'col_a', blocking='qgram')
+    index.remove([0, 4])
+    df_matches = index.query(df_left, 'col_a', score_cutoff=60, limit=2)
+
+    # Add expected output
+    df_expected = pd.DataFrame(
+        index=pd.MultiIndex.from_arrays(
+            [
+                [1, 2, 3, 4],
+                [1, 2, 3, 5],
+            ],
+            names=['df_left_id', 'df_right_id']
+        ),
+        data={
+            'match_string': ['too', 'three', 'fours', 'five'],
+            'match_score': [66.666667, 100.000000, 88.888889, 100.000000]
+        }
+    )
+
+    # Test output
+    pdt.assert_frame_equal(df_matches, df_expected)
+    assert len(index) == 4
+
+    return
+
+
+def test_remove_first_row():
+    '''
+        Test remove() of the first row of a value with other rows keeps ties
+        ordered by position in df_right
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['abc'],
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['abcx', 'zzz', 'abcy', 'abcx'],
+    })
+
+    # Use function
+    index = FuzzyIndex(df_right, 'col_a', scorer=fuzz.ratio)
+    index.remove([0])
+    df_matches = index.query(df_left, 'col_a', score_cutoff=50)
+
+    # Add expected output
+    df_expected = pd.DataFrame(
+        index=pd.MultiIndex.from_arrays(
+            [
+                [0],
+                [2],
+            ],
+            names=['df_left_id', 'df_right_id']
+        ),
+        data={
+            'match_string': ['abcy'],
+            'match_score': [85.714286]
+        }
+    )
+
+    # Test output
+    pdt.assert_frame_equal(df_matches, df_expected)
+
+    return
+
+
+def test_remove_missing_id():
+    '''
+        Test remove() with an index value not in the index
+    '''
+
+    # Create dataframe
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'three', 'fours', 'five', 'five'],
+    })
+
+    # Use function
+    index = FuzzyIndex(df_right, 'col_a')
+    index.remove([0])
+    with pytest.raises(KeyError):
+        index.remove([0])
+
+    return
+
+
+def test_update():
+    '''
+        Test update() replaces the values of rows
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two', 'three', 'four', 'five'],
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'three', 'fours', 'five', 'five'],
+    })
+
+    # Use function
+    index = FuzzyIndex(df_right, 'col_a')
+    index.update(pd.DataFrame({'col_a': ['two', 'four']}, index=[1, 3]))
+    df_matches = index.query(df_left, 'col_a', score_cutoff=100)
+
+    # Add expected output
+    df_expected = pd.DataFrame(
+        index=pd.MultiIndex.from_arrays(
+            [
+                [0, 1, 2, 3, 4],
+                [0, 1, 2, 3, 4],
+            ],
+            names=['df_left_id', 'df_right_id']
+        ),
+        data={
+            'match_string': ['one', 'two', 'three', 'four', 'five'],
+            'match_score': [100.0, 100.0, 100.0, 100.0, 100.0]
+        }
+    )
+
+    # Test output
+    pdt.assert_frame_equal(df_matches, df_expected)
+
+    return
+
+
+def test_remove_and_update_missing_values():
+    '''
+        Test remove() and update() on an index where all values are missing
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two'],
+    })
+    df_right = pd.DataFrame({
+        'col_a': [None, np.nan, None],
+    })
+
+    # Use function
+    index = FuzzyIndex(df_right, 'col_a')
+    index.remove([0])
+    index.update(pd.DataFrame({'col_a': [np.nan]}, index=[1]))
+    df_matches = index.query(df_left, 'col_a', score_cutoff=80)
+
+    # Test output
+    assert len(df_matches) == 0
+    assert len(index) == 2
+
+    return
+
+
+def test_save_and_load(tmp_path):
+    '''
+        Test an index opened with load() gives the same matches as the index
+        saved
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two', 'three', 'four', 'five'],
+        'col_b': [1, 2, 3, 4, 5]
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'three', 'fours', 'five', 'five'],
+        'col_b': ['a', 'b', 'c', 'd', 'e', 'f']
+    })
+
+    # Use function
+    index = FuzzyIndex(df_right, 'col_a', scorer=fuzz.ratio, blocking='qgram')
+    index.remove([0])
+    index.save(tmp_path)
+    index_loaded = FuzzyIndex.load(tmp_path)
+
+    # Test output
+    pdt.assert_frame_equal(
+        index_loaded.query(df_left, 'col_a', score_cutoff=60, limit=2),
+        index.query(df_left, 'col_a', score_cutoff=60, limit=2),
+        check_index_type=False
+    )
+    pdt.assert_frame_equal(
+        fuzzy_merge(df_left, index_loaded, 'col_a', 'col_a', limit=2),
+        fuzzy_merge(df_left, index, 'col_a', 'col_a', limit=2),
+        check_index_type=False
+    )
+    assert len(index_loaded) == 5
+
+    return
+
+
+def test_save_and_load_tz_aware_ids(tmp_path):
+    '''
+        Test save() and load() with a tz-aware datetime index
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two', 'three'],
+    })
+    df_right = pd.DataFrame(
+        index=pd.date_range('2024-01-01', periods=3, tz='UTC'),
+        data={
+            'col_a': ['one', 'too', 'three'],
+        }
+    )
+
+    # Use function
+    index = FuzzyIndex(df_right, 'col_a')
+    index.save(tmp_path)
+    index_loaded = FuzzyIndex.load(tmp_path)
+
+    # Test output
+    pdt.assert_index_equal(index_loaded.ids, index.ids)
+    pdt.assert_frame_equal(
+        index_loaded.query(df_left, 'col_a', score_cutoff=60),
+        index.query(df_left, 'col_a', score_cutoff=60)
+    )
+
+    return
+
+
+def test_load_version_mismatch(tmp_path):
+    '''
+        Test load() with an index saved in a different format version
+    '''
+
+    # Create dataframe
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'three', 'fours', 'five', 'five'],
+    })
+
+    # Use function
+    FuzzyIndex(df_right, 'col_a').save(tmp_path)
+
+    with open(os.path.join(tmp_path, 'manifest.json')) as f:
+        manifest = json.load(f)
+    manifest['version'] = 0
+    with open(os.path.join(tmp_path, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f)
+
+    with pytest.raises(ValueError):
+        FuzzyIndex.load(tmp_path)
+
+    return
+
+
+def test_load_checksum_mismatch(tmp_path):
+    '''
+        Test load() with a file changed since the index was saved
+    '''
+
+    # Create dataframe
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'three', 'fours', 'five', 'five'],
+    })
+
+    # Use function
+    FuzzyIndex(df_right, 'col_a').save(tmp_path)
+
+    with open(os.path.join(tmp_path, 'codes.npy'), 'r+b') as f:
+        f.seek(-1, os.SEEK_END)
+        f.write(b'\x01')
+
+    with pytest.raises(ValueError):
+        FuzzyIndex.load(tmp_path)
+
+    return
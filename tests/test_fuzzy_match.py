@@ -1,10 +1,13 @@
 # !/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import pandas as pd
 import pandas.testing as pdt
 import pytest
+from rapidfuzz import fuzz
 
 from utils.utils import fuzzy_match
 
@@ -700,3 +703,821 @@ def test_drop_na_false():
     pdt.assert_frame_equal(df_matches, df_expected)
 
     return
+
+
+def test_drop_na_false_empty_df_right():
+    '''
+        Test non-empty df_left, empty df_right, drop_na=False
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two'],
+        'col_b': [1, 2]
+    })
+    df_right = pd.DataFrame(columns=['col_a', 'col_b'])
+
+    # Use function
+    df_matches = fuzzy_match(
+        df_left,
+        df_right,
+        'col_a',
+        'col_a',
+        score_cutoff=80,
+        drop_na=False
+    )
+
+    # Add expected output
+    df_expected = pd.DataFrame(
+        index=pd.MultiIndex.from_arrays(
+            [
+                [0, 1],
+                [np.NaN, np.NaN],
+            ],
+            names=['df_left_id', 'df_right_id']
+        ),
+        data={
+            'match_string': [np.NaN, np.NaN],
+            'match_score': [np.NaN, np.NaN]
+        }
+    )
+
+    # Test output
+    pdt.assert_frame_equal(df_matches, df_expected, check_dtype=False, check_index_type=False)
+
+    return
+
+
+def test_engine_cdist():
+    '''
+        Test non-empty, non-MultiIndex df_left, non-empty, non-MultiIndex df_right,
+        where matches exist, engine='cdist'
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two', 'three', 'four', 'five'],
+        'col_b': [1, 2, 3, 4, 5]
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'three', 'fours', 'five', 'five'],
+        'col_b': ['a', 'b', 'c', 'd', 'e', 'f']
+    })
+
+    # Use function
+    df_matches = fuzzy_match(
+        df_left,
+        df_right,
+        'col_a',
+        'col_a',
+        score_cutoff=60,
+        limit=2,
+        engine='cdist',
+        chunk_size=2
+    )
+
+    # Add expected output
+    df_expected = pd.DataFrame(
+        index=pd.MultiIndex.from_arrays(
+            [
+                [0, 1, 2, 3, 4, 4],
+                [0, 1, 2, 3, 4, 5],
+            ],
+            names=['df_left_id', 'df_right_id']
+        ),
+        data={
+            'match_string': ['one', 'too', 'three', 'fours', 'five', 'five'],
+            'match_score': [100.000000, 66.666667, 100.000000, 88.888889, 100.000000, 100.000000],
+        }
+    )
+
+    # Test output
+    pdt.assert_frame_equal(df_matches, df_expected)
+
+    return
+
+
+def test_engine_cdist_same_as_extract():
+    '''
+        Test MultiIndex df_left, MultiIndex df_right, where matches exist,
+        df_left and df_right contain pd.NA, np.nan and None, engine='cdist'
+        gives the same output as engine='extract'
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame(
+        index=pd.MultiIndex.from_arrays(
+            [
+                ['a', 'a', 'b', 'b', 'c', 'c', 'd'],
+                [1, 2, 1, 2, 1, 2, 1],
+            ]
+        ),
+        data={
+            'col_a': ['one', pd.NA, 'Three!', 'four', None, 'five', 'fiver'],
+            'col_b': [1, 2, 3, 4, 5, 6, 7]
+        }
+    )
+    df_right = pd.DataFrame(
+        index=pd.MultiIndex.from_arrays(
+            [
+                ['x', 'x', 'y', 'y', 'z', 'z'],
+                [1, 2, 1, 2, 1, 2],
+            ]
+        ),
+        data={
+            'col_a': ['one', np.NaN, 'three', 'fours', 'five', 'five'],
+            'col_b': ['a', 'b', 'c', 'd', 'e', 'f']
+        }
+    )
+
+    # Test output
+    for limit in [1, 2, 10]:
+        for clean_strings in [True, False]:
+            pdt.assert_frame_equal(
+                fuzzy_match(
+                    df_left,
+                    df_right,
+                    'col_a',
+                    'col_a',
+                    score_cutoff=50,
+                    limit=limit,
+                    clean_strings=clean_strings,
+                    drop_na=False,
+                    engine='cdist',
+                    chunk_size=3
+                ),
+                fuzzy_match(
+                    df_left,
+                    df_right,
+                    'col_a',
+                    'col_a',
+                    score_cutoff=50,
+                    limit=limit,
+                    clean_strings=clean_strings,
+                    drop_na=False
+                )
+            )
+
+    return
+
+
+def test_engine_invalid():
+    '''
+        Test non-empty, non-MultiIndex df_left, non-empty, non-MultiIndex df_right,
+        engine='invalid'
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two', 'three', 'four', 'five'],
+        'col_b': [1, 2, 3, 4, 5]
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'three', 'fours', 'five', 'five'],
+        'col_b': ['a', 'b', 'c', 'd', 'e', 'f']
+    })
+
+    # Use function
+    with pytest.raises(ValueError):
+        fuzzy_match(
+            df_left,
+            df_right,
+            'col_a',
+            'col_a',
+            score_cutoff=60,
+            limit=2,
+            engine='invalid'
+        )
+
+    return
+
+
+def test_clean_strings_match_string_not_cleaned():
+    '''
+        Test non-empty, non-MultiIndex df_left, non-empty, non-MultiIndex df_right
+        featuring punctuation and capitals, where matches exist, match_string is
+        the value from df_right before cleaning
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two', 'three'],
+        'col_b': [1, 2, 3]
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['One!', 'TOO', ' three '],
+        'col_b': ['a', 'b', 'c']
+    })
+
+    # Use function
+    df_matches = fuzzy_match(
+        df_left,
+        df_right,
+        'col_a',
+        'col_a',
+        score_cutoff=60,
+        limit=1
+    )
+
+    # Add expected output
+    df_expected = pd.DataFrame(
+        index=pd.MultiIndex.from_arrays(
+            [
+                [0, 1, 2],
+                [0, 1, 2],
+            ],
+            names=['df_left_id', 'df_right_id']
+        ),
+        data={
+            'match_string': ['One!', 'TOO', ' three '],
+            'match_score': [100.000000, 66.666667, 100.000000],
+        }
+    )
+
+    # Test output
+    pdt.assert_frame_equal(df_matches, df_expected)
+
+    return
+
+
+def test_n_jobs():
+    '''
+        Test non-empty, non-MultiIndex df_left, non-empty, MultiIndex df_right,
+        where matches exist, n_jobs=2 and executor given give the same output
+        as n_jobs=1
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two', None, 'three', 'four', 'five', 'fiver'],
+        'col_b': [1, 2, 3, 4, 5, 6, 7]
+    })
+    df_right = pd.DataFrame(
+        index=pd.MultiIndex.from_arrays(
+            [
+                ['x', 'x', 'y', 'y', 'z', 'z'],
+                [1, 2, 1, 2, 1, 2],
+            ]
+        ),
+        data={
+            'col_a': ['one', 'too', np.NaN, 'fours', 'five', 'Five'],
+            'col_b': ['a', 'b', 'c', 'd', 'e', 'f']
+        }
+    )
+
+    # Use function
+    df_expected = fuzzy_match(
+        df_left,
+        df_right,
+        'col_a',
+        'col_a',
+        score_cutoff=60,
+        limit=2
+    )
+
+    # Test output
+    for engine in ['extract', 'cdist']:
+        pdt.assert_frame_equal(
+            fuzzy_match(
+                df_left,
+                df_right,
+                'col_a',
+                'col_a',
+                score_cutoff=60,
+                limit=2,
+                engine=engine,
+                n_jobs=2
+            ),
+            df_expected
+        )
+
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            pdt.assert_frame_equal(
+                fuzzy_match(
+                    df_left,
+                    df_right,
+                    'col_a',
+                    'col_a',
+                    score_cutoff=60,
+                    limit=2,
+                    engine=engine,
+                    n_jobs=3,
+                    executor=executor
+                ),
+                df_expected
+            )
+
+    return
+
+
+def test_blocking_qgram():
+    '''
+        Test non-empty, non-MultiIndex df_left, non-empty, non-MultiIndex df_right,
+        where matches exist, blocking='qgram', scorer=fuzz.ratio
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two', 'three', 'four', 'five', None],
+        'col_b': [1, 2, 3, 4, 5, 6]
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'three', 'fours', 'five', 'five', 'xyz'],
+        'col_b': ['a', 'b', 'c', 'd', 'e', 'f', 'g']
+    })
+
+    # Use function
+    df_matches = fuzzy_match(
+        df_left,
+        df_right,
+        'col_a',
+        'col_a',
+        score_cutoff=80,
+        limit=2,
+        scorer=fuzz.ratio,
+        blocking='qgram'
+    )
+
+    # Add expected output
+    df_expected = pd.DataFrame(
+        index=pd.MultiIndex.from_arrays(
+            [
+                [0, 2, 3, 4, 4],
+                [0, 2, 3, 4, 5],
+            ],
+            names=['df_left_id', 'df_right_id']
+        ),
+        data={
+            'match_string': ['one', 'three', 'fours', 'five', 'five'],
+            'match_score': [100.000000, 100.000000, 88.888889, 100.000000, 100.000000],
+        }
+    )
+
+    # Test output
+    pdt.assert_frame_equal(df_matches, df_expected)
+    assert df_matches.attrs['stats']['pairs_total'] == 35
+    assert df_matches.attrs['stats']['pairs_pruned'] > 0
+    assert (
+        df_matches.attrs['stats']['pairs_scored'] + df_matches.attrs['stats']['pairs_pruned']
+        == df_matches.attrs['stats']['pairs_total']
+    )
+
+    return
+
+
+def test_blocking_length():
+    '''
+        Test non-empty, non-MultiIndex df_left, non-empty, non-MultiIndex df_right,
+        where matches exist, blocking='length', scorer=fuzz.ratio
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two', 'three', 'four', 'five', None],
+        'col_b': [1, 2, 3, 4, 5, 6]
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'three', 'fours', 'five', 'five', 'xyzxyzxyz'],
+        'col_b': ['a', 'b', 'c', 'd', 'e', 'f', 'g']
+    })
+
+    # Use function
+    df_matches = fuzzy_match(
+        df_left,
+        df_right,
+        'col_a',
+        'col_a',
+        score_cutoff=80,
+        limit=2,
+        scorer=fuzz.ratio,
+        blocking='length'
+    )
+
+    # Add expected output
+    df_expected = pd.DataFrame(
+        index=pd.MultiIndex.from_arrays(
+            [
+                [0, 2, 3, 4, 4],
+                [0, 2, 3, 4, 5],
+            ],
+            names=['df_left_id', 'df_right_id']
+        ),
+        data={
+            'match_string': ['one', 'three', 'fours', 'five', 'five'],
+            'match_score': [100.000000, 100.000000, 88.888889, 100.000000, 100.000000],
+        }
+    )
+
+    # Test output
+    pdt.assert_frame_equal(df_matches, df_expected)
+    assert df_matches.attrs['stats']['pairs_pruned'] > 0
+
+    return
+
+
+def test_blocking_length_unbounded_scorer():
+    '''
+        Test blocking='length' with a scorer with no known bound on edit
+        distance gives the same matches as no blocking
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two', 'three', 'four', 'five'],
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['one two three', 'too', 'three', 'fours', 'five', 'five'],
+    })
+
+    # Use function
+    df_matches = fuzzy_match(
+        df_left,
+        df_right,
+        'col_a',
+        'col_a',
+        score_cutoff=80,
+        limit=2,
+        blocking='length'
+    )
+
+    # Test output
+    pdt.assert_frame_equal(
+        df_matches,
+        fuzzy_match(df_left, df_right, 'col_a', 'col_a', score_cutoff=80, limit=2)
+    )
+
+    return
+
+
+def test_blocking_invalid():
+    '''
+        Test non-empty, non-MultiIndex df_left, non-empty, non-MultiIndex df_right,
+        blocking='invalid'
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two', 'three', 'four', 'five'],
+        'col_b': [1, 2, 3, 4, 5]
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'three', 'fours', 'five', 'five'],
+        'col_b': ['a', 'b', 'c', 'd', 'e', 'f']
+    })
+
+    # Use function
+    with pytest.raises(ValueError):
+        fuzzy_match(
+            df_left,
+            df_right,
+            'col_a',
+            'col_a',
+            score_cutoff=60,
+            limit=2,
+            blocking='invalid'
+        )
+
+    return
+
+
+def test_exact_first():
+    '''
+        Test non-empty, non-MultiIndex df_left, non-empty, non-MultiIndex df_right,
+        where exact and fuzzy matches exist, exact_first=True
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two', 'three', 'four', 'five'],
+        'col_b': [1, 2, 3, 4, 5]
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'Three', 'fours', 'five', 'five'],
+        'col_b': ['a', 'b', 'c', 'd', 'e', 'f']
+    })
+
+    # Use function
+    df_matches = fuzzy_match(
+        df_left,
+        df_right,
+        'col_a',
+        'col_a',
+        score_cutoff=60,
+        limit=2,
+        exact_first=True
+    )
+
+    # Add expected output
+    df_expected = pd.DataFrame(
+        index=pd.MultiIndex.from_arrays(
+            [
+                [0, 1, 2, 3, 4, 4],
+                [0, 1, 2, 3, 4, 5],
+            ],
+            names=['df_left_id', 'df_right_id']
+        ),
+        data={
+            'match_string': ['one', 'too', 'Three', 'fours', 'five', 'five'],
+            'match_score': [100.000000, 66.666667, 100.000000, 88.888889, 100.000000, 100.000000],
+        }
+    )
+
+    # Test output
+    # NB: Only 'five' has limit exact matches, so only this skips fuzzy matching
+    pdt.assert_frame_equal(df_matches, df_expected)
+    assert df_matches.attrs['stats']['rows_exact'] == 1
+    assert df_matches.attrs['stats']['pairs_scored'] == 20
+
+    return
+
+
+def test_duplicate_values_df_left():
+    '''
+        Test non-empty, non-MultiIndex df_left featuring duplicate values before
+        and after cleaning, non-empty, non-MultiIndex df_right, where matches exist
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame(
+        index=['v', 'w', 'x', 'y', 'z'],
+        data={
+            'col_a': ['fours', 'five', None, 'Fours!', 'five'],
+            'col_b': [1, 2, 3, 4, 5]
+        }
+    )
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'three', 'four', 'five', 'five'],
+        'col_b': ['a', 'b', 'c', 'd', 'e', 'f']
+    })
+
+    # Use function
+    df_matches = fuzzy_match(
+        df_left,
+        df_right,
+        'col_a',
+        'col_a',
+        score_cutoff=60,
+        limit=2
+    )
+
+    # Add expected output
+    df_expected = pd.DataFrame(
+        index=pd.MultiIndex.from_arrays(
+            [
+                ['v', 'w', 'w', 'y', 'z', 'z'],
+                [3, 4, 5, 3, 4, 5],
+            ],
+            names=['df_left_id', 'df_right_id']
+        ),
+        data={
+            'match_string': ['four', 'five', 'five', 'four', 'five', 'five'],
+            'match_score': [88.888889, 100.000000, 100.000000, 88.888889, 100.000000, 100.000000],
+        }
+    )
+
+    # Test output
+    pdt.assert_frame_equal(df_matches, df_expected)
+    assert df_matches.attrs['stats']['values_distinct'] == 2
+
+    return
+
+
+def test_limit_duplicates_once():
+    '''
+        Test non-empty, non-MultiIndex df_left, non-empty, non-MultiIndex df_right
+        featuring duplicate values, where matches exist, limit_duplicates='once'
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['five', 'fours'],
+        'col_b': [1, 2]
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['five', 'four', 'Five', 'fives', 'five'],
+        'col_b': ['a', 'b', 'c', 'd', 'e']
+    })
+
+    # Use function
+    df_matches = fuzzy_match(
+        df_left,
+        df_right,
+        'col_a',
+        'col_a',
+        score_cutoff=80,
+        limit=2,
+        limit_duplicates='once'
+    )
+
+    # Add expected output
+    df_expected = pd.DataFrame(
+        index=pd.MultiIndex.from_arrays(
+            [
+                [0, 0, 0, 0, 1],
+                [0, 2, 4, 3, 1],
+            ],
+            names=['df_left_id', 'df_right_id']
+        ),
+        data={
+            'match_string': ['five', 'Five', 'five', 'fives', 'four'],
+            'match_score': [100.000000, 100.000000, 100.000000, 88.888889, 88.888889],
+        }
+    )
+
+    # Test output
+    pdt.assert_frame_equal(df_matches, df_expected)
+    assert df_matches.attrs['stats']['choices_distinct'] == 3
+
+    return
+
+
+def test_prefilter():
+    '''
+        Test non-empty, non-MultiIndex df_left, non-empty, non-MultiIndex df_right,
+        where matches exist, prefilter specified
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['five', 'fours', 'seven'],
+        'col_b': [1, 2, 3]
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['five', 'four', 'fives', 'eleven', 'sevens'],
+        'col_b': ['a', 'b', 'c', 'd', 'e']
+    })
+
+    # Use function
+    df_matches = fuzzy_match(
+        df_left,
+        df_right,
+        'col_a',
+        'col_a',
+        score_cutoff=80,
+        limit=2,
+        prefilter=fuzz.ratio,
+        prefilter_cutoff=70,
+        prefilter_sample=3
+    )
+
+    # Add expected output
+    df_expected = fuzzy_match(
+        df_left,
+        df_right,
+        'col_a',
+        'col_a',
+        score_cutoff=80,
+        limit=2,
+    )
+
+    # Test output
+    pdt.assert_frame_equal(df_matches, df_expected)
+    assert df_matches.attrs['stats']['prefilter_survival'] < 1
+    assert df_matches.attrs['stats']['prefilter_recall'] == 1.0
+
+    return
+
+
+def test_prefilter_memory_budget(monkeypatch):
+    '''
+        Test non-empty, non-MultiIndex df_left, non-empty, non-MultiIndex df_right,
+        where matches exist, prefilter specified, where the memory budget for
+        prefilter scores only fits one row of df_left at a time
+    '''
+
+    # Limit prefilter scores to one row of df_left at a time
+    monkeypatch.setattr('utils.utils._CDIST_MEMORY_BUDGET', 5 * 4)
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['five', 'fours', 'seven'],
+        'col_b': [1, 2, 3]
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['five', 'four', 'fives', 'eleven', 'sevens'],
+        'col_b': ['a', 'b', 'c', 'd', 'e']
+    })
+
+    # Use function
+    df_matches = fuzzy_match(
+        df_left,
+        df_right,
+        'col_a',
+        'col_a',
+        score_cutoff=80,
+        limit=2,
+        prefilter=fuzz.ratio,
+        prefilter_cutoff=70
+    )
+
+    # Add expected output
+    df_expected = fuzzy_match(
+        df_left,
+        df_right,
+        'col_a',
+        'col_a',
+        score_cutoff=80,
+        limit=2,
+    )
+
+    # Test output
+    pdt.assert_frame_equal(df_matches, df_expected)
+
+    return
+
+
+def test_prefilter_qgram():
+    '''
+        Test non-empty, non-MultiIndex df_left, non-empty, non-MultiIndex df_right,
+        prefilter specified, blocking='qgram'
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['five', 'fours', 'seven'],
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['five', 'four', 'fives', 'eleven', 'sevens'],
+    })
+
+    # Use function
+    with pytest.raises(ValueError):
+        fuzzy_match(
+            df_left,
+            df_right,
+            'col_a',
+            'col_a',
+            blocking='qgram',
+            prefilter=fuzz.ratio
+        )
+
+    return
+
+
+def test_limit_perfect_scores(monkeypatch):
+    '''
+        Test non-empty, non-MultiIndex df_left, non-empty, non-MultiIndex df_right,
+        where more than limit matches with the optimal score exist, so blocks
+        after they are found aren't scored
+    '''
+
+    # Score choices in blocks of two
+    monkeypatch.setattr('utils.utils._EXTRACT_BLOCK_SIZE', 2)
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one two', 'three four'],
+        'col_b': [1, 2]
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['one twos', 'two one', 'one two', 'four three', 'one  two'],
+        'col_b': ['a', 'b', 'c', 'd', 'e']
+    })
+
+    # Use function
+    df_matches = fuzzy_match(
+        df_left,
+        df_right,
+        'col_a',
+        'col_a',
+        scorer=fuzz.token_sort_ratio,
+        score_cutoff=80,
+        limit=2
+    )
+
+    # Add expected output
+    df_expected = pd.DataFrame(
+        index=pd.MultiIndex.from_arrays(
+            [
+                [0, 0, 1],
+                [1, 2, 3],
+            ],
+            names=['df_left_id', 'df_right_id']
+        ),
+        data={
+            'match_string': ['two one', 'one two', 'four three'],
+            'match_score': [100.000000, 100.000000, 100.000000],
+        }
+    )
+
+    # Test output
+    # NB: 'one two' has two matches with the optimal score in its first two
+    # blocks, so its third block, of one choice, isn't scored
+    pdt.assert_frame_equal(df_matches, df_expected)
+    pdt.assert_frame_equal(
+        df_matches,
+        fuzzy_match(
+            df_left,
+            df_right,
+            'col_a',
+            'col_a',
+            scorer=fuzz.token_sort_ratio,
+            score_cutoff=80,
+            limit=2,
+            engine='cdist'
+        )
+    )
+    assert df_matches.attrs['stats']['pairs_total'] == 10
+    assert df_matches.attrs['stats']['pairs_scored'] == 9
+
+    return
@@ -0,0 +1,241 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+from rapidfuzz.distance import Levenshtein
+
+from utils.utils import fuzzy_match_compound
+
+
+def test_exact_and_fuzzy():
+    '''
+        Test non-empty, non-MultiIndex df_left, non-empty, non-MultiIndex df_right,
+        where matches exist, one exact and one fuzzy column
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['acme ltd', 'acme ltd', 'beta plc'],
+        'col_b': ['AB1', 'CD2', 'AB1']
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['acme limited', 'acme ltd', 'beta plc', 'acme ltd.'],
+        'col_b': ['ab1', 'AB1', 'CD2', 'CD2']
+    })
+
+    # Use function
+    df_matches = fuzzy_match_compound(
+        df_left,
+        df_right,
+        [('col_a', 'col_a', 'fuzzy'), ('col_b', 'col_b', 'exact')],
+        score_cutoff=80,
+        limit=2,
+        drop_na=False
+    )
+
+    # Add expected output
+    df_expected = pd.DataFrame(
+        index=pd.MultiIndex.from_arrays(
+            [
+                [0, 0, 1, 2],
+                [1.0, 0.0, 3.0, np.NaN],
+            ],
+            names=['df_left_id', 'df_right_id']
+        ),
+        data={
+            'match_score': [100.000000, 85.500000, 100.000000, np.NaN],
+        }
+    )
+
+    # Test output
+    pdt.assert_frame_equal(df_matches, df_expected)
+    assert df_matches.attrs['stats']['pairs_scored'] == 6
+
+    return
+
+
+def test_weights():
+    '''
+        Test non-empty, non-MultiIndex df_left, non-empty, non-MultiIndex df_right,
+        where matches exist, two weighted fuzzy columns
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'first': ['jon', 'ann'],
+        'last': ['smith', 'jones']
+    })
+    df_right = pd.DataFrame({
+        'first': ['john', 'jon', 'anne'],
+        'last': ['smith', 'smyth', 'jones']
+    })
+
+    # Use function
+    df_matches = fuzzy_match_compound(
+        df_left,
+        df_right,
+        [('first', 'first', 'fuzzy'), ('last', 'last', 'fuzzy')],
+        score_cutoff=70,
+        limit=2,
+        weights=[1, 3]
+    )
+
+    # Add expected output
+    df_expected = pd.DataFrame(
+        index=pd.MultiIndex.from_arrays(
+            [
+                [0, 0, 1],
+                [0, 1, 2],
+            ],
+            names=['df_left_id', 'df_right_id']
+        ),
+        data={
+            'match_score': [96.428571, 85.000000, 96.428571],
+        }
+    )
+
+    # Test output
+    pdt.assert_frame_equal(df_matches, df_expected)
+
+    return
+
+
+def test_date_tolerance():
+    '''
+        Test non-empty, non-MultiIndex df_left, non-empty, non-MultiIndex df_right,
+        where matches exist, one fuzzy and one date column, df_left contains None
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'name': ['jon smith', 'ann jones', 'bob brown'],
+        'dob': ['1990-01-01', '1985-06-15', None]
+    })
+    df_right = pd.DataFrame({
+        'name': ['john smith', 'jon smith', 'anne jones', 'bob brown'],
+        'dob': ['1990-01-02', '1990-01-05', '1985-06-15', '1970-01-01']
+    })
+
+    # Use function
+    df_matches = fuzzy_match_compound(
+        df_left,
+        df_right,
+        [('name', 'name', 'fuzzy'), ('dob', 'dob', 'date')],
+        score_cutoff=80,
+        limit=2,
+        date_tolerance=3
+    )
+
+    # Add expected output
+    df_expected = pd.DataFrame(
+        index=pd.MultiIndex.from_arrays(
+            [
+                [0, 1],
+                [0, 2],
+            ],
+            names=['df_left_id', 'df_right_id']
+        ),
+        data={
+            'match_score': [84.868421, 97.368421],
+        }
+    )
+
+    # Test output
+    pdt.assert_frame_equal(df_matches, df_expected)
+    assert df_matches.attrs['stats']['pairs_scored'] == 2
+
+    return
+
+
+def test_date_unparseable():
+    '''
+        Test non-empty, non-MultiIndex df_left, non-empty, non-MultiIndex df_right,
+        where matches exist, one fuzzy and one date column, df_left and
+        df_right contain values that aren't dates
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'name': ['jon smith', 'ann jones'],
+        'dob': ['1990-01-01', 'not a date']
+    })
+    df_right = pd.DataFrame({
+        'name': ['jon smith', 'ann jones', 'anne jones'],
+        'dob': ['1990-01-01', 'unknown', '1985-06-15']
+    })
+
+    # Use function
+    df_matches = fuzzy_match_compound(
+        df_left,
+        df_right,
+        [('name', 'name', 'fuzzy'), ('dob', 'dob', 'date')],
+        score_cutoff=80,
+        limit=2
+    )
+
+    # Add expected output
+    df_expected = pd.DataFrame(
+        index=pd.MultiIndex.from_arrays(
+            [
+                [0],
+                [0],
+            ],
+            names=['df_left_id', 'df_right_id']
+        ),
+        data={
+            'match_score': [100.0],
+        }
+    )
+
+    # Test output
+    pdt.assert_frame_equal(df_matches, df_expected)
+
+    return
+
+
+def test_match_type_invalid():
+    '''
+        Test invalid value for match_type
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two'],
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too'],
+    })
+
+    # Use function
+    with pytest.raises(ValueError):
+        fuzzy_match_compound(df_left, df_right, [('col_a', 'col_a', 'invalid')])
+
+    return
+
+
+def test_distance_scorer():
+    '''
+        Test scorer where lower scores are better
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two'],
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too'],
+    })
+
+    # Use function
+    with pytest.raises(ValueError):
+        fuzzy_match_compound(
+            df_left,
+            df_right,
+            [('col_a', 'col_a', 'fuzzy')],
+            scorer=Levenshtein.distance
+        )
+
+    return
@@ -0,0 +1,277 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+from utils.utils import fuzzy_match, fuzzy_match_file, fuzzy_merge
+
+
+def test_match_csv(tmp_path):
+    '''
+        Test CSV file, non-empty, non-MultiIndex df_right, where matches exist,
+        chunk_size smaller than the number of rows in the file
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two', 'three', 'four', 'five'],
+        'col_b': [1, 2, 3, 4, 5]
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'three', 'fours', 'five', 'five'],
+        'col_b': ['a', 'b', 'c', 'd', 'e', 'f']
+    })
+    df_left.to_csv(tmp_path / 'left.csv', index=False)
+
+    # Use function
+    summary = fuzzy_match_file(
+        tmp_path / 'left.csv',
+        df_right,
+        'col_a',
+        'col_a',
+        tmp_path / 'output.csv',
+        chunk_size=2,
+        score_cutoff=60,
+        limit=2
+    )
+
+    # Add expected output
+    df_expected = fuzzy_match(
+        df_left,
+        df_right,
+        'col_a',
+        'col_a',
+        score_cutoff=60,
+        limit=2
+    ).reset_index()
+
+    # Test output
+    pdt.assert_frame_equal(pd.read_csv(tmp_path / 'output.csv'), df_expected)
+    assert summary == {'rows_read': 5, 'rows_matched': 5, 'matches': 6, 'rows_written': 6}
+
+    return
+
+
+def test_merge_csv_index_left(tmp_path):
+    '''
+        Test CSV file, non-empty, non-MultiIndex df_right, where matches exist,
+        merge=True, index_left given
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two', 'three', 'four', 'five'],
+        'col_b': [1, 2, 3, 4, 5]
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'three', 'fours', 'five', 'five'],
+        'col_b': ['a', 'b', 'c', 'd', 'e', 'f']
+    })
+    df_left['col_c'] = ['v', 'w', 'x', 'y', 'z']
+    df_left.to_csv(tmp_path / 'left.csv', index=False)
+
+    # Use function
+    summary = fuzzy_match_file(
+        tmp_path / 'left.csv',
+        df_right,
+        'col_a',
+        'col_a',
+        tmp_path / 'output.csv',
+        merge=True,
+        index_left='col_c',
+        chunk_size=2,
+        score_cutoff=80,
+        limit=2
+    )
+
+    # Add expected output
+    df_expected = fuzzy_merge(
+        df_left.set_index('col_c'),
+        df_right,
+        'col_a',
+        'col_a',
+        score_cutoff=80,
+        limit=2
+    ).reset_index()
+
+    # Test output
+    pdt.assert_frame_equal(pd.read_csv(tmp_path / 'output.csv'), df_expected)
+    assert summary == {'rows_read': 5, 'rows_matched': 4, 'matches': 5, 'rows_written': 5}
+
+    return
+
+
+def test_no_matches_csv(tmp_path):
+    '''
+        Test CSV file, non-empty, non-MultiIndex df_right, where no matches exist
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two', 'three', 'four', 'five'],
+        'col_b': [1, 2, 3, 4, 5]
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'three', 'fours', 'five', 'five'],
+        'col_b': ['a', 'b', 'c', 'd', 'e', 'f']
+    })
+    df_left.to_csv(tmp_path / 'left.csv', index=False)
+
+    # Use function
+    summary = fuzzy_match_file(
+        tmp_path / 'left.csv',
+        df_right.iloc[:0],
+        'col_a',
+        'col_a',
+        tmp_path / 'output.csv',
+        chunk_size=2
+    )
+
+    # Test output
+    assert list(pd.read_csv(tmp_path / 'output.csv').columns) == [
+        'df_left_id', 'df_right_id', 'match_string', 'match_score'
+    ]
+    assert summary == {'rows_read': 5, 'rows_matched': 0, 'matches': 0, 'rows_written': 0}
+
+    return
+
+
+def test_parquet(tmp_path):
+    '''
+        Test Parquet file, non-empty, non-MultiIndex df_right, where matches exist,
+        merge=True, columns_left given, output written to Parquet
+    '''
+    pytest.importorskip('pyarrow')
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two', 'three', 'four', 'five'],
+        'col_b': [1, 2, 3, 4, 5]
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'three', 'fours', 'five', 'five'],
+        'col_b': ['a', 'b', 'c', 'd', 'e', 'f']
+    })
+    df_left['col_c'] = ['v', 'w', 'x', 'y', 'z']
+    df_left.to_parquet(tmp_path / 'left.parquet', index=False)
+
+    # Use function
+    summary = fuzzy_match_file(
+        tmp_path / 'left.parquet',
+        df_right,
+        'col_a',
+        'col_a',
+        tmp_path / 'output.parquet',
+        merge=True,
+        columns_left=['col_b'],
+        chunk_size=2,
+        score_cutoff=80,
+        limit=2
+    )
+
+    # Add expected output
+    df_expected = fuzzy_merge(
+        df_left[['col_a', 'col_b']],
+        df_right,
+        'col_a',
+        'col_a',
+        score_cutoff=80,
+        limit=2
+    ).reset_index()
+
+    # Test output
+    pdt.assert_frame_equal(pd.read_parquet(tmp_path / 'output.parquet'), df_expected)
+    assert summary == {'rows_read': 5, 'rows_matched': 4, 'matches': 5, 'rows_written': 5}
+
+    return
+
+
+def test_match_parquet_first_chunk_unmatched(tmp_path):
+    '''
+        Test CSV file, non-empty, non-MultiIndex df_right, output written to
+        Parquet, drop_na=False, where no rows of the first chunk are matched
+    '''
+    pytest.importorskip('pyarrow')
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['zzzz', 'qqqq', 'foo', 'bar'],
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['foo', 'bar'],
+    })
+    df_left.to_csv(tmp_path / 'left.csv', index=False)
+
+    # Use function
+    summary = fuzzy_match_file(
+        tmp_path / 'left.csv',
+        df_right,
+        'col_a',
+        'col_a',
+        tmp_path / 'output.parquet',
+        chunk_size=2,
+        drop_na=False
+    )
+
+    # Add expected output
+    df_expected = pd.DataFrame({
+        'df_left_id': [0, 1, 2, 3],
+        'df_right_id': [None, None, 0, 1],
+        'match_string': [None, None, 'foo', 'bar'],
+        'match_score': [None, None, 100.0, 100.0],
+    }).astype({'df_right_id': float, 'match_score': float})
+
+    # Test output
+    pdt.assert_frame_equal(pd.read_parquet(tmp_path / 'output.parquet'), df_expected)
+    assert summary == {'rows_read': 4, 'rows_matched': 2, 'matches': 2, 'rows_written': 4}
+
+    return
+
+
+def test_merge_parquet_first_chunk_unmatched(tmp_path):
+    '''
+        Test CSV file, non-empty, non-MultiIndex df_right, merge=True, output
+        written to Parquet, drop_na=False, where no rows of the first chunk are
+        matched
+    '''
+    pytest.importorskip('pyarrow')
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['zzzz', 'qqqq', 'foo', 'bar'],
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['foo', 'bar'],
+        'col_b': ['a', 'b']
+    })
+    df_left.to_csv(tmp_path / 'left.csv', index=False)
+
+    # Use function
+    summary = fuzzy_match_file(
+        tmp_path / 'left.csv',
+        df_right,
+        'col_a',
+        'col_a',
+        tmp_path / 'output.parquet',
+        merge=True,
+        chunk_size=2,
+        drop_na=False
+    )
+
+    # Add expected output
+    df_expected = pd.DataFrame({
+        'df_left_id': [0, 1, 2, 3],
+        'df_right_id': [None, None, 0, 1],
+        'match_score': [None, None, 100.0, 100.0],
+        'col_a_df_left': ['zzzz', 'qqqq', 'foo', 'bar'],
+        'col_a_df_right': [None, None, 'foo', 'bar'],
+        'col_b': [None, None, 'a', 'b'],
+    }).astype({'df_right_id': float, 'match_score': float})
+
+    # Test output
+    pdt.assert_frame_equal(pd.read_parquet(tmp_path / 'output.parquet'), df_expected)
+    assert summary == {'rows_read': 4, 'rows_matched': 2, 'matches': 2, 'rows_written': 4}
+
+    return
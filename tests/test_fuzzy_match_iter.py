@@ -0,0 +1,174 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+from utils.utils import fuzzy_match, fuzzy_match_iter
+
+
+def test_simple_case():
+    '''
+        Test non-empty, non-MultiIndex df_left, non-empty, non-MultiIndex df_right,
+        where matches exist
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two', 'three', 'four', 'five'],
+        'col_b': [1, 2, 3, 4, 5]
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'three', 'fours', 'five', 'five'],
+        'col_b': ['a', 'b', 'c', 'd', 'e', 'f']
+    })
+
+    # Use function
+    chunks = list(
+        fuzzy_match_iter(
+            df_left,
+            df_right,
+            'col_a',
+            'col_a',
+            chunk_size=2,
+            score_cutoff=60,
+            limit=2
+        )
+    )
+
+    # Add expected output
+    df_expected = pd.DataFrame(
+        index=pd.MultiIndex.from_arrays(
+            [
+                [0, 1, 2, 3, 4, 4],
+                [0, 1, 2, 3, 4, 5],
+            ],
+            names=['df_left_id', 'df_right_id']
+        ),
+        data={
+            'match_string': ['one', 'too', 'three', 'fours', 'five', 'five'],
+            'match_score': [100.000000, 66.666667, 100.000000, 88.888889, 100.000000, 100.000000],
+        }
+    )
+
+    # Test output
+    assert len(chunks) == 3
+    pdt.assert_frame_equal(pd.concat(chunks), df_expected)
+
+    return
+
+
+def test_same_as_fuzzy_match():
+    '''
+        Test MultiIndex df_left, non-MultiIndex df_right, where matches exist,
+        drop_na=False, engine='cdist', concatenated output is the same as from
+        fuzzy_match()
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame(
+        index=pd.MultiIndex.from_arrays(
+            [
+                ['a', 'a', 'b', 'b', 'c'],
+                [1, 2, 1, 2, 1],
+            ]
+        ),
+        data={
+            'col_a': ['one', 'two', 'three', 'four', 'five'],
+            'col_b': [1, 2, 3, 4, 5]
+        }
+    )
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'three', 'fours', 'five', 'five'],
+        'col_b': ['a', 'b', 'c', 'd', 'e', 'f']
+    })
+
+    # Test output
+    pdt.assert_frame_equal(
+        pd.concat(
+            fuzzy_match_iter(
+                df_left,
+                df_right,
+                'col_a',
+                'col_a',
+                chunk_size=3,
+                score_cutoff=80,
+                limit=2,
+                drop_na=False,
+                engine='cdist'
+            )
+        ),
+        fuzzy_match(
+            df_left,
+            df_right,
+            'col_a',
+            'col_a',
+            score_cutoff=80,
+            limit=2,
+            drop_na=False
+        )
+    )
+
+    return
+
+
+def test_empty_df():
+    '''
+        Test empty df_left, non-empty df_right
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame(columns=['col_a', 'col_b'])
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'three', 'fours', 'five', 'five'],
+        'col_b': ['a', 'b', 'c', 'd', 'e', 'f']
+    })
+
+    # Use function
+    chunks = list(
+        fuzzy_match_iter(
+            df_left,
+            df_right,
+            'col_a',
+            'col_a',
+            chunk_size=2,
+            score_cutoff=60,
+            limit=2
+        )
+    )
+
+    # Test output
+    assert len(chunks) == 1
+    assert chunks[0].empty
+
+    return
+
+
+def test_column_not_in_df():
+    '''
+        Test column_x not in df_right
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two', 'three', 'four', 'five'],
+        'col_b': [1, 2, 3, 4, 5]
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'three', 'fours', 'five', 'five'],
+        'col_b': ['a', 'b', 'c', 'd', 'e', 'f']
+    })
+
+    # Test function
+    with pytest.raises(KeyError):
+        next(
+            fuzzy_match_iter(
+                df_left,
+                df_right,
+                'col_a',
+                'col_c'
+            )
+        )
+
+    return
@@ -0,0 +1,120 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+
+from utils.utils import fuzzy_match, fuzzy_match_sparse, sparse_to_frame
+
+
+def test_simple_case():
+    '''
+        Test non-empty, non-MultiIndex df_left, non-empty, non-MultiIndex df_right,
+        where matches exist
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two', 'three', 'four', 'five'],
+        'col_b': [1, 2, 3, 4, 5]
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'three', 'fours', 'five', 'five'],
+        'col_b': ['a', 'b', 'c', 'd', 'e', 'f']
+    })
+
+    # Use function
+    rows, cols, scores = fuzzy_match_sparse(
+        df_left,
+        df_right,
+        'col_a',
+        'col_a',
+        score_cutoff=60
+    )
+
+    # Test output
+    np.testing.assert_array_equal(rows, [0, 1, 2, 3, 4, 4])
+    np.testing.assert_array_equal(cols, [0, 1, 2, 3, 4, 5])
+    np.testing.assert_allclose(
+        scores,
+        [100.000000, 66.666667, 100.000000, 88.888889, 100.000000, 100.000000]
+    )
+
+    return
+
+
+def test_dtype_uint8():
+    '''
+        Test non-empty, non-MultiIndex df_left, non-empty, non-MultiIndex df_right,
+        where matches exist, dtype=np.uint8
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two', 'three', 'four', 'five'],
+        'col_b': [1, 2, 3, 4, 5]
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'three', 'fours', 'five', 'five'],
+        'col_b': ['a', 'b', 'c', 'd', 'e', 'f']
+    })
+
+    # Use function
+    rows, cols, scores = fuzzy_match_sparse(
+        df_left,
+        df_right,
+        'col_a',
+        'col_a',
+        score_cutoff=60,
+        dtype=np.uint8
+    )
+
+    # Test output
+    assert scores.dtype == np.uint8
+    np.testing.assert_array_equal(scores, [100, 67, 100, 89, 100, 100])
+
+    return
+
+
+def test_sparse_to_frame():
+    '''
+        Test non-empty, MultiIndex df_left, non-empty, non-MultiIndex df_right,
+        where matches exist, converting output to a dataframe
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['five', 'fours', 'one', None],
+        'col_b': [1, 2, 3, 4]
+    }).set_index('col_b', append=True)
+    df_right = pd.DataFrame({
+        'col_a': ['five', 'four', 'Five', 'fives', 'five'],
+        'col_b': ['a', 'b', 'c', 'd', 'e']
+    })
+
+    # Use function
+    rows, cols, scores = fuzzy_match_sparse(
+        df_left,
+        df_right,
+        'col_a',
+        'col_a',
+        score_cutoff=80
+    )
+    df_matches = sparse_to_frame(df_left, df_right, 'col_a', rows, cols, scores)
+
+    # Add expected output
+    df_expected = fuzzy_match(
+        df_left,
+        df_right,
+        'col_a',
+        'col_a',
+        score_cutoff=80,
+        limit=None
+    )
+    df_expected.attrs = {}
+
+    # Test output
+    pdt.assert_frame_equal(df_matches, df_expected)
+
+    return
@@ -681,6 +681,119 @@ def test_drop_na_false():
     return
 
 
+def test_drop_na_false_multiindex_df_left():
+    '''
+        Test non-empty, MultiIndex df_left, non-empty, non-MultiIndex df_right,
+        where matches exist, drop_na=False
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame(
+        index=pd.MultiIndex.from_arrays(
+            [
+                ['a', 'a', 'b'],
+                [1, 2, 1],
+            ],
+        ),
+        data={
+            'col_a': ['one', 'two', 'three'],
+            'col_b': [1, 2, 3]
+        }
+    )
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'three'],
+        'col_b': ['a', 'b', 'c']
+    })
+
+    # Use function
+    df_output = fuzzy_merge(
+        df_left,
+        df_right,
+        'col_a',
+        'col_a',
+        score_cutoff=80,
+        drop_na=False
+    )
+
+    # Add expected output
+    df_expected = pd.DataFrame(
+        index=pd.MultiIndex.from_arrays(
+            [
+                [('a', 1), ('a', 2), ('b', 1)],
+                [0.0, np.NaN, 2.0],
+            ],
+            names=['df_left_id', 'df_right_id']
+        ),
+        data={
+            'match_score': pd.to_numeric([100.000000, np.NaN, 100.000000]),
+            'col_a_df_left': ['one', 'two', 'three'],
+            'col_b_df_left': [1, 2, 3],
+            'col_a_df_right': ['one', np.NaN, 'three'],
+            'col_b_df_right': ['a', np.NaN, 'c'],
+        }
+    )
+
+    # Test output
+    pdt.assert_frame_equal(df_output, df_expected)
+
+    return
+
+
+def test_drop_na_false_no_matches():
+    '''
+        Test non-empty, non-MultiIndex df_left, non-empty, non-MultiIndex df_right,
+        where no matches exist, drop_na=False
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two'],
+        'col_b': [1, 2]
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['six', 'seven'],
+        'col_b': ['a', 'b']
+    })
+
+    # Use function
+    df_output = fuzzy_merge(
+        df_left,
+        df_right,
+        'col_a',
+        'col_a',
+        score_cutoff=80,
+        drop_na=False
+    )
+
+    # Add expected output
+    df_expected = pd.DataFrame(
+        index=pd.MultiIndex.from_arrays(
+            [
+                [0, 1],
+                [np.NaN, np.NaN],
+            ],
+            names=['df_left_id', 'df_right_id']
+        ),
+        data={
+            'match_score': [np.NaN, np.NaN],
+            'col_a_df_left': ['one', 'two'],
+            'col_b_df_left': [1, 2],
+            'col_a_df_right': [np.NaN, np.NaN],
+            'col_b_df_right': [np.NaN, np.NaN],
+        }
+    )
+
+    # Test output
+    pdt.assert_frame_equal(
+        df_output,
+        df_expected,
+        check_dtype=False,
+        check_index_type=False
+    )
+
+    return
+
+
 def test_drop_cols_none():
     '''
         Test non-empty, non-MultiIndex df_left, non-empty, non-MultiIndex df_right,
@@ -1222,3 +1335,136 @@ def test_suffixes_and_drop_cols_match():
     pdt.assert_frame_equal(df_output, df_expected)
 
     return
+
+
+def test_drop_cols_left_columns_only_in_df_left():
+    '''
+        Test non-empty, non-MultiIndex df_left, non-empty, non-MultiIndex df_right,
+        where matches exist and df_left has columns not in df_right, drop_cols='left'
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two', 'three', 'four', 'five'],
+        'col_c': [1, 2, 3, 4, 5]
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'three', 'fours', 'five', 'five'],
+        'col_b': ['a', 'b', 'c', 'd', 'e', 'f']
+    })
+
+    # Use function
+    df_output = fuzzy_merge(
+        df_left,
+        df_right,
+        'col_a',
+        'col_a',
+        score_cutoff=80,
+        limit=2,
+        drop_cols='left'
+    )
+
+    # Add expected output
+    df_expected = pd.DataFrame(
+        index=pd.MultiIndex.from_arrays(
+            [
+                [0, 2, 3, 4, 4],
+                [0, 2, 3, 4, 5],
+            ],
+            names=['df_left_id', 'df_right_id']
+        ),
+        data={
+            'match_score': pd.to_numeric(
+                [100.000000, 100.000000, 88.888889, 100.000000, 100.000000]
+            ),
+            'col_a_df_right': ['one', 'three', 'fours', 'five', 'five'],
+            'col_b': ['a', 'c', 'd', 'e', 'f'],
+        }
+    )
+
+    # Test output
+    pdt.assert_frame_equal(df_output, df_expected)
+
+    return
+
+
+def test_columns_left_and_right():
+    '''
+        Test non-empty, non-MultiIndex df_left, non-empty, non-MultiIndex df_right,
+        where matches exist and columns_left and columns_right supplied
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two', 'three', 'four', 'five'],
+        'col_b': [1, 2, 3, 4, 5],
+        'col_c': [True, False, True, False, True]
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'three', 'fours', 'five', 'five'],
+        'col_b': ['a', 'b', 'c', 'd', 'e', 'f']
+    })
+
+    # Use function
+    df_output = fuzzy_merge(
+        df_left,
+        df_right,
+        'col_a',
+        'col_a',
+        score_cutoff=80,
+        limit=2,
+        columns_left=['col_b', 'col_c'],
+        columns_right=['col_a'],
+    )
+
+    # Add expected output
+    df_expected = pd.DataFrame(
+        index=pd.MultiIndex.from_arrays(
+            [
+                [0, 2, 3, 4, 4],
+                [0, 2, 3, 4, 5],
+            ],
+            names=['df_left_id', 'df_right_id']
+        ),
+        data={
+            'match_score': pd.to_numeric(
+                [100.000000, 100.000000, 88.888889, 100.000000, 100.000000]
+            ),
+            'col_b': [1, 3, 4, 5, 5],
+            'col_c': [True, True, False, True, True],
+            'col_a': ['one', 'three', 'fours', 'five', 'five'],
+        }
+    )
+
+    # Test output
+    pdt.assert_frame_equal(df_output, df_expected)
+
+    return
+
+
+def test_columns_left_not_in_df():
+    '''
+        Test columns_left including a column not in df_left
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two', 'three', 'four', 'five'],
+        'col_b': [1, 2, 3, 4, 5]
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'three', 'fours', 'five', 'five'],
+        'col_b': ['a', 'b', 'c', 'd', 'e', 'f']
+    })
+
+    # Use function
+    with pytest.raises(KeyError):
+        fuzzy_merge(
+            df_left,
+            df_right,
+            'col_a',
+            'col_a',
+            columns_left=['col_c'],
+        )
+
+    return
@@ -0,0 +1,142 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+from utils.utils import MatchCache, fuzzy_match
+
+
+def test_filter():
+    '''
+        Test a stricter score_cutoff and smaller limit give the same matches as
+        fuzzy_match(), using cached matches
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two', 'three', 'four', 'five'],
+        'col_b': [1, 2, 3, 4, 5]
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'three', 'fours', 'five', 'five'],
+        'col_b': ['a', 'b', 'c', 'd', 'e', 'f']
+    })
+
+    # Use function
+    cache = MatchCache(score_cutoff=50, limit=3)
+    df_matches_first = cache.fuzzy_match(df_left, df_right, 'col_a', 'col_a', score_cutoff=60)
+    df_matches = cache.fuzzy_match(
+        df_left,
+        df_right,
+        'col_a',
+        'col_a',
+        score_cutoff=80,
+        limit=2,
+        drop_na=False
+    )
+
+    # Add expected output
+    df_expected = fuzzy_match(
+        df_left,
+        df_right,
+        'col_a',
+        'col_a',
+        score_cutoff=80,
+        limit=2,
+        drop_na=False
+    )
+
+    # Test output
+    pdt.assert_frame_equal(df_matches, df_expected)
+    assert not df_matches_first.attrs['stats']['cache_hit']
+    assert df_matches.attrs['stats']['cache_hit']
+    assert len(cache) == 1
+
+    return
+
+
+def test_looser_and_changed():
+    '''
+        Test a looser score_cutoff, and changed values in df_left, find matches
+        again
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two', 'three', 'four', 'five'],
+        'col_b': [1, 2, 3, 4, 5]
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too', 'three', 'fours', 'five', 'five'],
+        'col_b': ['a', 'b', 'c', 'd', 'e', 'f']
+    })
+    df_left_changed = df_left.assign(col_a=['one', 'two', 'three', 'four', 'fiver'])
+
+    # Use function
+    cache = MatchCache(max_entries=1)
+    cache.fuzzy_match(df_left, df_right, 'col_a', 'col_a', score_cutoff=90)
+    df_matches_looser = cache.fuzzy_match(df_left, df_right, 'col_a', 'col_a', score_cutoff=60)
+    df_matches_changed = cache.fuzzy_match(
+        df_left_changed,
+        df_right,
+        'col_a',
+        'col_a',
+        score_cutoff=60
+    )
+
+    # Test output
+    pdt.assert_frame_equal(
+        df_matches_looser,
+        fuzzy_match(df_left, df_right, 'col_a', 'col_a', score_cutoff=60)
+    )
+    pdt.assert_frame_equal(
+        df_matches_changed,
+        fuzzy_match(df_left_changed, df_right, 'col_a', 'col_a', score_cutoff=60)
+    )
+    assert not df_matches_looser.attrs['stats']['cache_hit']
+    assert not df_matches_changed.attrs['stats']['cache_hit']
+    assert len(cache) == 1
+
+    return
+
+
+def test_limit_duplicates_once():
+    '''
+        Test limit_duplicates='once', which isn't supported
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two'],
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too'],
+    })
+
+    # Use function
+    with pytest.raises(ValueError):
+        MatchCache().fuzzy_match(df_left, df_right, 'col_a', 'col_a', limit_duplicates='once')
+
+    return
+
+
+def test_exact_first():
+    '''
+        Test exact_first=True, which isn't supported
+    '''
+
+    # Create dataframes
+    df_left = pd.DataFrame({
+        'col_a': ['one', 'two'],
+    })
+    df_right = pd.DataFrame({
+        'col_a': ['one', 'too'],
+    })
+
+    # Use function
+    with pytest.raises(ValueError):
+        MatchCache().fuzzy_match(df_left, df_right, 'col_a', 'col_a', exact_first=True)
+
+    return
@@ -1,121 +1,3687 @@
 # !/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-from typing import Any, Callable, Hashable, Literal, Optional
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import sys
+import zlib
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
+from multiprocessing import shared_memory
+from collections import Counter
+from typing import Any, Callable, Hashable, Iterator, Literal, Optional, Union
 
+import numpy as np
 import pandas as pd
 from rapidfuzz import fuzz, process, utils
+from rapidfuzz.distance import Indel, Levenshtein
+from scipy.optimize import linear_sum_assignment
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+
+# Define function to get the best and worst scores a scorer can return
+def _get_scorer_bounds(
+    scorer: Callable,
+    scorer_kwargs: dict[str, Any],
+) -> tuple[float, float]:
+    '''
+        Get the worst and optimal scores for a scorer.
+
+            Parameters:
+                - scorer: The scorer to use for fuzzy matching
+                - scorer_kwargs: Keyword arguments to pass to scorer
+
+            Returns:
+                - worst_score, optimal_score: The worst and optimal scores
+                the scorer can return
+
+            Notes:
+                - Scorers that aren't provided by rapidfuzz are assumed to
+                return a similarity between 0 and 100, as process.extract()
+                does
+    '''
+    params = getattr(scorer, '_RF_ScorerPy', None)
+
+    if params is None:
+        return 0, 100
+
+    flags = params['get_scorer_flags'](**scorer_kwargs)
+
+    return flags['worst_score'], flags['optimal_score']
+
+
+# Define function to get the type of scores a scorer returns
+def _get_score_dtype(
+    scorer: Callable,
+    scorer_kwargs: dict[str, Any],
+) -> type:
+    '''
+        Get the numpy dtype of scores returned by a scorer.
+
+            Parameters:
+                - scorer: The scorer to use for fuzzy matching
+                - scorer_kwargs: Keyword arguments to pass to scorer
+
+            Returns:
+                - dtype: np.int64 for scorers returning integers, such as
+                Levenshtein.distance, otherwise np.float64
+    '''
+    dtype = np.asarray(scorer('a', 'a', **scorer_kwargs)).dtype
+
+    return np.int64 if np.issubdtype(dtype, np.integer) else np.float64
+
+
+# Define string preparation function
+def _prepare_strings(
+    values: pd.Series,
+    clean_strings: bool,
+) -> np.ndarray:
+    '''
+        Prepare values for matching.
+
+            Parameters:
+                - values: The values to prepare
+                - clean_strings: Whether to apply rapidfuzz's default_process
+                processor
+
+            Returns:
+                - prepared: An object array of the prepared values, in the
+                same order as values
+
+            Notes:
+                - None, np.nan and pd.NA are all replaced with None, which
+                rapidfuzz treats as not matching anything
+                - This means each value is only processed once, rather than
+                once per comparison
+    '''
+    prepared = values.astype(object).where(values.notna(), None).to_numpy()
+
+    if clean_strings:
+        prepared = np.array(
+            [None if x is None else utils.default_process(x) for x in prepared],
+            dtype=object,
+        )
+
+    return prepared
+
+
+# Define the number of choices scored at a time by _extract_apply()
+_EXTRACT_BLOCK_SIZE = 4096
+
+
+# Define function to find matches by calling process.extract() for each query
+def _extract_apply(
+    queries: np.ndarray,
+    choices: np.ndarray,
+    score_cutoff: Optional[float],
+    limit: Optional[int],
+    scorer: Callable,
+    scorer_kwargs: dict[str, Any],
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, dict[str, int]]:
+    '''
+        Find matches for each query using process.extract().
+
+            Parameters:
+                - queries: The prepared values we want to find matches for
+                - choices: The prepared values in which we want to look for
+                matches
+                - score_cutoff: A score below which any matches will be
+                dropped
+                - limit: The number of matches to find for each query
+                - scorer: The scorer to use for fuzzy matching
+                - scorer_kwargs: Keyword arguments to pass to scorer
+
+            Returns:
+                - query_positions, choice_positions, scores, counters: See
+                _extract()
+
+            Notes:
+                - Where limit is given, choices are scored in blocks of
+                _EXTRACT_BLOCK_SIZE, and a query stops being scored once
+                limit matches with the scorer's optimal score have been found,
+                as no later choice can rank above these. Where limit is 1,
+                process.extractOne() is used, which also stops within a block
+                - score_cutoff is raised to the limit-th best score found so
+                far, so later blocks only return matches that can rank
+                - pairs_scored counts pairs in the blocks scored, so is an
+                upper bound where process.extractOne() stops within a block
+    '''
+    worst_score, optimal_score = _get_scorer_bounds(scorer, scorer_kwargs)
+    sign = 1 if optimal_score > worst_score else -1
+
+    # Split choices into blocks, keeping the number of non-missing values in each
+    # NB: Where limit isn't given, every choice is scored, so a single block is used
+    block_size = _EXTRACT_BLOCK_SIZE if limit is not None else max(len(choices), 1)
+    block_starts = range(0, len(choices), block_size)
+    blocks = [choices[start:start + block_size].tolist() for start in block_starts]
+    block_counts = [len(block) - block.count(None) for block in blocks]
+
+    query_positions, choice_positions, scores = [], [], []
+    pairs_scored = 0
+
+    for i, query in enumerate(queries):
+        if query is None:
+            continue
+
+        matches = []
+        cutoff = score_cutoff
+
+        for start, block, count in zip(block_starts, blocks, block_counts):
+            pairs_scored += count
+
+            # NB: Matches with the same score are ordered by position in choices,
+            # so matches from earlier blocks rank above ties from later blocks
+            if limit == 1:
+                match = process.extractOne(
+                    query,
+                    block,
+                    score_cutoff=cutoff,
+                    processor=None,
+                    scorer=scorer,
+                    scorer_kwargs=scorer_kwargs,
+                )
+                block_matches = [] if match is None else [match]
+            else:
+                block_matches = process.extract(
+                    query,
+                    block,
+                    limit=limit,
+                    score_cutoff=cutoff,
+                    processor=None,
+                    scorer=scorer,
+                    scorer_kwargs=scorer_kwargs,
+                )
+            matches = sorted(
+                matches + [(score, start + j) for _, score, j in block_matches],
+                key=lambda match: (-sign * match[0], match[1]),
+            )[:limit]
+
+            if limit is not None and len(matches) == limit:
+                if matches[-1][0] == optimal_score:
+                    break
+                cutoff = matches[-1][0]
+
+        for score, j in matches:
+            query_positions.append(i)
+            choice_positions.append(j)
+            scores.append(score)
+
+    return (
+        np.array(query_positions, dtype=np.int64),
+        np.array(choice_positions, dtype=np.int64),
+        np.array(scores, dtype=_get_score_dtype(scorer, scorer_kwargs)),
+        {'pairs_scored': pairs_scored},
+    )
+
+
+# Define the largest number of bytes of scores _extract_cdist() holds at a time
+_CDIST_MEMORY_BUDGET = 256 * 1024 * 1024
+
+
+# Define batched equivalent of _extract_apply()
+def _extract_cdist(
+    queries: np.ndarray,
+    choices: np.ndarray,
+    score_cutoff: Optional[float],
+    limit: Optional[int],
+    scorer: Callable,
+    scorer_kwargs: dict[str, Any],
+    chunk_size: int,
+    workers: int,
+    dtype: Optional[type] = None,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, dict[str, int]]:
+    '''
+        Find matches for each query in blocks of queries using process.cdist().
+
+            Parameters:
+                - queries: The prepared values we want to find matches for
+                - choices: The prepared values in which we want to look for
+                matches
+                - score_cutoff: A score below which any matches will be
+                dropped
+                - limit: The number of matches to find for each query
+                - scorer: The scorer to use for fuzzy matching
+                - scorer_kwargs: Keyword arguments to pass to scorer
+                - chunk_size: The largest number of queries to score in each
+                block
+                - workers: The number of threads process.cdist() uses. -1
+                uses all available cores
+                - dtype: The dtype of scores. Where None, the dtype given by
+                _get_score_dtype() is used
+
+            Returns:
+                - query_positions, choice_positions, scores, counters: See
+                _extract()
+
+            Notes:
+                - Matches with the same score are ordered by position in
+                choices, as in process.extract()
+                - Blocks are made smaller than chunk_size where needed, so
+                that the scores of a block take up at most
+                _CDIST_MEMORY_BUDGET bytes. Where limit is given, a copy of
+                the scores is made to find the limit-th best score in each
+                row, so peak memory use is around twice this
+    '''
+    worst_score, optimal_score = _get_scorer_bounds(scorer, scorer_kwargs)
+    dtype = dtype or _get_score_dtype(scorer, scorer_kwargs)
+
+    # NB: For distance scorers such as Levenshtein.distance lower scores are better
+    # and score_cutoff is a maximum rather than a minimum. Scores are compared in
+    # the direction given by sign, rather than negated, to avoid copying blocks
+    sign = 1 if optimal_score > worst_score else -1
+
+    # Drop missing values, as process.extract() treats these as not matching
+    # anything
+    query_positions_valid = np.flatnonzero(pd.notna(queries))
+    choice_positions_valid = np.flatnonzero(pd.notna(choices))
+    choices_valid = choices[choice_positions_valid]
+
+    # Limit the size of blocks to _CDIST_MEMORY_BUDGET
+    block_size = max(
+        1,
+        min(
+            chunk_size,
+            _CDIST_MEMORY_BUDGET // max(len(choices_valid) * np.dtype(dtype).itemsize, 1),
+        ),
+    )
+
+    query_positions, choice_positions, scores = [], [], []
+
+    if len(choices_valid) > 0:
+        for start in range(0, len(query_positions_valid), block_size):
+            block = query_positions_valid[start:start + block_size]
+
+            block_scores = process.cdist(
+                queries[block],
+                choices_valid,
+                scorer=scorer,
+                processor=None,
+                score_cutoff=score_cutoff,
+                dtype=dtype,
+                workers=workers,
+                scorer_kwargs=scorer_kwargs,
+            )
+
+            # Keep scores that meet score_cutoff and that are at least as good as
+            # the limit-th best score in the row
+            # NB: More than limit scores can be kept where there are ties,
+            # these are resolved by position below
+            if score_cutoff is None:
+                mask = np.ones(block_scores.shape, dtype=bool)
+            elif sign == 1:
+                mask = block_scores >= score_cutoff
+            else:
+                mask = block_scores <= score_cutoff
+            if limit is not None and limit < block_scores.shape[1]:
+                kth = block_scores.shape[1] - limit if sign == 1 else limit - 1
+                kth_scores = np.partition(block_scores, kth, axis=1)[:, kth]
+                if sign == 1:
+                    mask &= block_scores >= kth_scores[:, None]
+                else:
+                    mask &= block_scores <= kth_scores[:, None]
+
+            # Sort by row, then score, then position in choices, and keep the
+            # first limit matches in each row
+            rows, cols = np.nonzero(mask)
+            block_scores = block_scores[rows, cols]
+            order = np.lexsort((cols, -sign * block_scores.astype(np.float64), rows))
+            rows, cols, block_scores = rows[order], cols[order], block_scores[order]
+            if limit is not None:
+                rank = np.arange(len(rows)) - np.searchsorted(rows, rows)
+                rows, cols = rows[rank < limit], cols[rank < limit]
+                block_scores = block_scores[rank < limit]
+
+            query_positions.append(block[rows])
+            choice_positions.append(choice_positions_valid[cols])
+            scores.append(block_scores)
+
+    counters = {'pairs_scored': len(query_positions_valid) * len(choices_valid)}
+
+    if len(query_positions) == 0:
+        return (
+            np.array([], dtype=np.int64),
+            np.array([], dtype=np.int64),
+            np.array([], dtype=dtype),
+            counters,
+        )
+
+    return (
+        np.concatenate(query_positions),
+        np.concatenate(choice_positions),
+        np.concatenate(scores),
+        counters,
+    )
+
+
+# Define function to get the maximum number of edits allowed by score_cutoff
+def _get_max_edits(
+    scorer: Callable,
+    scorer_kwargs: dict[str, Any],
+    score_cutoff: Optional[float],
+) -> Optional[Callable[[int, np.ndarray], np.ndarray]]:
+    '''
+        Get a function giving the maximum edit distance between two strings
+        for which scorer can return a score that meets score_cutoff.
+
+            Parameters:
+                - scorer: The scorer to use for fuzzy matching
+                - scorer_kwargs: Keyword arguments to pass to scorer
+                - score_cutoff: A score below which any matches will be
+                dropped
+
+            Returns:
+                - max_edits: A function taking the length of a query and an
+                array of lengths of choices, and returning an array of the
+                maximum Levenshtein distance between the query and each
+                choice. None where no such bound is known for scorer
+
+            Notes:
+                - Bounds are known for fuzz.ratio, fuzz.QRatio and the
+                distances, similarities and normalized distances and
+                similarities of Indel and Levenshtein (with default weights)
+                - Indel distance is at least Levenshtein distance, so bounds
+                on Indel distance are also bounds on Levenshtein distance
+    '''
+    if score_cutoff is None or scorer_kwargs.get('weights', (1, 1, 1)) != (1, 1, 1):
+        return None
+
+    # NB: A small tolerance is added to guard against floating point error
+    cutoff = score_cutoff
+    eps = 1e-9
+    bounds = {
+        fuzz.ratio: lambda la, lb: (1 - cutoff / 100) * (la + lb),
+        fuzz.QRatio: lambda la, lb: (1 - cutoff / 100) * (la + lb),
+        Indel.distance: lambda la, lb: np.full(len(lb), cutoff),
+        Indel.normalized_distance: lambda la, lb: cutoff * (la + lb),
+        Indel.similarity: lambda la, lb: la + lb - cutoff,
+        Indel.normalized_similarity: lambda la, lb: (1 - cutoff) * (la + lb),
+        Levenshtein.distance: lambda la, lb: np.full(len(lb), cutoff),
+        Levenshtein.normalized_distance: lambda la, lb: cutoff * np.maximum(la, lb),
+        Levenshtein.similarity: lambda la, lb: np.maximum(la, lb) - cutoff,
+        Levenshtein.normalized_similarity: lambda la, lb: (1 - cutoff) * np.maximum(la, lb),
+    }
+
+    if scorer not in bounds:
+        return None
+
+    return lambda la, lb: np.floor(bounds[scorer](la, lb) + eps).astype(np.int64)
+
+
+# Define function to split a string into q-grams
+def _get_qgrams(value: str, qgram_size: int) -> Counter:
+    '''
+        Get counts of the character q-grams in a string.
+
+            Parameters:
+                - value: The string to split
+                - qgram_size: The number of characters in each q-gram
+
+            Returns:
+                - qgrams: A Counter of q-grams
+
+            Notes:
+                - value is padded with qgram_size - 1 null characters at each
+                end, so that every string has len(value) + qgram_size - 1
+                q-grams
+    '''
+    padding = '\x00' * (qgram_size - 1)
+    padded = padding + value + padding
+
+    return Counter(padded[i:i + qgram_size] for i in range(len(padded) - qgram_size + 1))
+
+
+# Define base class for objects with attributes loaded on first use
+class _LazyAttributes:
+    '''
+        Base class for objects with attributes loaded on first use.
+
+            Notes:
+                - Functions loading attributes are kept in _loaders, keyed by
+                attribute name. Once loaded, an attribute is set as normal, so
+                later access doesn't go through __getattr__()
+    '''
+    def __getattr__(self, name: str) -> Any:
+        loaders = self.__dict__.get('_loaders', {})
+        if name not in loaders:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+        value = loaders.pop(name)()
+        setattr(self, name, value)
+
+        return value
+
+
+# Define character q-gram inverted index
+class _QGramIndex(_LazyAttributes):
+    '''
+        Inverted index from character q-grams to the prepared choices
+        containing them, used to find candidate matches for a query.
+
+            Attributes:
+                - qgram_size: The number of characters in each q-gram
+                - lengths: The length of each choice, or -1 where the choice
+                is None
+                - gram_rows: A dict mapping each q-gram to its row in the
+                postings
+                - indptr, positions, counts: The postings in CSR form. For
+                the q-gram in row r, positions[indptr[r]:indptr[r + 1]] are
+                the positions of choices containing it and counts are the
+                number of times it occurs in each
+                - length_values, length_indptr, length_order: Positions of
+                choices grouped by length. Choices with length
+                length_values[i] are at
+                length_order[length_indptr[i]:length_indptr[i + 1]]
+
+            Notes:
+                - Choices can be added and removed after the index is built.
+                Added choices are merged into the postings without
+                re-reading existing choices, and removed choices are given a
+                length of -1 and left out of candidates
+                - Where the scorer has a known bound on edit distance (see
+                _get_max_edits()), candidates are all choices sharing enough
+                q-grams to possibly meet score_cutoff, so no matches are lost.
+                This uses the q-gram lemma: strings within Levenshtein
+                distance k share at least max(len(a), len(b)) + q - 1 - k * q
+                padded q-grams
+                - Otherwise, candidates are all choices sharing at least one
+                q-gram with the query, so some matches may be lost
+    '''
+    def __init__(self, choices: np.ndarray, qgram_size: int = 3):
+        self.qgram_size = qgram_size
+        self.lengths = np.array(
+            [-1 if x is None else len(x) for x in choices], dtype=np.int64
+        )
+
+        # Build postings
+        postings: dict[str, tuple[list[int], list[int]]] = {}
+
+        for j, choice in enumerate(choices):
+            if choice is None:
+                continue
+            for gram, count in _get_qgrams(choice, qgram_size).items():
+                gram_positions, gram_counts = postings.setdefault(gram, ([], []))
+                gram_positions.append(j)
+                gram_counts.append(count)
+
+        self.gram_rows = {gram: r for r, gram in enumerate(postings)}
+        self.indptr = np.zeros(len(postings) + 1, dtype=np.int64)
+        self.indptr[1:] = np.cumsum([len(x[0]) for x in postings.values()])
+        self.positions = np.fromiter(
+            (j for x in postings.values() for j in x[0]),
+            dtype=np.int64,
+            count=self.indptr[-1],
+        )
+        self.counts = np.fromiter(
+            (c for x in postings.values() for c in x[1]),
+            dtype=np.int64,
+            count=self.indptr[-1],
+        )
+
+        self._group_lengths()
+
+    def _group_lengths(self):
+        '''
+            Group positions of choices by length.
+        '''
+        valid = np.flatnonzero(self.lengths >= 0)
+        self.length_order = valid[np.argsort(self.lengths[valid], kind='stable')]
+        self.length_values, starts = np.unique(
+            self.lengths[self.length_order], return_index=True
+        )
+        self.length_indptr = np.append(starts, len(self.length_order)).astype(np.int64)
+
+    def add(self, choices: np.ndarray):
+        '''
+            Add choices to the index, after the existing choices.
+
+                Parameters:
+                    - choices: The prepared values to add
+
+                Notes:
+                    - Only added choices are split into q-grams, but postings
+                    are copied into new arrays and choices are regrouped by
+                    length, so this takes time proportional to the size of
+                    the whole index
+        '''
+        added = _QGramIndex(choices, self.qgram_size)
+
+        # Map rows of the postings of added choices to rows of the index, adding
+        # rows for q-grams not already in the index
+        rows = np.array(
+            [self.gram_rows.setdefault(gram, len(self.gram_rows)) for gram in added.gram_rows],
+            dtype=np.int64,
+        )
+        row_lengths = np.zeros(len(self.gram_rows), dtype=np.int64)
+        row_lengths[:len(self.indptr) - 1] = np.diff(self.indptr)
+        added_row_lengths = np.zeros(len(self.gram_rows), dtype=np.int64)
+        added_row_lengths[rows] = np.diff(added.indptr)
+
+        indptr = np.zeros(len(self.gram_rows) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum(row_lengths + added_row_lengths)
+        positions = np.empty(indptr[-1], dtype=np.int64)
+        counts = np.empty(indptr[-1], dtype=np.int64)
+
+        # Existing postings keep their place at the start of each row, and postings
+        # of added choices follow them, so positions stay sorted within each row
+        old_rows = np.repeat(np.arange(len(self.indptr) - 1), np.diff(self.indptr))
+        destination = indptr[old_rows] + np.arange(len(self.positions)) - self.indptr[old_rows]
+        positions[destination] = self.positions
+        counts[destination] = self.counts
+
+        added_rows = np.repeat(np.arange(len(rows)), np.diff(added.indptr))
+        destination = (
+            indptr[rows[added_rows]] + row_lengths[rows[added_rows]]
+            + np.arange(len(added.positions)) - added.indptr[added_rows]
+        )
+        positions[destination] = added.positions + len(self.lengths)
+        counts[destination] = added.counts
+
+        self.indptr, self.positions, self.counts = indptr, positions, counts
+        self.lengths = np.concatenate([self.lengths, added.lengths])
+        self._group_lengths()
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        '''
+            Get the arrays making up the index, so that it can be saved.
+
+                Returns:
+                    - arrays: A dict of arrays, keyed by name. q-grams are
+                    packed with _pack_strings(), in order of their rows
+        '''
+        gram_offsets, gram_data, _ = _pack_strings(list(self.gram_rows))
+
+        return {
+            'lengths': self.lengths,
+            'indptr': self.indptr,
+            'positions': self.positions,
+            'counts': self.counts,
+            'length_values': self.length_values,
+            'length_indptr': self.length_indptr,
+            'length_order': self.length_order,
+            'gram_offsets': gram_offsets,
+            'gram_data': gram_data,
+        }
+
+    @classmethod
+    def from_arrays(cls, qgram_size: int, arrays: dict[str, np.ndarray]) -> '_QGramIndex':
+        '''
+            Rebuild an index from the output of to_arrays().
+
+                Parameters:
+                    - qgram_size: The number of characters in each q-gram
+                    - arrays: The output of to_arrays()
+
+                Returns:
+                    - index: The q-gram index
+
+                Notes:
+                    - Arrays are used as they are, so can be memory-mapped.
+                    The mapping from q-grams to rows is built on first use
+        '''
+        index = cls.__new__(cls)
+        index.qgram_size = qgram_size
+
+        for name in [
+            'lengths', 'indptr', 'positions', 'counts', 'length_values', 'length_indptr',
+            'length_order',
+        ]:
+            setattr(index, name, arrays[name])
+
+        index._loaders = {
+            'gram_rows': lambda: {
+                gram: r for r, gram in enumerate(
+                    _unpack_strings(
+                        arrays['gram_offsets'],
+                        arrays['gram_data'],
+                        np.zeros(len(arrays['gram_offsets']) - 1, dtype=bool),
+                    )
+                )
+            },
+        }
+
+        return index
+
+    def remove(self, positions: np.ndarray):
+        '''
+            Remove choices from the index.
+
+                Parameters:
+                    - positions: The positions of the choices to remove
+
+                Notes:
+                    - Postings aren't rewritten. Removed choices are given a
+                    length of -1, and left out of candidates
+        '''
+        self.lengths[positions] = -1
+
+    def reorder(self, order: np.ndarray, inverse: np.ndarray):
+        '''
+            Reorder choices in the index.
+
+                Parameters:
+                    - order: The old position of each choice, in its new
+                    position
+                    - inverse: The new position of each choice, in its old
+                    position
+        '''
+        self.lengths = self.lengths[order]
+
+        # NB: Positions are kept sorted within each row of the postings
+        rows = np.repeat(np.arange(len(self.indptr) - 1), np.diff(self.indptr))
+        positions = inverse[self.positions]
+        by_row = np.lexsort((positions, rows))
+        self.positions = positions[by_row]
+        self.counts = self.counts[by_row]
+        self._group_lengths()
+
+    def candidates(
+        self,
+        query: str,
+        max_edits: Optional[Callable[[int, np.ndarray], np.ndarray]],
+    ) -> np.ndarray:
+        '''
+            Find candidate matches for a query.
+
+                Parameters:
+                    - query: The prepared value we want to find matches for
+                    - max_edits: The output of _get_max_edits()
+
+                Returns:
+                    - candidates: A sorted array of the positions of
+                    candidate choices
+        '''
+        # Count q-grams shared with each choice
+        # NB: Shared q-grams are counted as a multiset, i.e. a q-gram occurring
+        # twice in the query and three times in a choice counts twice
+        query_grams = _get_qgrams(query, self.qgram_size)
+        rows = [
+            (self.gram_rows[gram], count) for gram, count in query_grams.items()
+            if gram in self.gram_rows
+        ]
+        if len(rows) > 0:
+            positions = np.concatenate(
+                [self.positions[self.indptr[r]:self.indptr[r + 1]] for r, _ in rows]
+            )
+            counts = np.concatenate(
+                [
+                    np.minimum(self.counts[self.indptr[r]:self.indptr[r + 1]], count)
+                    for r, count in rows
+                ]
+            )
+            touched, inverse = np.unique(positions, return_inverse=True)
+            shared = np.bincount(inverse, weights=counts)
+        else:
+            touched = np.array([], dtype=np.int64)
+            shared = np.array([], dtype=np.float64)
+
+        if max_edits is None:
+            return touched[self.lengths[touched] >= 0]
+
+        # Keep choices sharing enough q-grams, plus choices with lengths for
+        # which no shared q-grams are needed
+        length_query = len(query)
+        need = (
+            np.maximum(length_query, self.lengths[touched]) + self.qgram_size - 1
+            - self.qgram_size * max_edits(length_query, self.lengths[touched])
+        )
+        need_by_length = (
+            np.maximum(length_query, self.length_values) + self.qgram_size - 1
+            - self.qgram_size * max_edits(length_query, self.length_values)
+        )
+        unconstrained = [
+            self.length_order[self.length_indptr[i]:self.length_indptr[i + 1]]
+            for i in np.flatnonzero(need_by_length <= 0)
+        ]
+
+        candidates = np.union1d(
+            touched[shared >= need], np.concatenate([touched[:0]] + unconstrained)
+        )
+
+        # Drop removed choices
+        return candidates[self.lengths[candidates] >= 0]
+
+
+# Define function to find matches among candidates from a q-gram index
+def _extract_blocked(
+    queries: np.ndarray,
+    choices: np.ndarray,
+    index: _QGramIndex,
+    score_cutoff: Optional[float],
+    limit: Optional[int],
+    scorer: Callable,
+    scorer_kwargs: dict[str, Any],
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, dict[str, int]]:
+    '''
+        Find matches for each query using process.extract(), only scoring
+        candidates found using a q-gram index.
+
+            Parameters:
+                - queries: The prepared values we want to find matches for
+                - choices: The prepared values in which we want to look for
+                matches
+                - index: A q-gram index built from choices
+                - score_cutoff, limit, scorer, scorer_kwargs: See
+                fuzzy_match()
+
+            Returns:
+                - query_positions, choice_positions, scores, counters: See
+                _extract()
+    '''
+    max_edits = _get_max_edits(scorer, scorer_kwargs, score_cutoff)
+    query_positions, choice_positions, scores = [], [], []
+    pairs_scored = 0
+
+    for i, query in enumerate(queries):
+        if query is None:
+            continue
+
+        candidates = index.candidates(query, max_edits)
+        pairs_scored += len(candidates)
+
+        # NB: candidates are sorted, so ties are ordered by position in choices
+        for _, score, j in process.extract(
+            query,
+            choices[candidates].tolist(),
+            limit=limit,
+            score_cutoff=score_cutoff,
+            processor=None,
+            scorer=scorer,
+            scorer_kwargs=scorer_kwargs,
+        ):
+            query_positions.append(i)
+            choice_positions.append(candidates[j])
+            scores.append(score)
+
+    return (
+        np.array(query_positions, dtype=np.int64),
+        np.array(choice_positions, dtype=np.int64),
+        np.array(scores, dtype=_get_score_dtype(scorer, scorer_kwargs)),
+        {'pairs_scored': pairs_scored},
+    )
+
+
+# Define function to find exact matches
+def _extract_exact(
+    queries: np.ndarray,
+    choices: np.ndarray,
+    score_cutoff: Optional[float],
+    limit: Optional[int],
+    scorer: Callable,
+    scorer_kwargs: dict[str, Any],
+    choice_counts: Optional[np.ndarray] = None,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    '''
+        Find queries with at least limit exact matches in choices, using a
+        hash join on the prepared values.
+
+            Parameters:
+                - queries: The prepared values we want to find matches for
+                - choices: The prepared values in which we want to look for
+                matches
+                - score_cutoff, limit, scorer, scorer_kwargs: See
+                fuzzy_match()
+                - choice_counts: The number of matches each choice counts as
+                towards limit. Defaults to 1 for every choice
+
+            Returns:
+                - query_positions, choice_positions, scores: Arrays of the
+                first limit exact matches for each resolved query, ordered by
+                query position and then by position in choices
+                - resolved: A boolean array, True for queries with at least
+                limit exact matches
+
+            Notes:
+                - Exact matches are given the optimal score for scorer, which
+                is what rapidfuzz scorers return for identical, non-empty
+                strings
+                - Empty strings are not matched exactly, as some scorers,
+                such as fuzz.WRatio, score these as not matching
+    '''
+    worst_score, optimal_score = _get_scorer_bounds(scorer, scorer_kwargs)
+    dtype = _get_score_dtype(scorer, scorer_kwargs)
+    resolved = np.zeros(len(queries), dtype=bool)
+
+    # Exact matches can only resolve a query where limit is set and the optimal
+    # score meets score_cutoff
+    meets_cutoff = score_cutoff is None or (
+        optimal_score >= score_cutoff if optimal_score > worst_score
+        else optimal_score <= score_cutoff
+    )
+    if limit is None or not meets_cutoff:
+        return (
+            np.array([], dtype=np.int64),
+            np.array([], dtype=np.int64),
+            np.array([], dtype=dtype),
+            resolved,
+        )
+
+    # Join queries and choices on their prepared values
+    # NB: Missing and empty values are excluded
+    df_queries = pd.DataFrame({'key': queries, 'query_position': np.arange(len(queries))})
+    df_choices = pd.DataFrame({'key': choices, 'choice_position': np.arange(len(choices))})
+    df_queries = df_queries[df_queries['key'].notna() & (df_queries['key'] != '')]
+    df_choices = df_choices[df_choices['key'].notna() & (df_choices['key'] != '')]
+    df_exact = df_queries.merge(df_choices, on='key', how='inner')
+
+    query_positions = df_exact['query_position'].to_numpy(dtype=np.int64)
+    choice_positions = df_exact['choice_position'].to_numpy(dtype=np.int64)
+    order = np.lexsort((choice_positions, query_positions))
+    query_positions, choice_positions = query_positions[order], choice_positions[order]
+
+    # Keep queries with at least limit exact matches, and their first limit
+    # matches
+    counts = np.bincount(
+        query_positions,
+        weights=choice_counts[choice_positions] if choice_counts is not None else None,
+        minlength=len(queries),
+    )
+    resolved = counts >= limit
+    rank = np.arange(len(query_positions)) - np.searchsorted(query_positions, query_positions)
+    keep = resolved[query_positions] & (rank < limit)
+
+    return (
+        query_positions[keep],
+        choice_positions[keep],
+        np.full(keep.sum(), optimal_score, dtype=dtype),
+        resolved,
+    )
+
+
+# Define function to expand matches for distinct values to all values
+def _expand_matches(
+    codes: np.ndarray,
+    query_positions: np.ndarray,
+    choice_positions: np.ndarray,
+    scores: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+        Expand matches found for distinct values to every position holding
+        that value.
+
+            Parameters:
+                - codes: For each position, the position of its value in the
+                distinct values, or -1 where the value is missing, as returned
+                by pd.factorize()
+                - query_positions, choice_positions, scores: Matches for the
+                distinct values, ordered by query position
+
+            Returns:
+                - query_positions, choice_positions, scores: Matches for every
+                position, ordered by position and then in the order matches
+                were given for the distinct value
+    '''
+    n_distinct = int(codes.max()) + 1 if len(codes) > 0 else 0
+
+    # Get the number of matches for, and the first match of, each distinct value
+    counts_distinct = np.bincount(query_positions, minlength=n_distinct)
+    starts_distinct = np.cumsum(counts_distinct) - counts_distinct
+
+    # Repeat each position once per match for its value
+    counts = np.where(codes >= 0, counts_distinct[np.maximum(codes, 0)], 0)
+    expanded_positions = np.repeat(np.arange(len(codes), dtype=np.int64), counts)
+    within = np.arange(len(expanded_positions)) - np.repeat(np.cumsum(counts) - counts, counts)
+    source = starts_distinct[codes[expanded_positions]] + within
+
+    return expanded_positions, choice_positions[source], scores[source]
+
+
+# Define function to expand matches for distinct choices to all choices
+def _expand_choices(
+    codes: np.ndarray,
+    query_positions: np.ndarray,
+    choice_positions: np.ndarray,
+    scores: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+        Expand matches found against distinct choices to every position
+        holding that choice.
+
+            Parameters:
+                - codes: For each position, the position of its value in the
+                distinct choices, or -1 where the value is missing, as
+                returned by pd.factorize()
+                - query_positions, choice_positions, scores: Matches against
+                the distinct choices
+
+            Returns:
+                - query_positions, choice_positions, scores: Matches against
+                every position, with matches against each distinct choice
+                replaced by one match per position holding it, in order of
+                position
+    '''
+    n_distinct = int(codes.max()) + 1 if len(codes) > 0 else 0
+
+    # Group positions by distinct choice
+    valid = np.flatnonzero(codes >= 0)
+    grouped_positions = valid[np.argsort(codes[valid], kind='stable')]
+    counts_distinct = np.bincount(codes[valid], minlength=n_distinct)
+    starts_distinct = np.cumsum(counts_distinct) - counts_distinct
+
+    # Repeat each match once per position holding its choice
+    counts = counts_distinct[choice_positions]
+    within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    source = np.repeat(starts_distinct[choice_positions], counts) + within
+
+    return (
+        np.repeat(query_positions, counts),
+        grouped_positions[source],
+        np.repeat(scores, counts),
+    )
+
+
+# Define function to find matches using the chosen engine
+def _extract(
+    queries: np.ndarray,
+    choices: np.ndarray,
+    engine: Literal['extract', 'cdist'],
+    score_cutoff: Optional[float],
+    limit: Optional[int],
+    scorer: Callable,
+    scorer_kwargs: dict[str, Any],
+    chunk_size: int,
+    workers: int,
+    index: Optional[_QGramIndex] = None,
+    length_blocking: bool = False,
+    prefilter: Optional[Callable] = None,
+    prefilter_cutoff: Optional[float] = None,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, dict[str, int]]:
+    '''
+        Find matches for each query using the chosen engine.
+
+            Parameters:
+                - queries: The prepared values we want to find matches for
+                - choices: The prepared values in which we want to look for
+                matches
+                - engine, chunk_size, workers: How matches are found. See
+                fuzzy_match()
+                - score_cutoff, limit, scorer, scorer_kwargs: See
+                fuzzy_match()
+                - index: A q-gram index built from choices. If given, each
+                query is only scored against candidates from the index and
+                engine is ignored
+                - length_blocking: Whether to only score queries against
+                choices with lengths for which score_cutoff can be met. See
+                _extract_by_length()
+                - prefilter, prefilter_cutoff: A cheaper scorer used to score
+                every pair before scorer, and the score below which pairs
+                aren't scored with scorer. If given, engine is ignored. See
+                _extract_prefiltered()
+
+            Returns:
+                - query_positions, choice_positions, scores: Arrays of
+                matches, ordered by query position and then from best to
+                worst match
+                - counters: A dict of counts of work done, with key
+                pairs_scored and, where prefilter is given,
+                pairs_prefiltered
+    '''
+    if engine not in ['extract', 'cdist']:
+        raise ValueError(
+            f'Invalid value for engine: {engine}. '
+            'Valid values are "extract", "cdist".'
+        )
+
+    if length_blocking:
+        return _extract_by_length(
+            queries,
+            choices,
+            engine=engine,
+            score_cutoff=score_cutoff,
+            limit=limit,
+            scorer=scorer,
+            scorer_kwargs=scorer_kwargs,
+            chunk_size=chunk_size,
+            workers=workers,
+            prefilter=prefilter,
+            prefilter_cutoff=prefilter_cutoff,
+        )
+    elif index is not None:
+        return _extract_blocked(
+            queries,
+            choices,
+            index=index,
+            score_cutoff=score_cutoff,
+            limit=limit,
+            scorer=scorer,
+            scorer_kwargs=scorer_kwargs,
+        )
+    elif prefilter is not None:
+        return _extract_prefiltered(
+            queries,
+            choices,
+            prefilter=prefilter,
+            prefilter_cutoff=prefilter_cutoff,
+            score_cutoff=score_cutoff,
+            limit=limit,
+            scorer=scorer,
+            scorer_kwargs=scorer_kwargs,
+            chunk_size=chunk_size,
+            workers=workers,
+        )
+    elif engine == 'extract':
+        return _extract_apply(
+            queries,
+            choices,
+            score_cutoff=score_cutoff,
+            limit=limit,
+            scorer=scorer,
+            scorer_kwargs=scorer_kwargs,
+        )
+    elif engine == 'cdist':
+        return _extract_cdist(
+            queries,
+            choices,
+            score_cutoff=score_cutoff,
+            limit=limit,
+            scorer=scorer,
+            scorer_kwargs=scorer_kwargs,
+            chunk_size=chunk_size,
+            workers=workers,
+        )
+
+
+# Define function to find matches, only scoring pairs that meet a cheaper scorer
+def _extract_prefiltered(
+    queries: np.ndarray,
+    choices: np.ndarray,
+    prefilter: Callable,
+    prefilter_cutoff: Optional[float],
+    score_cutoff: Optional[float],
+    limit: Optional[int],
+    scorer: Callable,
+    scorer_kwargs: dict[str, Any],
+    chunk_size: int,
+    workers: int,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, dict[str, int]]:
+    '''
+        Find matches for each query, only scoring choices with scorer where
+        they meet prefilter_cutoff with prefilter.
+
+            Parameters:
+                - See _extract()
+
+            Returns:
+                - query_positions, choice_positions, scores, counters: See
+                _extract()
+
+            Notes:
+                - prefilter is run in blocks of chunk_size queries using
+                process.cdist(), and scorer is run for each query on the
+                choices left using process.extract()
+                - Blocks are made smaller than chunk_size where needed, so
+                that the prefilter scores of a block take up at most
+                _CDIST_MEMORY_BUDGET bytes, as in _extract_cdist()
+    '''
+    worst_score, optimal_score = _get_scorer_bounds(prefilter, {})
+    sign = 1 if optimal_score > worst_score else -1
+
+    # NB: Prefilter scores are only compared with prefilter_cutoff, so are held at
+    # process.cdist()'s default 32-bit precision
+    dtype = np.int32 if _get_score_dtype(prefilter, {}) == np.int64 else np.float32
+
+    query_positions_valid = np.flatnonzero(pd.notna(queries))
+    choice_positions_valid = np.flatnonzero(pd.notna(choices))
+    choices_valid = choices[choice_positions_valid]
+
+    # Limit the size of blocks to _CDIST_MEMORY_BUDGET
+    block_size = max(
+        1,
+        min(
+            chunk_size,
+            _CDIST_MEMORY_BUDGET // max(len(choices_valid) * np.dtype(dtype).itemsize, 1),
+        ),
+    )
+
+    query_positions, choice_positions, scores = [], [], []
+    pairs_scored = 0
+
+    if len(choices_valid) > 0:
+        for start in range(0, len(query_positions_valid), block_size):
+            block = query_positions_valid[start:start + block_size]
+
+            block_scores = process.cdist(
+                queries[block],
+                choices_valid,
+                scorer=prefilter,
+                processor=None,
+                score_cutoff=prefilter_cutoff,
+                dtype=dtype,
+                workers=workers,
+            )
+            if prefilter_cutoff is not None:
+                survivors = sign * block_scores >= sign * prefilter_cutoff
+            else:
+                survivors = np.ones(block_scores.shape, dtype=bool)
+
+            for i, row in zip(block, survivors):
+                candidates = choice_positions_valid[np.flatnonzero(row)]
+                pairs_scored += len(candidates)
+
+                # NB: candidates are sorted, so ties are ordered by position in choices
+                for _, score, j in process.extract(
+                    queries[i],
+                    choices[candidates].tolist(),
+                    limit=limit,
+                    score_cutoff=score_cutoff,
+                    processor=None,
+                    scorer=scorer,
+                    scorer_kwargs=scorer_kwargs,
+                ):
+                    query_positions.append(i)
+                    choice_positions.append(candidates[j])
+                    scores.append(score)
+
+    return (
+        np.array(query_positions, dtype=np.int64),
+        np.array(choice_positions, dtype=np.int64),
+        np.array(scores, dtype=_get_score_dtype(scorer, scorer_kwargs)),
+        {
+            'pairs_scored': pairs_scored,
+            'pairs_prefiltered': len(query_positions_valid) * len(choices_valid),
+        },
+    )
+
+
+# Define function to find matches only between values of compatible lengths
+def _extract_by_length(
+    queries: np.ndarray,
+    choices: np.ndarray,
+    engine: Literal['extract', 'cdist'],
+    score_cutoff: Optional[float],
+    limit: Optional[int],
+    scorer: Callable,
+    scorer_kwargs: dict[str, Any],
+    chunk_size: int,
+    workers: int,
+    prefilter: Optional[Callable] = None,
+    prefilter_cutoff: Optional[float] = None,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, dict[str, int]]:
+    '''
+        Find matches for each query, only scoring choices with lengths for
+        which score_cutoff can be met.
+
+            Parameters:
+                - See _extract()
+
+            Returns:
+                - query_positions, choice_positions, scores, counters: See
+                _extract()
+
+            Notes:
+                - The Levenshtein distance between two strings is at least
+                the difference in their lengths, so where the scorer has a
+                known bound on edit distance (see _get_max_edits()), choices
+                whose length differs from the query's by more than this can't
+                meet score_cutoff. No matches are lost
+                - Queries are grouped by length, and each group is scored
+                against the choices of compatible lengths using engine
+                - For other scorers, all choices are scored
+    '''
+    max_edits = _get_max_edits(scorer, scorer_kwargs, score_cutoff)
+    kwargs = {
+        'engine': engine,
+        'score_cutoff': score_cutoff,
+        'limit': limit,
+        'scorer': scorer,
+        'scorer_kwargs': scorer_kwargs,
+        'chunk_size': chunk_size,
+        'workers': workers,
+        'prefilter': prefilter,
+        'prefilter_cutoff': prefilter_cutoff,
+    }
+
+    if max_edits is None:
+        return _extract(queries, choices, **kwargs)
+
+    query_lengths = np.array([-1 if x is None else len(x) for x in queries], dtype=np.int64)
+    choice_lengths = np.array([-1 if x is None else len(x) for x in choices], dtype=np.int64)
+    length_values = np.unique(choice_lengths[choice_lengths >= 0])
+
+    results = []
+
+    for length_query in np.unique(query_lengths[query_lengths >= 0]):
+        compatible = length_values[
+            np.abs(length_query - length_values) <= max_edits(length_query, length_values)
+        ]
+        query_positions = np.flatnonzero(query_lengths == length_query)
+        choice_positions = np.flatnonzero(np.isin(choice_lengths, compatible))
+
+        # NB: choice_positions are sorted, so ties are ordered by position in choices
+        group_query_positions, group_choice_positions, scores, counters = _extract(
+            queries[query_positions],
+            choices[choice_positions],
+            **kwargs,
+        )
+        results.append((
+            query_positions[group_query_positions],
+            choice_positions[group_choice_positions],
+            scores,
+            counters,
+        ))
+
+    if len(results) == 0:
+        return _extract(queries[:0], choices, **kwargs)
+
+    # Order matches by query position, keeping the order of matches for each query
+    query_positions = np.concatenate([result[0] for result in results])
+    order = np.argsort(query_positions, kind='stable')
+
+    return (
+        query_positions[order],
+        np.concatenate([result[1] for result in results])[order],
+        np.concatenate([result[2] for result in results])[order],
+        {key: sum(result[3][key] for result in results) for key in results[0][3]},
+    )
+
+
+# Define functions to pass scorers to worker processes
+# NB: Some rapidfuzz scorers, such as Levenshtein.distance, can't be pickled
+# directly, so these are passed as the name of the module and attribute they
+# can be imported from
+def _scorer_to_reference(scorer: Callable) -> Any:
+    '''
+        Convert a scorer to a form that can be pickled.
+
+            Parameters:
+                - scorer: The scorer to use for fuzzy matching
+
+            Returns:
+                - reference: A (<module>, <name>) tuple where scorer is a
+                rapidfuzz scorer, otherwise scorer itself
+    '''
+    modules = [fuzz] + [
+        importlib.import_module(f'rapidfuzz.distance.{name}')
+        for name in ['DamerauLevenshtein', 'Hamming', 'Indel', 'Jaro', 'JaroWinkler',
+                     'LCSseq', 'Levenshtein', 'OSA', 'Prefix', 'Postfix']
+    ]
+
+    for module in modules:
+        for name in dir(module):
+            if getattr(module, name) is scorer:
+                return (module.__name__, name)
+
+    return scorer
+
+
+def _scorer_from_reference(reference: Any) -> Callable:
+    '''
+        Convert the output of _scorer_to_reference() back to a scorer.
+    '''
+    if isinstance(reference, tuple):
+        return getattr(importlib.import_module(reference[0]), reference[1])
+
+    return reference
+
+
+# Define functions to pack strings into flat arrays
+# NB: Strings are stored as UTF-8 encoded bytes, with the offset of each string in
+# the bytes and a flag for each missing value, so that they can be shared between
+# processes or saved to disk without pickling
+def _pack_strings(strings: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+        Pack strings into flat arrays.
+
+            Parameters:
+                - strings: An object array of strings and missing values
+
+            Returns:
+                - offsets: The offsets of each string in data, with the end
+                of the last string appended
+                - data: The UTF-8 encoded strings, as uint8
+                - missing: Whether each value is missing
+    '''
+    missing = np.array([not isinstance(x, str) for x in strings], dtype=bool)
+    encoded = [x.encode('utf-8') if isinstance(x, str) else b'' for x in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(x) for x in encoded])
+
+    return offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8), missing
+
+
+def _unpack_strings(offsets: np.ndarray, data: np.ndarray, missing: np.ndarray) -> np.ndarray:
+    '''
+        Unpack strings packed by _pack_strings().
+
+            Parameters:
+                - offsets, data, missing: The output of _pack_strings()
+
+            Returns:
+                - strings: An object array of strings, with None for missing
+                values
+    '''
+    data = data.tobytes()
+    offsets = offsets.tolist()
+    missing = missing.tolist()
+
+    strings = np.empty(len(missing), dtype=object)
+    strings[:] = [
+        None if missing[i] else data[offsets[i]:offsets[i + 1]].decode('utf-8')
+        for i in range(len(missing))
+    ]
+
+    return strings
+
+
+# Define functions to share prepared choices between processes
+# NB: Choices are stored in a single shared memory block, as a count, followed by
+# the output of _pack_strings(). Each worker process decodes these once and caches
+# them, so that they aren't pickled into every task
+_shared_choices: dict[Any, Any] = {}
+
+
+def _share_choices(choices: np.ndarray) -> shared_memory.SharedMemory:
+    '''
+        Copy prepared choices into shared memory.
+
+            Parameters:
+                - choices: The prepared values
+
+            Returns:
+                - shm: The shared memory block. The caller is responsible for
+                closing and unlinking this
+    '''
+    offsets, data, missing = _pack_strings(choices)
+    header = np.concatenate([[len(choices)], offsets]).astype(np.int64).tobytes()
+    header += missing.astype(np.uint8).tobytes()
+
+    shm = shared_memory.SharedMemory(create=True, size=len(header) + len(data) + 1)
+    shm.buf[:len(header)] = header
+    shm.buf[len(header):len(header) + len(data)] = data.tobytes()
+
+    return shm
+
+
+def _attach_choices(name: str) -> np.ndarray:
+    '''
+        Get prepared choices from shared memory created by _share_choices().
+
+            Parameters:
+                - name: The name of the shared memory block
+
+            Returns:
+                - choices: An object array of the prepared values
+    '''
+    if name not in _shared_choices:
+        shm = shared_memory.SharedMemory(name=name)
+        count = int.from_bytes(shm.buf[:8], byteorder=sys.byteorder, signed=True)
+        offsets = np.frombuffer(bytes(shm.buf[8:8 * (count + 2)]), dtype=np.int64)
+        header_size = 8 * (count + 2) + count
+        missing = np.frombuffer(bytes(shm.buf[8 * (count + 2):header_size]), dtype=np.uint8)
+        data = np.frombuffer(bytes(shm.buf[header_size:header_size + offsets[-1]]), dtype=np.uint8)
+        shm.close()
+        choices = _unpack_strings(offsets, data, missing.astype(bool))
+
+        # Only keep the choices for the most recent call
+        _shared_choices.clear()
+        _shared_choices[name] = choices
+
+    return _shared_choices[name]
+
+
+def _extract_shard(
+    name: str,
+    queries: np.ndarray,
+    scorer: Any,
+    qgram_size: Optional[int],
+    prefilter: Any = None,
+    **kwargs,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, dict[str, int]]:
+    '''
+        Find matches for a shard of queries against shared choices.
+
+            Parameters:
+                - name: The name of the shared memory block holding choices
+                - queries: The prepared values we want to find matches for
+                - scorer, prefilter: The output of _scorer_to_reference()
+                - qgram_size: If given, the size of q-grams in a q-gram index
+                built from choices, which is used to find candidates
+                - kwargs: Keyword arguments to pass to _extract()
+
+            Returns:
+                - query_positions, choice_positions, scores, counters: See
+                _extract()
+
+            Notes:
+                - The q-gram index is built once in each worker process and
+                cached alongside choices
+    '''
+    choices = _attach_choices(name)
+    index = None
+
+    if qgram_size is not None:
+        if (name, qgram_size) not in _shared_choices:
+            _shared_choices[(name, qgram_size)] = _QGramIndex(choices, qgram_size)
+        index = _shared_choices[(name, qgram_size)]
+
+    return _extract(
+        queries,
+        choices,
+        scorer=_scorer_from_reference(scorer),
+        index=index,
+        prefilter=_scorer_from_reference(prefilter),
+        **kwargs,
+    )
+
+
+# Define function to find matches in parallel processes
+def _extract_parallel(
+    queries: np.ndarray,
+    choices: np.ndarray,
+    n_jobs: int,
+    executor: Optional[Executor],
+    scorer: Callable,
+    qgram_size: Optional[int] = None,
+    prefilter: Optional[Callable] = None,
+    **kwargs,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, dict[str, int]]:
+    '''
+        Find matches for each query, splitting queries into shards that are
+        scored in separate processes.
+
+            Parameters:
+                - queries: The prepared values we want to find matches for
+                - choices: The prepared values in which we want to look for
+                matches
+                - n_jobs: The number of shards to split queries into, and the
+                number of processes to use where executor is None. -1 uses
+                all available cores
+                - executor: An existing executor to submit shards to
+                - scorer: The scorer to use for fuzzy matching
+                - qgram_size: If given, the size of q-grams in a q-gram index
+                used to find candidates. See _extract_shard()
+                - prefilter: A cheaper scorer used to score every pair before
+                scorer. See _extract()
+                - kwargs: Keyword arguments to pass to _extract()
+
+            Returns:
+                - query_positions, choice_positions, scores, counters: See
+                _extract()
+
+            Notes:
+                - Shards are combined in the order of queries, so output is the
+                same as from _extract()
+    '''
+    if n_jobs == -1:
+        n_jobs = os.cpu_count() or 1
+
+    # Drop missing values, so that choices can be shared as strings
+    query_positions_valid = np.flatnonzero(pd.notna(queries))
+    choice_positions_valid = np.flatnonzero(pd.notna(choices))
+    shards = np.array_split(query_positions_valid, max(n_jobs, 1))
+
+    shm = _share_choices(choices[choice_positions_valid])
+
+    try:
+        pool = executor or ProcessPoolExecutor(max_workers=n_jobs)
+
+        try:
+            results = list(pool.map(
+                partial(
+                    _extract_shard,
+                    shm.name,
+                    scorer=_scorer_to_reference(scorer),
+                    qgram_size=qgram_size,
+                    prefilter=_scorer_to_reference(prefilter) if prefilter else None,
+                    **kwargs,
+                ),
+                [queries[shard] for shard in shards],
+            ))
+        finally:
+            if executor is None:
+                pool.shutdown()
+    finally:
+        shm.close()
+        shm.unlink()
+
+    # Convert positions within shards back to positions within queries and choices
+    return (
+        np.concatenate(
+            [shard[result[0]] for shard, result in zip(shards, results)]
+        ).astype(np.int64),
+        np.concatenate(
+            [choice_positions_valid[result[1]] for result in results]
+        ).astype(np.int64),
+        np.concatenate([result[2] for result in results]),
+        {key: sum(result[3][key] for result in results) for key in results[0][3]},
+    )
+
+
+# Define function to get the checksum of a file
+def _get_checksum(path: str) -> int:
+    '''
+        Get the CRC-32 checksum of a file.
+
+            Parameters:
+                - path: The path to the file
+
+            Returns:
+                - checksum: The checksum
+    '''
+    checksum = 0
+
+    with open(path, 'rb') as f:
+        for block in iter(partial(f.read, 1 << 20), b''):
+            checksum = zlib.crc32(block, checksum)
+
+    return checksum
+
+
+# Define version of the format FuzzyIndex.save() writes
+# NB: This should be incremented whenever the files written change, so that indexes
+# saved in an older format aren't misread
+_INDEX_VERSION = 1
+
+
+# Define class holding prepared values from df_right
+class FuzzyIndex(_LazyAttributes):
+    '''
+        Prepared values from column_right of df_right, which can be matched
+        against more than once.
+
+            Parameters:
+                - df_right: The dataframe in which we want to look for matches
+                - column_right: Column on which to match
+                - clean_strings: Whether to apply rapidfuzz's default_process
+                processor, which converts strings to lowercase, removes
+                non-alphanumeric characters and trims whitespace
+                - scorer: The scorer query() uses for fuzzy matching
+                - scorer_kwargs: Keyword arguments to pass to scorer
+                - blocking, qgram_size: How query() limits the rows of
+                df_right each row of df_left is scored against. See
+                fuzzy_match()
+
+            Attributes:
+                - frame: df_right, including rows added with add() and rows
+                marked as removed with remove()
+                - column_right: column_right
+                - values: The values in column_right, before any cleaning
+                - ids: The index of df_right
+                - clean_strings, scorer, scorer_kwargs, blocking, qgram_size:
+                As passed
+                - distinct: The distinct prepared values, in order of first
+                appearance
+                - codes: For each row of df_right, the position of its
+                prepared value in distinct, or -1 where it is missing
+                - counts: For each distinct value, the number of rows of
+                df_right holding it
+
+            Notes:
+                - A FuzzyIndex can be passed to fuzzy_match(), fuzzy_merge(),
+                fuzzy_match_iter() and fuzzy_match_file() in place of
+                df_right, in which case its clean_strings is used in place of
+                theirs
+                - Where blocking is 'qgram', the q-gram index is built
+                up front. Otherwise q-gram indexes are built over distinct on
+                first use and cached
+                - Rows can be changed with add(), remove() and update(), at a
+                cost depending on the number of rows changed rather than the
+                number of rows in the index
+                - Indexes can be saved to a directory with save() and opened
+                again, memory-mapped, with load()
+    '''
+    def __init__(
+        self,
+        df_right: pd.DataFrame,
+        column_right: Hashable,
+        clean_strings: bool = True,
+        scorer: Callable = fuzz.WRatio,
+        scorer_kwargs: dict[str, Any] = {},
+        blocking: Literal[None, 'qgram', 'length'] = None,
+        qgram_size: int = 3,
+    ):
+        if blocking not in [None, 'qgram', 'length']:
+            raise ValueError(
+                f'Invalid value for blocking: {blocking}. '
+                'Valid values are None, "qgram", "length".'
+            )
+
+        self.column_right = column_right
+        self.clean_strings = clean_strings
+        self.scorer = scorer
+        self.scorer_kwargs = scorer_kwargs
+        self.blocking = blocking
+        self.qgram_size = qgram_size
+
+        self._qgram_indexes: dict[int, _QGramIndex] = {}
+        self._build(df_right, _prepare_strings(df_right[column_right], clean_strings))
+
+    def _build(self, df_right: pd.DataFrame, prepared: np.ndarray):
+        '''
+            Build the index from scratch.
+
+                Parameters:
+                    - df_right: The dataframe to index
+                    - prepared: The prepared values in column_right of df_right
+        '''
+        self.frame = df_right
+        self.values = df_right[self.column_right].to_numpy()
+        self.ids = df_right.index
+
+        # Deduplicate values
+        # NB: Each distinct value is only scored once, and its matches are then
+        # expanded to every row of df_right with that value
+        # NB: Distinct values are in order of first appearance, so ties between them
+        # are ordered by the position of their first row in df_right
+        codes, distinct = pd.factorize(prepared)
+        self.codes = codes
+        self.distinct = np.asarray(distinct, dtype=object)
+        self.counts = np.bincount(codes[codes >= 0], minlength=len(self.distinct))
+        self._removed = np.zeros(len(df_right), dtype=bool)
+        self._distinct_positions: Optional[dict[str, int]] = None
+        self._first_positions = self._get_first_positions()
+
+        # Build q-gram indexes
+        # NB: Any q-gram indexes already built are rebuilt
+        qgram_sizes = set(self._qgram_indexes)
+        if self.blocking == 'qgram':
+            qgram_sizes.add(self.qgram_size)
+        self._qgram_indexes = {
+            qgram_size: _QGramIndex(self.distinct, qgram_size) for qgram_size in qgram_sizes
+        }
+
+    def __len__(self) -> int:
+        return int((~self._removed).sum())
+
+    def _get_first_positions(self) -> np.ndarray:
+        '''
+            Get the position of the first row holding each distinct value.
+
+                Returns:
+                    - first_positions: For each distinct value, the position
+                    of its first row that hasn't been removed, or the number
+                    of rows where it has none
+        '''
+        first_positions = np.full(len(self.counts), len(self.codes), dtype=np.int64)
+        valid = np.flatnonzero(self.codes >= 0)
+        distinct_positions, first = np.unique(self.codes[valid], return_index=True)
+        first_positions[distinct_positions] = valid[first]
+
+        return first_positions
+
+    def _reorder(self):
+        '''
+            Reorder distinct values by the position of their first row, with
+            distinct values without rows last.
+        '''
+        order = np.argsort(
+            np.where(self.counts > 0, self._first_positions, len(self.codes)), kind='stable'
+        )
+        inverse = np.empty_like(order)
+        inverse[order] = np.arange(len(order))
+
+        self.distinct = self.distinct[order]
+        self.counts = self.counts[order]
+        self._first_positions = self._first_positions[order]
+        self.codes = np.where(self.codes >= 0, inverse[np.maximum(self.codes, 0)], -1)
+        self._distinct_positions = None
+        for index in self._qgram_indexes.values():
+            index.reorder(order, inverse)
+
+    def add(self, rows: pd.DataFrame):
+        '''
+            Add rows to the index, after the existing rows.
+
+                Parameters:
+                    - rows: A dataframe with the same columns as df_right,
+                    whose index values aren't already in the index
+
+                Notes:
+                    - Only the values in rows are prepared, deduplicated and
+                    split into q-grams. Arrays holding existing rows are
+                    copied when extended and q-gram indexes are extended with
+                    _QGramIndex.add(), so this still takes time proportional
+                    to the number of rows in the index. Adding rows in larger
+                    batches spreads this cost
+        '''
+        existing = self.ids.get_indexer_for(rows.index)
+        existing = existing[existing >= 0]
+        if rows.index.has_duplicates or (~self._removed[existing]).any():
+            raise ValueError(
+                'Rows to add have index values already in the index. '
+                'Use update() to replace rows.'
+            )
+
+        prepared = _prepare_strings(rows[self.column_right], self.clean_strings)
+
+        # Find the position of each value in distinct, adding values not already
+        # in distinct
+        # NB: The mapping from values to positions is built on first use and kept
+        # up to date
+        if self._distinct_positions is None:
+            self._distinct_positions = {
+                value: d for d, value in enumerate(self.distinct) if value is not None
+            }
+
+        distinct_added = []
+        codes = np.full(len(prepared), -1, dtype=np.int64)
+
+        for i, value in enumerate(prepared):
+            if value is None:
+                continue
+            if value not in self._distinct_positions:
+                self._distinct_positions[value] = len(self.distinct) + len(distinct_added)
+                distinct_added.append(value)
+            codes[i] = self._distinct_positions[value]
+
+        # NB: Added values are in order of first appearance in rows, so stay in order
+        # of their first row
+        added = np.flatnonzero(codes >= len(self.distinct))
+        _, first = np.unique(codes[added], return_index=True)
+        self._first_positions = np.concatenate(
+            [self._first_positions, len(self.codes) + added[first]]
+        )
+
+        distinct_added = np.array(distinct_added, dtype=object)
+        self.distinct = np.concatenate([self.distinct, distinct_added])
+        self.counts = np.concatenate(
+            [self.counts, np.zeros(len(distinct_added), dtype=self.counts.dtype)]
+        )
+        np.add.at(self.counts, codes[codes >= 0], 1)
+        for index in self._qgram_indexes.values():
+            index.add(distinct_added)
+
+        self.frame = pd.concat([self.frame, rows])
+        self.values = np.concatenate([self.values, rows[self.column_right].to_numpy()])
+        self.ids = self.frame.index
+        self.codes = np.concatenate([self.codes, codes])
+        self._removed = np.concatenate([self._removed, np.zeros(len(rows), dtype=bool)])
+
+    def remove(self, ids: Any):
+        '''
+            Remove rows from the index.
+
+                Parameters:
+                    - ids: Index values of the rows to remove
+
+                Notes:
+                    - Removed rows are marked as removed rather than deleted,
+                    and can no longer be matched. Distinct values left without
+                    rows are set to None. Once more rows have been removed than
+                    are left, the index is rebuilt from the rows left, without
+                    preparing values again
+                    - Matches with the same score are ordered by position in
+                    df_right. Until the index is rebuilt, this uses the
+                    positions of rows when they were added
+                    - Distinct values are kept in order of their first row,
+                    as ties between distinct values are ordered by position in
+                    distinct. Where the first row of a value with other rows is
+                    removed, the rows holding that value are found, and if the
+                    order changes distinct values and q-gram postings are
+                    reordered. Both cost time proportional to the number of
+                    rows in the index
+        '''
+        ids = pd.Index(ids)
+        positions = self.ids.get_indexer_for(ids)
+        found = np.unique(positions[positions >= 0])
+        found = found[~self._removed[found]]
+        missing = ids[~ids.isin(self.ids[found])]
+        if len(missing) > 0:
+            raise KeyError(f'Index values not in index: {list(missing)}')
+
+        # Mark rows as removed
+        codes = self.codes[found]
+        valid = codes >= 0
+        found_valid, codes = found[valid], codes[valid]
+        first_removed = codes[self._first_positions[codes] == found_valid]
+        np.subtract.at(self.counts, codes, 1)
+        self.codes[found] = -1
+        self._removed[found] = True
+
+        # Remove distinct values left without rows
+        emptied = np.unique(codes[self.counts[codes] == 0])
+        if self._distinct_positions is not None:
+            for value in self.distinct[emptied]:
+                del self._distinct_positions[value]
+        self.distinct[emptied] = None
+        for index in self._qgram_indexes.values():
+            index.remove(emptied)
+
+        # Rebuild once most rows are removed
+        if self._removed.sum() > len(self):
+            # NB: Appending None to distinct gives rows with a code of -1 None
+            kept = ~self._removed
+            self._build(self.frame[kept], np.append(self.distinct, None)[self.codes[kept]])
+            return
+
+        # Find the new first row of values whose first row was removed, reordering
+        # distinct values where their order no longer follows their first rows
+        moved = np.unique(first_removed[self.counts[first_removed] > 0])
+        if len(moved) > 0:
+            rows = np.flatnonzero(np.isin(self.codes, moved))
+            moved, first = np.unique(self.codes[rows], return_index=True)
+            self._first_positions[moved] = rows[first]
+
+            if (np.diff(self._first_positions[self.counts > 0]) < 0).any():
+                self._reorder()
+
+    def update(self, rows: pd.DataFrame):
+        '''
+            Replace rows in the index.
+
+                Parameters:
+                    - rows: A dataframe with the same columns as df_right,
+                    whose index values are all in the index
+
+                Notes:
+                    - Rows are removed and added again, so replaced rows move
+                    to the end of the index
+        '''
+        self.remove(rows.index)
+        self.add(rows)
+
+    def save(self, path: str):
+        '''
+            Save the index to a directory, so that it can be opened with
+            load().
+
+                Parameters:
+                    - path: The directory to save to. This is created if it
+                    doesn't exist, and any index already saved there is
+                    overwritten
+
+                Notes:
+                    - Prepared values, and values in column_right where these
+                    are all strings, are packed with _pack_strings(). These,
+                    the positions of prepared values, q-gram postings and the
+                    index of df_right, where it has a numpy dtype, are saved
+                    as .npy files. df_right and settings are pickled
+                    - A manifest with the format version and the checksum of
+                    each file is written last
+        '''
+        os.makedirs(path, exist_ok=True)
+
+        arrays = {'codes': self.codes, 'counts': self.counts, 'removed': self._removed}
+        arrays.update(
+            zip(['distinct_offsets', 'distinct_data', 'distinct_missing'],
+                _pack_strings(self.distinct))
+        )
+        pickles = {
+            'settings': {
+                'column_right': self.column_right,
+                'clean_strings': self.clean_strings,
+                'scorer': _scorer_to_reference(self.scorer),
+                'scorer_kwargs': self.scorer_kwargs,
+                'blocking': self.blocking,
+                'qgram_size': self.qgram_size,
+                'qgram_sizes': list(self._qgram_indexes),
+                'ids_name': self.ids.name,
+            },
+            'frame': self.frame,
+        }
+
+        if pd.api.types.infer_dtype(self.values, skipna=True) in ['string', 'empty']:
+            arrays.update(
+                zip(['values_offsets', 'values_data', 'values_missing'],
+                    _pack_strings(self.values))
+            )
+        else:
+            pickles['values'] = self.values
+
+        # NB: Index values with an extension dtype, such as tz-aware datetimes, and
+        # MultiIndexes, which have an object dtype, are pickled
+        if isinstance(self.ids.dtype, np.dtype) and self.ids.dtype.kind in 'biufmM':
+            arrays['ids'] = self.ids.to_numpy()
+        else:
+            pickles['ids'] = self.ids
+
+        for qgram_size, index in self._qgram_indexes.items():
+            arrays.update(
+                (f'qgram_{qgram_size}_{name}', array)
+                for name, array in index.to_arrays().items()
+            )
+
+        # Write files
+        checksums = {}
+
+        for name, array in arrays.items():
+            np.save(os.path.join(path, f'{name}.npy'), np.ascontiguousarray(array))
+            checksums[f'{name}.npy'] = _get_checksum(os.path.join(path, f'{name}.npy'))
+        for name, value in pickles.items():
+            pd.to_pickle(value, os.path.join(path, f'{name}.pkl'))
+            checksums[f'{name}.pkl'] = _get_checksum(os.path.join(path, f'{name}.pkl'))
+
+        with open(os.path.join(path, 'manifest.json'), 'w') as f:
+            json.dump({'version': _INDEX_VERSION, 'checksums': checksums}, f)
+
+    @classmethod
+    def load(cls, path: str, verify: bool = True) -> 'FuzzyIndex':
+        '''
+            Open an index saved with save().
+
+                Parameters:
+                    - path: The directory the index was saved to
+                    - verify: Whether to check the checksum of each file
+                    before opening it
+
+                Returns:
+                    - index: The index
+
+                Notes:
+                    - .npy files are memory-mapped copy-on-write, so processes
+                    opening the same index share one copy in the page cache,
+                    and changes made with add(), remove() and update() aren't
+                    written back to disk
+                    - Prepared values, values in column_right and df_right are
+                    only read on first use
+                    - As settings and df_right are pickled, only indexes from
+                    trusted sources should be opened
+        '''
+        with open(os.path.join(path, 'manifest.json')) as f:
+            manifest = json.load(f)
+
+        if manifest.get('version') != _INDEX_VERSION:
+            raise ValueError(
+                f'Index at {path} has version {manifest.get("version")}. '
+                f'Only version {_INDEX_VERSION} can be opened.'
+            )
+        if verify:
+            for filename, checksum in manifest['checksums'].items():
+                if _get_checksum(os.path.join(path, filename)) != checksum:
+                    raise ValueError(f'Checksum of {filename} in {path} does not match.')
+
+        def load_array(name: str) -> np.ndarray:
+            return np.load(os.path.join(path, f'{name}.npy'), mmap_mode='c')
+
+        def load_pickle(name: str) -> Any:
+            return pd.read_pickle(os.path.join(path, f'{name}.pkl'))
+
+        def load_strings(name: str) -> np.ndarray:
+            return _unpack_strings(
+                load_array(f'{name}_offsets'),
+                load_array(f'{name}_data'),
+                load_array(f'{name}_missing'),
+            )
+
+        settings = load_pickle('settings')
+        index = cls.__new__(cls)
+        index.column_right = settings['column_right']
+        index.clean_strings = settings['clean_strings']
+        index.scorer = _scorer_from_reference(settings['scorer'])
+        index.scorer_kwargs = settings['scorer_kwargs']
+        index.blocking = settings['blocking']
+        index.qgram_size = settings['qgram_size']
+
+        index.codes = load_array('codes')
+        index.counts = load_array('counts')
+        index._removed = load_array('removed')
+        index._distinct_positions = None
+        index.ids = (
+            pd.Index(load_array('ids'), name=settings['ids_name'], copy=False)
+            if 'ids.npy' in manifest['checksums'] else load_pickle('ids')
+        )
+        index._qgram_indexes = {
+            qgram_size: _QGramIndex.from_arrays(
+                qgram_size,
+                {
+                    name: load_array(f'qgram_{qgram_size}_{name}')
+                    for name in [
+                        'lengths', 'indptr', 'positions', 'counts', 'length_values',
+                        'length_indptr', 'length_order', 'gram_offsets', 'gram_data',
+                    ]
+                },
+            )
+            for qgram_size in settings['qgram_sizes']
+        }
+
+        index._loaders = {
+            '_first_positions': index._get_first_positions,
+            'frame': partial(load_pickle, 'frame'),
+            'distinct': partial(load_strings, 'distinct'),
+            'values': (
+                partial(load_strings, 'values')
+                if 'values_offsets.npy' in manifest['checksums']
+                else partial(load_pickle, 'values')
+            ),
+        }
+
+        return index
+
+    def qgram_index(self, qgram_size: int) -> _QGramIndex:
+        '''
+            Get a q-gram index over the distinct values.
+
+                Parameters:
+                    - qgram_size: The number of characters in each q-gram
+
+                Returns:
+                    - index: The q-gram index
+        '''
+        if qgram_size not in self._qgram_indexes:
+            self._qgram_indexes[qgram_size] = _QGramIndex(self.distinct, qgram_size)
+
+        return self._qgram_indexes[qgram_size]
+
+    def query(
+        self,
+        df_left: pd.DataFrame,
+        column_left: Hashable,
+        score_cutoff: int = 90,
+        limit: int = 1,
+        **kwargs,
+    ) -> pd.DataFrame:
+        '''
+            Fuzzy match a dataframe against the index.
+
+                Parameters:
+                    - df_left: The base dataframe which we want to find
+                    matches for
+                    - column_left: Column on which to match
+                    - score_cutoff, limit: See fuzzy_match()
+                    - kwargs: Keyword arguments to pass to fuzzy_match()
+
+                Returns:
+                    - df_matches: A dataframe of matches, in the same form as
+                    the output of fuzzy_match()
+
+                Notes:
+                    - scorer, scorer_kwargs, blocking and qgram_size are taken
+                    from the index, unless passed in kwargs
+        '''
+        kwargs = {
+            'scorer': self.scorer,
+            'scorer_kwargs': self.scorer_kwargs,
+            'blocking': self.blocking,
+            'qgram_size': self.qgram_size,
+            **kwargs,
+        }
+
+        return fuzzy_match(
+            df_left,
+            self,
+            column_left,
+            self.column_right,
+            score_cutoff=score_cutoff,
+            limit=limit,
+            **kwargs,
+        )
+
+
+# Define function to add rows for rows of df_left without matches
+def _add_unmatched(
+    n_left: int,
+    query_positions: np.ndarray,
+    choice_positions: np.ndarray,
+    scores: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+        Add a row for each row of df_left without matches.
+
+            Parameters:
+                - n_left: The number of rows in df_left
+                - query_positions, choice_positions, scores: Matches, ordered
+                by position in df_left
+
+            Returns:
+                - query_positions, choice_positions, scores: Matches, with a
+                row for each row of df_left without matches, which has a
+                choice position of -1 and a score of NaN
+
+            Notes:
+                - Matches are ordered by position in df_left, so each row of
+                df_left takes up max(1, number of matches) rows of output, and
+                matches fill the rows belonging to rows of df_left with
+                matches in order
+    '''
+    counts = np.bincount(query_positions, minlength=n_left)
+
+    if not (counts == 0).any():
+        return query_positions, choice_positions, scores
+
+    rows = np.maximum(counts, 1)
+    matched = np.repeat(counts > 0, rows)
+    choice_positions_all = np.full(len(matched), -1, dtype=np.int64)
+    choice_positions_all[matched] = choice_positions
+    scores_all = np.full(len(matched), np.nan)
+    scores_all[matched] = scores
+
+    return np.repeat(np.arange(n_left), rows), choice_positions_all, scores_all
+
+
+# Define function to create a dataframe of matches from their positions
+def _get_matches_frame(
+    df_left: pd.DataFrame,
+    ids: pd.Index,
+    values: np.ndarray,
+    query_positions: np.ndarray,
+    choice_positions: np.ndarray,
+    scores: np.ndarray,
+) -> pd.DataFrame:
+    '''
+        Create a dataframe of matches from the positions of matches in df_left
+        and df_right.
+
+            Parameters:
+                - df_left: The dataframe matches were found for
+                - ids: The index of df_right
+                - values: The values in column_right of df_right, before any
+                cleaning
+                - query_positions, choice_positions, scores: Matches, where
+                choice_positions is -1 where no match was found
+
+            Returns:
+                - df_matches: See fuzzy_match()
+    '''
+    # NB: The index is a MultiIndex made up of the ids from df_left and df_right,
+    # built in one step from the positions of matches
+    # NB: Where df_left or df_right has a MultiIndex, the relevant id is a tuple, as
+    # otherwise any subsequent merging will fail
+    # NB: match_string is the value from df_right before any cleaning
+    # NB: Where there are no matches, columns are left as object dtype
+    # NB: This will be a unique index, as long as df_left and df_right have unique
+    # indexes
+    return pd.DataFrame(
+        index=pd.MultiIndex.from_arrays(
+            [
+                df_left.index.to_flat_index().take(query_positions),
+                pd.api.extensions.take(
+                    ids.to_flat_index().to_numpy(), choice_positions, allow_fill=True
+                ),
+            ],
+            names=['df_left_id', 'df_right_id']
+        ),
+        data={
+            'match_string': pd.api.extensions.take(values, choice_positions, allow_fill=True),
+            'match_score': scores,
+        },
+        dtype=object if len(query_positions) == 0 else None,
+    )
+
+
+# Define function to find matches and their positions in df_left and df_right
+def _fuzzy_match(
+    df_left: pd.DataFrame,
+    df_right: Union[pd.DataFrame, FuzzyIndex],
+    column_left: Hashable,
+    column_right: Hashable,
+    score_cutoff: int = 90,
+    limit: int = 1,
+    clean_strings: bool = True,
+    drop_na: bool = True,
+    scorer: Callable = fuzz.WRatio,
+    scorer_kwargs: dict[str, Any] = {},
+    engine: Literal['extract', 'cdist'] = 'extract',
+    chunk_size: int = 1000,
+    workers: int = 1,
+    n_jobs: int = 1,
+    executor: Optional[Executor] = None,
+    blocking: Literal[None, 'qgram', 'length'] = None,
+    qgram_size: int = 3,
+    exact_first: bool = False,
+    limit_duplicates: Literal['each', 'once'] = 'each',
+    prefilter: Optional[Callable] = None,
+    prefilter_cutoff: float = 50,
+    prefilter_sample: int = 0,
+) -> tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+    '''
+        Fuzzy match two dataframes, returning the positions of matches
+        alongside the dataframe of matches.
+
+            Parameters:
+                - See fuzzy_match()
+
+            Returns:
+                - df_matches: See fuzzy_match()
+                - query_positions: The position in df_left of each row of
+                df_matches
+                - choice_positions: The position in df_right of each row of
+                df_matches, or -1 where no match was found
+    '''
+    # Prepare strings
+    # NB: This is done once for each dataframe, rather than once per comparison
+    # NB: Where df_right is a FuzzyIndex it has already been prepared, and values from
+    # df_left are prepared in the same way
+    if isinstance(df_right, FuzzyIndex):
+        right = df_right
+        clean_strings = right.clean_strings
+    else:
+        right = FuzzyIndex(df_right, column_right, clean_strings)
+    queries = _prepare_strings(df_left[column_left], clean_strings)
+
+    if blocking not in [None, 'qgram', 'length']:
+        raise ValueError(
+            f'Invalid value for blocking: {blocking}. '
+            'Valid values are None, "qgram", "length".'
+        )
+    if blocking == 'qgram' and prefilter is not None:
+        raise ValueError('prefilter can\'t be used where blocking is "qgram".')
+
+    # Deduplicate values in df_left
+    # NB: Each distinct value is only matched once, and its matches are then expanded
+    # to every row of df_left with that value
+    # NB: Missing values are given a code of -1
+    query_codes, queries = pd.factorize(queries)
+    queries = np.asarray(queries, dtype=object)
+
+    if limit_duplicates not in ['each', 'once']:
+        raise ValueError(
+            f'Invalid value for limit_duplicates: {limit_duplicates}. '
+            'Valid values are "each", "once".'
+        )
+
+    # Get distinct values in df_right
+    # NB: See FuzzyIndex
+    choices, choice_codes, choice_counts = right.distinct, right.codes, right.counts
+
+    # Find exact matches
+    # NB: Rows of df_left resolved by exact matches are excluded from fuzzy matching
+    if exact_first:
+        exact_query_positions, exact_choice_positions, exact_scores, resolved = _extract_exact(
+            queries,
+            choices,
+            score_cutoff=score_cutoff,
+            limit=limit,
+            scorer=scorer,
+            scorer_kwargs=scorer_kwargs,
+            choice_counts=choice_counts if limit_duplicates == 'each' else None,
+        )
+        queries_fuzzy = np.where(resolved, None, queries)
+    else:
+        resolved = np.zeros(len(queries), dtype=bool)
+        queries_fuzzy = queries
+
+    # Find matches
+    # NB: Matches are returned as arrays of the positions of matches in df_left and
+    # df_right, and their scores
+    # NB: Where n_jobs is not 1 or an executor is given, df_left is split into shards
+    # which are scored in separate processes
+    qgram_size = qgram_size if blocking == 'qgram' else None
+
+    if n_jobs == 1 and executor is None:
+        query_positions, choice_positions, scores, counters = _extract(
+            queries_fuzzy,
+            choices,
+            index=right.qgram_index(qgram_size) if qgram_size is not None else None,
+            length_blocking=blocking == 'length',
+            prefilter=prefilter,
+            prefilter_cutoff=prefilter_cutoff,
+            engine=engine,
+            score_cutoff=score_cutoff,
+            limit=limit,
+            scorer=scorer,
+            scorer_kwargs=scorer_kwargs,
+            chunk_size=chunk_size,
+            workers=workers,
+        )
+    else:
+        query_positions, choice_positions, scores, counters = _extract_parallel(
+            queries_fuzzy,
+            choices,
+            n_jobs=n_jobs,
+            executor=executor,
+            qgram_size=qgram_size,
+            length_blocking=blocking == 'length',
+            prefilter=prefilter,
+            prefilter_cutoff=prefilter_cutoff,
+            engine=engine,
+            score_cutoff=score_cutoff,
+            limit=limit,
+            scorer=scorer,
+            scorer_kwargs=scorer_kwargs,
+            chunk_size=chunk_size,
+            workers=workers,
+        )
+
+    # Measure the share of matches found without prefilter that are found with it, for
+    # a sample of distinct values from df_left
+    # NB: The sample is scored in the same way, other than prefilter
+    prefilter_recall = None
+
+    if prefilter is not None and prefilter_sample > 0:
+        sample = np.flatnonzero(pd.notna(queries_fuzzy))
+        sample = np.sort(
+            np.random.default_rng(0).choice(
+                sample, min(prefilter_sample, len(sample)), replace=False
+            )
+        )
+        sample_query_positions, sample_choice_positions, _, _ = _extract(
+            queries_fuzzy[sample],
+            choices,
+            index=right.qgram_index(qgram_size) if qgram_size is not None else None,
+            length_blocking=blocking == 'length',
+            engine=engine,
+            score_cutoff=score_cutoff,
+            limit=limit,
+            scorer=scorer,
+            scorer_kwargs=scorer_kwargs,
+            chunk_size=chunk_size,
+            workers=workers,
+        )
+        expected = sample[sample_query_positions] * len(choices) + sample_choice_positions
+        found = query_positions * len(choices) + choice_positions
+        prefilter_recall = float(np.isin(expected, found).mean()) if len(expected) > 0 else 1.0
+
+    # Combine exact and fuzzy matches, ordered by position in distinct values
+    if exact_first:
+        query_positions = np.concatenate([query_positions, exact_query_positions])
+        order = np.argsort(query_positions, kind='stable')
+        query_positions = query_positions[order]
+        choice_positions = np.concatenate([choice_positions, exact_choice_positions])[order]
+        scores = np.concatenate([scores, exact_scores])[order]
+
+    # Expand matches to all rows of df_right
+    # NB: Where limit_duplicates is 'each', the top limit distinct values include the
+    # top limit rows, so matches are reordered by score and position in df_right and
+    # truncated to limit
+    query_positions, choice_positions, scores = _expand_choices(
+        choice_codes,
+        query_positions,
+        choice_positions,
+        scores,
+    )
+
+    worst_score, optimal_score = _get_scorer_bounds(scorer, scorer_kwargs)
+    sign = 1 if optimal_score > worst_score else -1
+    order = np.lexsort((choice_positions, -sign * scores, query_positions))
+    query_positions = query_positions[order]
+    choice_positions = choice_positions[order]
+    scores = scores[order]
+
+    if limit_duplicates == 'each' and limit is not None:
+        rank = np.arange(len(query_positions)) - np.searchsorted(query_positions, query_positions)
+        query_positions = query_positions[rank < limit]
+        choice_positions = choice_positions[rank < limit]
+        scores = scores[rank < limit]
+
+    # Expand matches to all rows of df_left
+    query_positions, choice_positions, scores = _expand_matches(
+        query_codes,
+        query_positions,
+        choice_positions,
+        scores,
+    )
+
+    # Add rows for rows of df_left without matches
+    if not drop_na:
+        query_positions, choice_positions, scores = _add_unmatched(
+            len(df_left),
+            query_positions,
+            choice_positions,
+            scores,
+        )
+
+    # Create a dataframe of matches
+    df_matches = _get_matches_frame(
+        df_left,
+        right.ids,
+        right.values,
+        query_positions,
+        choice_positions,
+        scores,
+    )
+
+    # Record work done
+    pairs_total = int((query_codes >= 0).sum()) * int((choice_codes >= 0).sum())
+    df_matches.attrs['stats'] = {
+        'pairs_total': pairs_total,
+        'pairs_scored': counters['pairs_scored'],
+        'pairs_pruned': pairs_total - counters['pairs_scored'],
+        'rows_exact': int(resolved[query_codes[query_codes >= 0]].sum()),
+        'values_distinct': len(queries),
+        'choices_distinct': len(choices),
+    }
+    if prefilter is not None:
+        df_matches.attrs['stats']['prefilter_survival'] = (
+            counters['pairs_scored'] / counters['pairs_prefiltered']
+            if counters.get('pairs_prefiltered') else None
+        )
+        df_matches.attrs['stats']['prefilter_recall'] = prefilter_recall
+
+    return df_matches, query_positions, choice_positions
 
 
 # Define fuzzy matching function
 def fuzzy_match(
+    df_left: pd.DataFrame,
+    df_right: Union[pd.DataFrame, FuzzyIndex],
+    column_left: Hashable,
+    column_right: Hashable,
+    score_cutoff: int = 90,
+    limit: int = 1,
+    clean_strings: bool = True,
+    drop_na: bool = True,
+    scorer: Callable = fuzz.WRatio,
+    scorer_kwargs: dict[str, Any] = {},
+    engine: Literal['extract', 'cdist'] = 'extract',
+    chunk_size: int = 1000,
+    workers: int = 1,
+    n_jobs: int = 1,
+    executor: Optional[Executor] = None,
+    blocking: Literal[None, 'qgram', 'length'] = None,
+    qgram_size: int = 3,
+    exact_first: bool = False,
+    limit_duplicates: Literal['each', 'once'] = 'each',
+    prefilter: Optional[Callable] = None,
+    prefilter_cutoff: float = 50,
+    prefilter_sample: int = 0,
+) -> pd.DataFrame:
+    '''
+        Fuzzy match two dataframes.
+
+            Parameters:
+                - df_left: The base dataframe which we want to find matches
+                for
+                - df_right: The dataframe in which we want to look for matches
+                to values in df_left, or a FuzzyIndex built from it
+                - column_left, column_right: Columns on which to match
+                - score_cutoff: A score below which any matches
+                will be dropped
+                - limit: The number of matches to find for each row
+                in df_left
+                - clean_strings: Whether to apply rapidfuzz's default_process
+                processor, which converts strings to lowercase, removes
+                non-alphanumeric characters and trims whitespace
+                - drop_na: Whether to drop rows where no matches are found
+                - scorer: The scorer to use for fuzzy matching
+                - scorer_kwargs: Keyword arguments to pass to scorer
+                - engine: How matches are found. Behaviour is as follows:
+                    - extract: Call process.extract() for each row in df_left,
+                    or process.extractOne() where limit is 1. A row stops
+                    being scored once limit matches with the scorer's optimal
+                    score have been found
+                    - cdist: Score blocks of chunk_size rows from df_left
+                    against df_right using process.cdist()
+                - chunk_size: The number of rows from df_left to score at a
+                time where engine is 'cdist'
+                - workers: The number of threads to use where engine is
+                'cdist'. -1 uses all available cores
+                - n_jobs: The number of shards to split df_left into, each of
+                which is scored in a separate process. -1 uses all available
+                cores
+                - executor: An existing executor, such as a
+                ProcessPoolExecutor, to score shards of df_left in. If given,
+                this is used in place of creating a new process pool
+                - blocking: How to limit the rows of df_right each row of
+                df_left is scored against. Behaviour is as follows:
+                    - None: Score every row of df_left against every row of
+                    df_right
+                    - qgram: Only score rows of df_right sharing enough
+                    character q-grams with the row of df_left to possibly meet
+                    score_cutoff. See notes
+                    - length: Only score rows of df_right whose value, after
+                    any cleaning, has a length that could possibly meet
+                    score_cutoff. See notes
+                - qgram_size: The number of characters in each q-gram where
+                blocking is 'qgram'
+                - exact_first: Whether to first look for rows of df_right
+                whose value in column_right is identical to the value in
+                column_left, after any cleaning. Rows of df_left with at least
+                limit identical matches are given these matches, with the
+                optimal score, without being scored against df_right
+                - limit_duplicates: How rows of df_right with the same value in
+                column_right, after any cleaning, count towards limit.
+                Behaviour is as follows:
+                    - each: Each row counts towards limit
+                    - once: Rows with the same value count once towards limit,
+                    and all of these rows are returned
+                - prefilter: A cheaper scorer, such as fuzz.ratio, used to
+                score every pair before scorer. Only pairs meeting
+                prefilter_cutoff are then scored with scorer. None scores
+                every pair with scorer
+                - prefilter_cutoff: The score below which pairs are dropped
+                by prefilter. This should be relaxed enough that pairs
+                meeting score_cutoff with scorer aren't dropped
+                - prefilter_sample: The number of distinct values from
+                column_left to also score without prefilter, to measure how
+                many matches prefilter loses. 0 skips this
+
+            Returns:
+                - df_matches: A dataframe of matches with a MultiIndex
+                with index names df_left_id and df_right_id, consisting of
+                the ids from df_left and df_right, and columns match_string,
+                match_score. Where df_left or df_right has a MultiIndex,
+                the relevant index is a tuple. df_matches.attrs['stats'] is a
+                dict with the number of pairs of non-missing values
+                (pairs_total), the number of these that were scored
+                (pairs_scored), the number skipped (pairs_pruned) and the
+                number of rows of df_left resolved by exact matches
+                (rows_exact), the number of distinct values in column_left
+                that were matched (values_distinct) and the number of distinct
+                values in column_right they were scored against
+                (choices_distinct). Where prefilter is given, this also has
+                the share of pairs scored by prefilter that were then scored
+                by scorer (prefilter_survival) and, where prefilter_sample is
+                more than 0, the share of matches found without prefilter for
+                the sample that were also found with it (prefilter_recall)
+
+            Notes:
+                - This adds matches as rows rather than columns, to ensure a
+                tidy dataset
+                - The maximum number of matches that can be returned is
+                len(df_left) * limit, where limit_duplicates is 'each'
+                - None, np.nan and pd.NA in column_left or column_right are
+                considered not to match with anything
+                - Where blocking is 'qgram', no matches are lost for scorers
+                with a known bound on edit distance, such as fuzz.ratio and
+                Levenshtein.normalized_similarity. For other scorers,
+                including the default fuzz.WRatio, rows of df_right are scored
+                if they share at least one q-gram with the row of df_left, so
+                some matches may be lost. Each row of df_left is scored using
+                process.extract(), so engine is ignored
+                - Where blocking is 'length', no matches are lost. Rows of
+                df_left are grouped by length and scored using engine. Rows of
+                df_right are only skipped for scorers with a known bound on
+                edit distance, such as fuzz.ratio and
+                Levenshtein.normalized_similarity. For other scorers,
+                including the default fuzz.WRatio, every row is scored
+                - Where prefilter is given, prefilter is run in blocks of
+                chunk_size rows of df_left using process.cdist(), and scorer
+                is then run on the pairs left using process.extract(), so
+                engine is ignored. prefilter can't be used where blocking is
+                'qgram'. Matches are lost where prefilter scores a pair below
+                prefilter_cutoff that scorer would score as meeting
+                score_cutoff
+                - Where exact_first is True, a row of df_left with exact
+                matches gets the first limit of these by position in df_right.
+                For scorers that give the optimal score to strings that
+                aren't identical, such as fuzz.token_sort_ratio, this may
+                differ from the first limit matches with the optimal score
+                - Where df_right is a FuzzyIndex, column_right is ignored and
+                the index's clean_strings is used
+    '''
+    df_matches, _, _ = _fuzzy_match(
+        df_left,
+        df_right,
+        column_left,
+        column_right,
+        score_cutoff=score_cutoff,
+        limit=limit,
+        clean_strings=clean_strings,
+        drop_na=drop_na,
+        scorer=scorer,
+        scorer_kwargs=scorer_kwargs,
+        engine=engine,
+        chunk_size=chunk_size,
+        workers=workers,
+        n_jobs=n_jobs,
+        executor=executor,
+        blocking=blocking,
+        qgram_size=qgram_size,
+        exact_first=exact_first,
+        limit_duplicates=limit_duplicates,
+        prefilter=prefilter,
+        prefilter_cutoff=prefilter_cutoff,
+        prefilter_sample=prefilter_sample,
+    )
+
+    return df_matches
+
+
+# Define streaming fuzzy matching function
+def fuzzy_match_iter(
+    df_left: pd.DataFrame,
+    df_right: Union[pd.DataFrame, FuzzyIndex],
+    column_left: Hashable,
+    column_right: Hashable,
+    chunk_size: int = 1000,
+    clean_strings: bool = True,
+    **kwargs,
+) -> Iterator[pd.DataFrame]:
+    '''
+        Fuzzy match two dataframes, yielding matches for one chunk of df_left
+        at a time.
+
+            Parameters:
+                - df_left, df_right, column_left, column_right, clean_strings:
+                See fuzzy_match()
+                - chunk_size: The number of rows of df_left to match at a
+                time. This is also passed to fuzzy_match() as chunk_size
+                - kwargs: Keyword arguments to pass to fuzzy_match()
+
+            Yields:
+                - df_matches: A dataframe of matches for chunk_size rows of
+                df_left, in the same form as the output of fuzzy_match()
+
+            Notes:
+                - df_right is prepared once, rather than once per chunk
+                - Concatenating the dataframes yielded gives the same matches
+                as fuzzy_match()
+                - Matches for each chunk are yielded before the next chunk is
+                matched, so peak memory use depends on chunk_size rather than
+                len(df_left)
+                - Where df_left is empty, a single empty dataframe is yielded
+    '''
+    right = (
+        df_right if isinstance(df_right, FuzzyIndex)
+        else FuzzyIndex(df_right, column_right, clean_strings)
+    )
+
+    for start in range(0, max(len(df_left), 1), chunk_size):
+        yield fuzzy_match(
+            df_left.iloc[start:start + chunk_size],
+            right,
+            column_left,
+            column_right,
+            chunk_size=chunk_size,
+            clean_strings=clean_strings,
+            **kwargs,
+        )
+
+
+# Define function to get a fingerprint of the contents of columns
+def get_fingerprint(df: pd.DataFrame, columns: list[Hashable]) -> str:
+    '''
+        Get a fingerprint of columns of a dataframe, including its index.
+
+            Parameters:
+                - df: The dataframe
+                - columns: The columns to include
+
+            Returns:
+                - fingerprint: A hex digest, which changes where any value or
+                id changes
+
+            Notes:
+                - Rows are hashed using pd.util.hash_pandas_object(), which is
+                vectorised, so this is much cheaper than matching
+    '''
+    hashes = pd.util.hash_pandas_object(df[list(dict.fromkeys(columns))], index=True)
+
+    return hashlib.sha1(hashes.to_numpy().tobytes()).hexdigest()
+
+
+# Define function to make a value hashable, for use in a cache key
+def _freeze(value: Any) -> Hashable:
+    '''
+        Convert dicts, lists and tuples to nested tuples, so that they can be
+        used in a cache key.
+
+            Parameters:
+                - value: The value to convert
+
+            Returns:
+                - frozen: The converted value
+    '''
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    elif isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+
+    return value
+
+
+# Define class caching matches across score_cutoff and limit
+class MatchCache:
+    '''
+        A cache of matches, which serves any score_cutoff at least as strict
+        as, and any limit no larger than, those matches were found with.
+
+            Parameters:
+                - score_cutoff: The loosest score_cutoff to find matches with.
+                Where None, the first score_cutoff requested is used
+                - limit: The largest limit to find matches with. None finds
+                all matches
+                - max_entries: The number of sets of matches to keep. The
+                least recently used are dropped first
+
+            Notes:
+                - Matches are found once using fuzzy_match(), and kept as
+                arrays of positions and scores. Later calls with a stricter
+                score_cutoff or a smaller limit filter these, rather than
+                matching again
+                - Entries are keyed by a fingerprint of column_left and
+                column_right, including their indexes, found using
+                pd.util.hash_pandas_object(), column_left, column_right and
+                all other arguments to fuzzy_match() other than score_cutoff,
+                limit, drop_na and those that only affect how matches are found
+                (engine, chunk_size, workers, n_jobs, executor)
+                - Where a looser score_cutoff or larger limit is requested,
+                matches are found again with these and replace the entry
+                - Filtering gives the same matches as fuzzy_match() with the
+                score_cutoff and limit requested, except where blocking is
+                'qgram' or prefilter is given, as these depend on score_cutoff
+                - limit_duplicates='once' isn't supported, as limit then
+                counts distinct values of column_right
+                - exact_first isn't supported, as which rows are resolved by
+                identical matches depends on limit
+    '''
+
+    def __init__(
+        self,
+        score_cutoff: Optional[float] = None,
+        limit: Optional[int] = None,
+        max_entries: int = 16,
+    ):
+        self.score_cutoff = score_cutoff
+        self.limit = limit
+        self.max_entries = max_entries
+        self._entries: dict[Hashable, dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        '''
+            Drop all entries.
+        '''
+        self._entries.clear()
+
+    def fuzzy_match(
+        self,
+        df_left: pd.DataFrame,
+        df_right: pd.DataFrame,
+        column_left: Hashable,
+        column_right: Hashable,
+        score_cutoff: int = 90,
+        limit: int = 1,
+        drop_na: bool = True,
+        scorer: Callable = fuzz.WRatio,
+        scorer_kwargs: dict[str, Any] = {},
+        **kwargs,
+    ) -> pd.DataFrame:
+        '''
+            Fuzzy match two dataframes, using cached matches where possible.
+
+                Parameters:
+                    - df_left, df_right, column_left, column_right,
+                    score_cutoff, limit, drop_na, scorer, scorer_kwargs: See
+                    fuzzy_match()
+                    - kwargs: Keyword arguments to pass to fuzzy_match()
+
+                Returns:
+                    - df_matches: See fuzzy_match(). attrs['stats'] holds the
+                    stats of the call to fuzzy_match() that found the matches,
+                    and cache_hit, whether cached matches were used
+        '''
+        if kwargs.get('limit_duplicates', 'each') != 'each':
+            raise ValueError('limit_duplicates must be "each" to use MatchCache.')
+        if kwargs.get('exact_first', False):
+            raise ValueError('exact_first must be False to use MatchCache.')
+
+        worst_score, optimal_score = _get_scorer_bounds(scorer, scorer_kwargs)
+        sign = 1 if optimal_score > worst_score else -1
+
+        key = (
+            get_fingerprint(df_left, [column_left]),
+            get_fingerprint(df_right, [column_right]),
+            column_left,
+            column_right,
+            scorer,
+            _freeze(scorer_kwargs),
+            _freeze({
+                name: value for name, value in kwargs.items()
+                if name not in ['engine', 'chunk_size', 'workers', 'n_jobs', 'executor']
+            }),
+        )
+        entry = self._entries.pop(key, None)
+
+        # Find matches where there are none cached, or those cached are too strict
+        # NB: Matches are found with the loosest score_cutoff and largest limit seen
+        cache_hit = (
+            entry is not None
+            and sign * score_cutoff >= sign * entry['score_cutoff']
+            and (entry['limit'] is None or (limit is not None and limit <= entry['limit']))
+        )
+
+        if not cache_hit:
+            cutoffs = [score_cutoff]
+            limits = [limit, self.limit]
+            if self.score_cutoff is not None:
+                cutoffs.append(self.score_cutoff)
+            if entry is not None:
+                cutoffs.append(entry['score_cutoff'])
+                limits.append(entry['limit'])
+            entry_cutoff = min(cutoffs, key=lambda cutoff: sign * cutoff)
+            entry_limit = None if None in limits else max(limits)
+
+            df_matches, query_positions, choice_positions = _fuzzy_match(
+                df_left,
+                df_right,
+                column_left,
+                column_right,
+                score_cutoff=entry_cutoff,
+                limit=entry_limit,
+                scorer=scorer,
+                scorer_kwargs=scorer_kwargs,
+                **kwargs,
+            )
+            entry = {
+                'score_cutoff': entry_cutoff,
+                'limit': entry_limit,
+                'query_positions': query_positions,
+                'choice_positions': choice_positions,
+                'scores': df_matches['match_score'].to_numpy(),
+                'stats': df_matches.attrs['stats'],
+            }
+
+        # Keep the entry as the most recently used, dropping the least recently used
+        self._entries[key] = entry
+        while len(self._entries) > self.max_entries:
+            self._entries.pop(next(iter(self._entries)))
+
+        # Filter cached matches
+        # NB: Cached matches are ordered by position in df_left and then from best to
+        # worst, so the best limit matches meeting score_cutoff are the first limit of
+        # those meeting it
+        query_positions = entry['query_positions']
+        keep = sign * entry['scores'] >= sign * score_cutoff
+        query_positions = query_positions[keep]
+        choice_positions = entry['choice_positions'][keep]
+        scores = entry['scores'][keep]
+
+        if limit is not None:
+            rank = np.arange(len(query_positions)) - np.searchsorted(
+                query_positions, query_positions
+            )
+            query_positions = query_positions[rank < limit]
+            choice_positions = choice_positions[rank < limit]
+            scores = scores[rank < limit]
+
+        if not drop_na:
+            query_positions, choice_positions, scores = _add_unmatched(
+                len(df_left),
+                query_positions,
+                choice_positions,
+                scores,
+            )
+
+        df_matches = _get_matches_frame(
+            df_left,
+            df_right.index,
+            df_right[column_right].to_numpy(),
+            query_positions,
+            choice_positions,
+            scores,
+        )
+        df_matches.attrs['stats'] = {**entry['stats'], 'cache_hit': cache_hit}
+
+        return df_matches
+
+
+# Define function to find every match above score_cutoff as sparse arrays
+def fuzzy_match_sparse(
+    df_left: pd.DataFrame,
+    df_right: Union[pd.DataFrame, FuzzyIndex],
+    column_left: Hashable,
+    column_right: Hashable,
+    score_cutoff: int = 90,
+    clean_strings: bool = True,
+    scorer: Callable = fuzz.WRatio,
+    scorer_kwargs: dict[str, Any] = {},
+    chunk_size: int = 1000,
+    workers: int = 1,
+    dtype: Optional[type] = None,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+        Fuzzy match two dataframes, returning every match that meets
+        score_cutoff as the coordinates and values of a sparse matrix of
+        scores.
+
+            Parameters:
+                - df_left, df_right, column_left, column_right, score_cutoff,
+                clean_strings, scorer, scorer_kwargs, chunk_size, workers: See
+                fuzzy_match()
+                - dtype: The dtype of scores, e.g. np.uint8 to hold scores
+                from 0 to 100 in one byte each. Where None, np.int64 is used
+                for scorers returning integers and np.float64 otherwise
+
+            Returns:
+                - rows: The position in df_left of each match
+                - cols: The position in df_right of each match
+                - scores: The score of each match
+
+            Notes:
+                - Matches are ordered by position in df_left, and then from
+                best to worst match, as in the output of fuzzy_match() with
+                limit=None
+                - Scores are found using process.cdist(), chunk_size distinct
+                values from df_left at a time, with score_cutoff applied as
+                each block is scored, so peak memory use is proportional to
+                chunk_size * the number of distinct values in df_right
+                - Where dtype is an integer dtype and scorer returns floats,
+                scores are rounded, and score_cutoff is applied to the rounded
+                scores
+                - A scipy.sparse matrix can be created using e.g.
+                scipy.sparse.coo_array((scores, (rows, cols)),
+                shape=(len(df_left), len(df_right))). Scores of 0, e.g. exact
+                matches using Levenshtein.distance, are held explicitly, so
+                shouldn't be removed using eliminate_zeros()
+                - sparse_to_frame() converts the output to a dataframe in the
+                same form as the output of fuzzy_match()
+    '''
+    # Prepare strings
+    # NB: See _fuzzy_match()
+    if isinstance(df_right, FuzzyIndex):
+        right = df_right
+        clean_strings = right.clean_strings
+    else:
+        right = FuzzyIndex(df_right, column_right, clean_strings)
+    queries = _prepare_strings(df_left[column_left], clean_strings)
+
+    # Deduplicate values in df_left
+    query_codes, queries = pd.factorize(queries)
+    queries = np.asarray(queries, dtype=object)
+
+    # Find matches between distinct values, and expand them to all rows
+    query_positions, choice_positions, scores, _ = _extract_cdist(
+        queries,
+        right.distinct,
+        score_cutoff=score_cutoff,
+        limit=None,
+        scorer=scorer,
+        scorer_kwargs=scorer_kwargs,
+        chunk_size=chunk_size,
+        workers=workers,
+        dtype=dtype,
+    )
+    query_positions, choice_positions, scores = _expand_choices(
+        right.codes,
+        query_positions,
+        choice_positions,
+        scores,
+    )
+
+    worst_score, optimal_score = _get_scorer_bounds(scorer, scorer_kwargs)
+    sign = 1 if optimal_score > worst_score else -1
+    order = np.lexsort((choice_positions, -sign * scores.astype(np.float64), query_positions))
+
+    return _expand_matches(
+        query_codes,
+        query_positions[order],
+        choice_positions[order],
+        scores[order],
+    )
+
+
+# Define function to convert the output of fuzzy_match_sparse() to a dataframe
+def sparse_to_frame(
+    df_left: pd.DataFrame,
+    df_right: Union[pd.DataFrame, FuzzyIndex],
+    column_right: Hashable,
+    rows: np.ndarray,
+    cols: np.ndarray,
+    scores: np.ndarray,
+) -> pd.DataFrame:
+    '''
+        Convert matches returned by fuzzy_match_sparse() to a dataframe of
+        matches.
+
+            Parameters:
+                - df_left, df_right, column_right: The arguments passed to
+                fuzzy_match_sparse()
+                - rows, cols, scores: The output of fuzzy_match_sparse()
+
+            Returns:
+                - df_matches: A dataframe of matches, in the same form as the
+                output of fuzzy_match(). See fuzzy_match()
+
+            Notes:
+                - Matches are kept in the order given, so the output of
+                fuzzy_match_sparse() gives the same dataframe as fuzzy_match()
+                with limit=None and the same score_cutoff
+                - The dataframe doesn't have stats in attrs
+    '''
+    if isinstance(df_right, FuzzyIndex):
+        ids, values = df_right.ids, df_right.values
+    else:
+        ids, values = df_right.index, df_right[column_right].to_numpy()
+
+    return _get_matches_frame(df_left, ids, values, rows, cols, scores)
+
+
+# Define function to prepare values used as exact match keys
+def _prepare_keys(
+    values: pd.Series,
+    clean_strings: bool,
+) -> np.ndarray:
+    '''
+        Prepare values for exact matching.
+
+            Parameters:
+                - values: The values to prepare
+                - clean_strings: Whether to apply rapidfuzz's default_process
+                processor to string values
+
+            Returns:
+                - prepared: An object array of the prepared values, in the
+                same order as values
+
+            Notes:
+                - Unlike _prepare_strings(), values other than strings are
+                kept as they are, so that e.g. numeric codes can be used as
+                keys
+                - None, np.nan and pd.NA are all replaced with None, which
+                doesn't match anything
+    '''
+    prepared = values.astype(object).where(values.notna(), None).to_numpy()
+
+    if clean_strings:
+        prepared = np.array(
+            [utils.default_process(x) if isinstance(x, str) else x for x in prepared],
+            dtype=object,
+        )
+
+    return prepared
+
+
+# Define function to get the block of each row from exact match keys
+def _get_blocks(
+    keys_left: list[np.ndarray],
+    keys_right: list[np.ndarray],
+    n_left: int,
+    n_right: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    '''
+        Group rows of df_left and df_right into blocks, where rows in the same
+        block have equal values for every key.
+
+            Parameters:
+                - keys_left, keys_right: The prepared values of each key in
+                df_left and df_right, as returned by _prepare_keys()
+                - n_left, n_right: The number of rows in df_left and df_right
+
+            Returns:
+                - blocks_left, blocks_right: The block of each row of df_left
+                and df_right, or -1 where any key is missing
+
+            Notes:
+                - Where there are no keys, every row is in block 0
+    '''
+    blocks = np.zeros(n_left + n_right, dtype=np.int64)
+
+    for key_left, key_right in zip(keys_left, keys_right):
+        codes, _ = pd.factorize(np.concatenate([key_left, key_right]))
+
+        # Combine codes with the blocks found so far
+        # NB: Rows missing any key are given a block of -1
+        missing = (blocks < 0) | (codes < 0)
+        blocks, _ = pd.factorize(blocks * (int(codes.max(initial=0)) + 1) + codes)
+        blocks[missing] = -1
+
+    return blocks[:n_left], blocks[n_left:]
+
+
+# Define function to prepare dates for date matching
+def _prepare_dates(values: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    '''
+        Prepare values for date matching.
+
+            Parameters:
+                - values: The values to prepare. Values that aren't dates are
+                converted using pd.to_datetime(), and those that can't be
+                converted are treated as missing
+
+            Returns:
+                - days: The number of days since 1970-01-01 of each value
+                - missing: Whether each value is missing
+
+            Notes:
+                - Times are ignored, so values are compared by calendar day
+    '''
+    dates = pd.to_datetime(values, errors='coerce')
+    missing = dates.isna().to_numpy()
+    days = dates.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]').astype(np.int64)
+    days[missing] = 0
+
+    return days, missing
+
+
+# Define function to find the candidates for each row of df_left
+def _get_candidate_ranges(
+    blocks_left: np.ndarray,
+    blocks_right: np.ndarray,
+    days_left: np.ndarray,
+    days_right: np.ndarray,
+    date_tolerance: int,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+        Find the rows of df_right in the same block as, and within
+        date_tolerance days of, each row of df_left.
+
+            Parameters:
+                - blocks_left, blocks_right: The block of each row of df_left
+                and df_right, or -1 where a row can't be matched, as returned
+                by _get_blocks()
+                - days_left, days_right: The date of each row of df_left and
+                df_right, as returned by _prepare_dates(). Where no date is
+                used, these are all 0
+                - date_tolerance: The maximum number of days between dates
+
+            Returns:
+                - right_order: Positions in df_right, sorted by block and then
+                date
+                - starts, ends: For each row of df_left, the range of
+                right_order holding its candidates
+
+            Notes:
+                - Rows of df_right are sorted once by a key combining block and
+                date, so the candidates for each row of df_left are a
+                contiguous range found using np.searchsorted(), rather than by
+                comparing every pair of rows
+                - Candidates with the same date are in order of position in
+                df_right
+    '''
+    valid_left = blocks_left >= 0
+    valid_right = np.flatnonzero(blocks_right >= 0)
+
+    if not valid_left.any() or len(valid_right) == 0:
+        starts = np.zeros(len(blocks_left), dtype=np.int64)
+        return np.array([], dtype=np.int64), starts, starts
+
+    # Combine block and date into a single key
+    # NB: Dates are shifted so that the window around every date lies within
+    # [0, span), so windows don't overlap neighbouring blocks
+    offset = min(days_left[valid_left].min(), days_right[valid_right].min()) - date_tolerance
+    span = max(days_left[valid_left].max(), days_right[valid_right].max()) - offset
+    span += date_tolerance + 1
+    keys_right = blocks_right[valid_right] * span + (days_right[valid_right] - offset)
+    order = np.argsort(keys_right, kind='stable')
+    right_order, keys_right = valid_right[order], keys_right[order]
+
+    # Find the range of keys within date_tolerance of each row of df_left
+    keys_left = blocks_left * span + (days_left - offset)
+    starts = np.searchsorted(keys_right, keys_left - date_tolerance, side='left')
+    ends = np.searchsorted(keys_right, keys_left + date_tolerance, side='right')
+    ends[~valid_left] = starts[~valid_left]
+
+    return right_order, starts, ends
+
+
+# Define function to fuzzy match two dataframes on several columns
+def fuzzy_match_compound(
     df_left: pd.DataFrame,
     df_right: pd.DataFrame,
-    column_left: Hashable,
-    column_right: Hashable,
+    match_columns: list[tuple[Hashable, Hashable, Literal['exact', 'date', 'fuzzy']]],
     score_cutoff: int = 90,
     limit: int = 1,
     clean_strings: bool = True,
     drop_na: bool = True,
     scorer: Callable = fuzz.WRatio,
     scorer_kwargs: dict[str, Any] = {},
+    weights: Optional[list[float]] = None,
+    date_tolerance: int = 0,
 ) -> pd.DataFrame:
     '''
-        Fuzzy match two dataframes.
+        Fuzzy match two dataframes on several pairs of columns, each with a
+        match type.
 
             Parameters:
-                - df_left: The base dataframe which we want to find matches
-                for
-                - df_right: The dataframe in which we want to look for matches
-                to values in df_left
-                - column_left, column_right: Columns on which to match
-                - score_cutoff: A score below which any matches
-                will be dropped
-                - limit: The number of matches to find for each row
-                in df_left
+                - df_left: The dataframe we want to find matches for
+                - df_right: The dataframe in which we want to look for
+                matches
+                - match_columns: A list of (column_left, column_right,
+                match_type) tuples. Behaviour of match_type is as follows:
+                    - exact: Only match rows with equal values in column_left
+                    and column_right
+                    - date: Only match rows with dates in column_left and
+                    column_right within date_tolerance days of each other.
+                    Scores the scorer's optimal score for the same date,
+                    falling linearly with the number of days apart
+                    - fuzzy: Score values in column_left against values in
+                    column_right using scorer
+                - score_cutoff: A score below which any matches will be
+                dropped. Applied to the combined score
+                - limit: The number of matches to find for each row of
+                df_left. None finds all matches
                 - clean_strings: Whether to apply rapidfuzz's default_process
-                processor, which converts strings to lowercase, removes
-                non-alphanumeric characters and trims whitespace
-                - drop_na: Whether to drop rows where no matches are found
-                - scorer: The scorer to use for fuzzy matching
+                processor to values before matching
+                - drop_na: Whether to drop rows of df_left without matches
+                - scorer: The scorer to use for fuzzy columns. Must be a
+                scorer where higher scores are better, such as fuzz.WRatio
                 - scorer_kwargs: Keyword arguments to pass to scorer
+                - weights: A weight for each item of match_columns, used to
+                combine scores. Weights of exact columns are ignored. Where
+                None, columns are weighted equally
+                - date_tolerance: The maximum number of days between dates in
+                date columns
 
             Returns:
-                - df_matches: A dataframe of matches with a MultiIndex
-                with index names df_left_id and df_right_id, consisting of
-                the ids from df_left and df_right, and columns match_string,
-                match_score. Where df_left or df_right has a MultiIndex,
-                the relevant index is a tuple
+                - df_matches: A dataframe of matches, in the same form as the
+                output of fuzzy_match(), without match_string
 
             Notes:
-                - This adds matches as rows rather than columns, to ensure a
-                tidy dataset
-                - The maximum number of matches that can be returned is
-                len(df_left) * limit
-                - None, np.nan and pd.NA in column_left or column_right are
-                considered not to match with anything
+                - Exact columns are used as blocking keys: rows of df_left
+                are only scored against rows of df_right with equal values in
+                every exact column, found using a hash join. Rows with
+                missing values in any exact column aren't matched
+                - The first date column is also used for blocking: rows of
+                df_right are sorted by block and date, and the candidates for
+                each row of df_left are found using np.searchsorted(). Rows
+                with missing values in any date column aren't matched
+                - A date column scores optimal score * (1 - days apart /
+                (date_tolerance + 1)), e.g. 100 * (1 - days apart /
+                (date_tolerance + 1)) for fuzz.WRatio
+                - The combined score is the weighted mean of the scores of
+                date and fuzzy columns. Where there are no date or fuzzy
+                columns, every pair in the same block scores the scorer's
+                optimal score
+                - Date columns are scored first, then fuzzy columns one at a
+                time, and pairs that can't reach score_cutoff, even if they
+                score the optimal score for every remaining column, aren't
+                scored further
+                - Missing values in fuzzy columns score 0
+                - Matches with the same score are ordered by position in
+                df_right, as in fuzzy_match()
+                - attrs['stats'] holds pairs_total, the number of pairs of
+                rows, pairs_scored, the number of pairs in the same block
+                and date window, and pairs_pruned, the number of pairs
+                excluded by blocking
     '''
-    # Create a series of matches
-    # NB: Passing a series to process.extract() yields a series named column_left
-    # where the index is the index of df_left and the values are lists of tuples,
-    # of the form [(<value>, <score>, <index>), ...] - in this case the match
-    # value from df_right, the match score and index of df_right. Where df_right
-    # has a MultiIndex, the index is a tuple
-    # Ref: https://stackoverflow.com/a/63725864/4659442
-    series_matches = df_left[column_left].apply(
-        lambda x: process.extract(
-            x,
-            df_right[column_right],
-            limit=limit,
-            score_cutoff=score_cutoff,
-            processor=utils.default_process if clean_strings else None,
-            scorer=scorer,
-            **scorer_kwargs
-        )
+    match_types = [match_type for _, _, match_type in match_columns]
+    for match_type in match_types:
+        if match_type not in ['exact', 'date', 'fuzzy']:
+            raise ValueError(
+                f'Invalid value for match_type: {match_type}. '
+                'Valid values are "exact", "date", "fuzzy".'
+            )
+
+    if weights is None:
+        weights = [1] * len(match_columns)
+    elif len(weights) != len(match_columns):
+        raise ValueError('weights must have one item for each item of match_columns.')
+
+    worst_score, optimal_score = _get_scorer_bounds(scorer, scorer_kwargs)
+    if optimal_score < worst_score:
+        raise ValueError('scorer must be a scorer where higher scores are better.')
+
+    # Prepare values
+    # NB: Exact columns are used to group rows into blocks. Date and fuzzy columns are
+    # scored within blocks
+    keys_left, keys_right, date_columns, fuzzy_columns = [], [], [], []
+
+    for (column_left, column_right, match_type), weight in zip(match_columns, weights):
+        if match_type == 'exact':
+            keys_left.append(_prepare_keys(df_left[column_left], clean_strings))
+            keys_right.append(_prepare_keys(df_right[column_right], clean_strings))
+        elif match_type == 'date':
+            date_columns.append((
+                *_prepare_dates(df_left[column_left]),
+                *_prepare_dates(df_right[column_right]),
+                weight,
+            ))
+        elif match_type == 'fuzzy':
+            fuzzy_columns.append((
+                _prepare_strings(df_left[column_left], clean_strings),
+                _prepare_strings(df_right[column_right], clean_strings),
+                weight,
+            ))
+
+    # Group rows into blocks, and find the candidates for each row of df_left
+    # NB: Rows missing a date are excluded in the same way as rows missing a key
+    blocks_left, blocks_right = _get_blocks(keys_left, keys_right, len(df_left), len(df_right))
+
+    for _, missing_left, _, missing_right, _ in date_columns:
+        blocks_left[missing_left] = -1
+        blocks_right[missing_right] = -1
+
+    if date_columns:
+        days_left, _, days_right, _, _ = date_columns[0]
+    else:
+        days_left = np.zeros(len(df_left), dtype=np.int64)
+        days_right = np.zeros(len(df_right), dtype=np.int64)
+
+    right_order, starts, ends = _get_candidate_ranges(
+        blocks_left,
+        blocks_right,
+        days_left,
+        days_right,
+        date_tolerance,
     )
 
-    # Drop empty matches
-    if drop_na:
-        series_matches = series_matches[
-            series_matches.apply(lambda x: len(x) > 0)
-        ]
+    # Score candidates for each row of df_left
+    weight_total = sum(weight for *_, weight in date_columns + fuzzy_columns)
+    query_positions, choice_positions, scores = [], [], []
+
+    for i in range(len(df_left)):
+        candidates = right_order[starts[i]:ends[i]]
+        totals = np.zeros(len(candidates))
+        weight_remaining = weight_total
+
+        # NB: Candidates are already within date_tolerance for the first date column
+        for days_left, _, days_right, _, weight in date_columns:
+            days_apart = np.abs(days_right[candidates] - days_left[i])
+            keep = days_apart <= date_tolerance
+            candidates, totals, days_apart = candidates[keep], totals[keep], days_apart[keep]
+            totals += weight * optimal_score * (1 - days_apart / (date_tolerance + 1))
+            weight_remaining -= weight
 
-    # Convert matches to a dataframe in long form
-    df_matches = series_matches.to_frame()
-    df_matches.index.name = 'df_left_id'
-    df_matches = df_matches.explode(column_left)
+        for values_left, values_right, weight in fuzzy_columns:
+            if len(candidates) == 0:
+                break
 
-    # Convert match tuple to columns
+            totals += weight * process.cdist(
+                [values_left[i]],
+                values_right[candidates],
+                scorer=scorer,
+                processor=None,
+                dtype=np.float64,
+                scorer_kwargs=scorer_kwargs,
+            )[0]
+            weight_remaining -= weight
+
+            # Drop candidates that can't reach score_cutoff
+            keep = totals + weight_remaining * optimal_score >= score_cutoff * weight_total
+            candidates, totals = candidates[keep], totals[keep]
+
+        row_scores = totals / weight_total if weight_total else np.full(
+            len(candidates), float(optimal_score)
+        )
+
+        # Keep the best limit matches, ordered by score and then position in df_right
+        keep = row_scores >= score_cutoff
+        candidates, row_scores = candidates[keep], row_scores[keep]
+        order = np.lexsort((candidates, -row_scores))[:limit]
+
+        if len(order) > 0:
+            query_positions.append(np.full(len(order), i, dtype=np.int64))
+            choice_positions.append(candidates[order])
+            scores.append(row_scores[order])
+        elif not drop_na:
+            query_positions.append(np.array([i], dtype=np.int64))
+            choice_positions.append(np.array([-1], dtype=np.int64))
+            scores.append(np.array([np.nan]))
+
+    query_positions = np.concatenate(query_positions or [np.array([], dtype=np.int64)])
+    choice_positions = np.concatenate(choice_positions or [np.array([], dtype=np.int64)])
+    scores = np.concatenate(scores or [np.array([], dtype=np.float64)])
+
+    # Create a dataframe of matches
+    # NB: See _get_matches_frame()
     df_matches = pd.DataFrame(
-        index=df_matches.index,
-        data=df_matches[column_left].tolist(),
-        columns=['match_string', 'match_score', 'df_right_id']
+        index=pd.MultiIndex.from_arrays(
+            [
+                df_left.index.to_flat_index().take(query_positions),
+                pd.api.extensions.take(
+                    df_right.index.to_flat_index().to_numpy(), choice_positions, allow_fill=True
+                ),
+            ],
+            names=['df_left_id', 'df_right_id']
+        ),
+        data={'match_score': scores},
+        dtype=object if len(query_positions) == 0 else None,
     )
 
-    # Convert indexes to tuples where df_left and/or df_right have MultiIndexes
-    # as otherwise any subsequent merging will fail
-    # NB: This is done before adding df_right_id to the index, as otherwise
-    # df_right_id would become part of df_left_id
-    # NB: Flattening df_matches index is only needed where df_left has a
-    # MultiIndex, as in the case where df_right has a MultiIndex the df_right
-    # index will have been a single, named column in df_matches
-    if df_left.index.nlevels > 1:
-        df_matches.index = pd.MultiIndex.to_flat_index(df_matches.index)
-        df_matches.index.name = 'df_left_id'
-
-    # Add df_right id to index, meaning it will consist of df_left id and
-    # df_right id
-    # NB: This will be a unique index, as long as df_left and df_right have
-    # unique indexes
-    df_matches.set_index(['df_right_id'], append=True, inplace=True)
+    # Record work done
+    pairs_total = len(df_left) * len(df_right)
+    pairs_scored = int((ends - starts).sum())
+    df_matches.attrs['stats'] = {
+        'pairs_total': pairs_total,
+        'pairs_scored': pairs_scored,
+        'pairs_pruned': pairs_total - pairs_scored,
+    }
 
     return df_matches
 
 
+# Define function to find a one-to-one assignment greedily
+def _assign_greedy(
+    codes_left: np.ndarray,
+    codes_right: np.ndarray,
+    order: np.ndarray,
+) -> np.ndarray:
+    '''
+        Assign matches greedily, from best to worst.
+
+            Parameters:
+                - codes_left, codes_right: The row of df_left and df_right of
+                each match, as codes from pd.factorize()
+                - order: The positions of the matches to consider, from best
+                to worst
+
+            Returns:
+                - assigned: The positions of the matches assigned, in order
+                from best to worst
+
+            Notes:
+                - A match is assigned where neither its row of df_left nor its
+                row of df_right has already been assigned. This takes a single
+                pass over matches
+    '''
+    used_left = bytearray(int(codes_left.max(initial=-1)) + 1)
+    used_right = bytearray(int(codes_right.max(initial=-1)) + 1)
+    assigned = []
+
+    for position, code_left, code_right in zip(
+        order.tolist(), codes_left[order].tolist(), codes_right[order].tolist()
+    ):
+        if not used_left[code_left] and not used_right[code_right]:
+            used_left[code_left] = used_right[code_right] = 1
+            assigned.append(position)
+
+    return np.array(assigned, dtype=np.int64)
+
+
+# Define function to find a one-to-one assignment maximising total weight
+def _assign_optimal(
+    codes_left: np.ndarray,
+    codes_right: np.ndarray,
+    weights: np.ndarray,
+    positions: np.ndarray,
+) -> np.ndarray:
+    '''
+        Assign matches so that the total weight of matches assigned is as
+        large as possible.
+
+            Parameters:
+                - codes_left, codes_right: The row of df_left and df_right of
+                each match, as codes from pd.factorize()
+                - weights: The weight of each match. Must be non-negative
+                - positions: The position of each match
+
+            Returns:
+                - assigned: The positions of the matches assigned
+
+            Notes:
+                - Matches are split into connected components, where two
+                matches are in the same component if they share a row of
+                df_left or df_right, and scipy's linear_sum_assignment() is
+                run on a dense matrix for each component. Peak memory use is
+                proportional to the number of rows of df_left times the number
+                of rows of df_right in the largest component
+                - Components made up of a single match are assigned without
+                calling linear_sum_assignment()
+    '''
+    n_left = int(codes_left.max(initial=-1)) + 1
+    n_right = int(codes_right.max(initial=-1)) + 1
+
+    # Find connected components
+    # NB: Rows of df_left and df_right are nodes, and matches are edges
+    graph = coo_matrix(
+        (np.ones(len(codes_left)), (codes_left, n_left + codes_right)),
+        shape=(n_left + n_right, n_left + n_right),
+    )
+    _, labels = connected_components(graph, directed=False)
+    components = labels[codes_left]
+    counts = np.bincount(components)
+
+    # Assign components made up of a single match
+    single = counts[components] == 1
+    assigned = [positions[single]]
+
+    # Assign each remaining component
+    # NB: Pairs without a match are given a weight of 0, and are dropped if
+    # assigned
+    multiple = np.flatnonzero(~single)
+    multiple = multiple[np.argsort(components[multiple], kind='stable')]
+    bounds = np.flatnonzero(np.diff(components[multiple])) + 1
+
+    for group in np.split(multiple, bounds) if len(multiple) > 0 else []:
+        rows, row_codes = np.unique(codes_left[group], return_inverse=True)
+        cols, col_codes = np.unique(codes_right[group], return_inverse=True)
+        matrix = np.zeros((len(rows), len(cols)))
+        matrix[row_codes, col_codes] = weights[group]
+        lookup = np.full((len(rows), len(cols)), -1, dtype=np.int64)
+        lookup[row_codes, col_codes] = positions[group]
+
+        row_assigned, col_assigned = linear_sum_assignment(matrix, maximize=True)
+        found = lookup[row_assigned, col_assigned]
+        assigned.append(found[found >= 0])
+
+    return np.concatenate(assigned)
+
+
+# Define function to restrict matches to a one-to-one assignment
+def assign_unique(
+    df_matches: pd.DataFrame,
+    method: Literal['greedy', 'optimal'] = 'greedy',
+    ascending: bool = False,
+    drop_na: bool = True,
+) -> pd.DataFrame:
+    '''
+        Restrict matches so that each row of df_left is matched to at most one
+        row of df_right, and each row of df_right to at most one row of
+        df_left.
+
+            Parameters:
+                - df_matches: A dataframe of matches, as returned by
+                fuzzy_match() or fuzzy_match_compound()
+                - method: How matches are assigned. Behaviour is as follows:
+                    - greedy: Assign matches from best to worst score, skipping
+                    matches whose row of df_left or df_right has already been
+                    assigned
+                    - optimal: Assign matches so that the total score of
+                    matches assigned is as large as possible
+                - ascending: Whether lower scores are better, e.g. where
+                scorer is Levenshtein.distance
+                - drop_na: Whether to drop rows of df_left without an
+                assigned match. Where False, these are kept, with missing
+                values for df_right_id and every column, as in fuzzy_match()
+
+            Returns:
+                - df_matches: The assigned matches, in the same order as in
+                df_matches
+
+            Notes:
+                - Only matches, rather than a dense matrix of scores, are used,
+                so this scales with the number of matches rather than the
+                number of pairs of rows. For more candidates, use a higher
+                limit in fuzzy_match(), or limit=None
+                - Where method is 'greedy', matches with the same score are
+                assigned in the order they appear in df_matches
+                - Where method is 'optimal' and ascending is True, the total
+                of (the worst score + 1 - score) is maximised, which favours
+                assigning as many matches as possible. Where ascending is
+                False, scores must be non-negative
+                - Rows of df_matches without a match, as where fuzzy_match()
+                is called with drop_na=False, are ignored in assignment
+    '''
+    if method not in ['greedy', 'optimal']:
+        raise ValueError(
+            f'Invalid value for method: {method}. '
+            'Valid values are "greedy", "optimal".'
+        )
+
+    # Find matches to assign
+    # NB: Rows of df_left and df_right are identified by codes from pd.factorize()
+    codes_left, _ = pd.factorize(df_matches.index.get_level_values(0))
+    codes_right, _ = pd.factorize(df_matches.index.get_level_values(1))
+    scores = df_matches['match_score'].to_numpy(dtype=np.float64)
+    valid = np.flatnonzero((codes_right >= 0) & ~np.isnan(scores))
+
+    sign = -1 if ascending else 1
+
+    if method == 'greedy':
+        order = valid[np.lexsort((valid, -sign * scores[valid]))]
+        assigned = _assign_greedy(codes_left, codes_right, order)
+    elif method == 'optimal':
+        weights = (
+            scores[valid] if not ascending
+            else scores[valid].max(initial=0) + 1 - scores[valid]
+        )
+        assigned = _assign_optimal(codes_left[valid], codes_right[valid], weights, valid)
+
+    # Add rows for rows of df_left without an assigned match
+    # NB: Each is placed at the first row for its row of df_left, with a position of
+    # -1, which is filled with missing values below
+    positions = np.sort(assigned)
+
+    if not drop_na:
+        unassigned = np.ones(int(codes_left.max(initial=-1)) + 1, dtype=bool)
+        unassigned[codes_left[positions]] = False
+        _, first = np.unique(codes_left, return_index=True)
+        first = first[unassigned]
+        positions = np.sort(np.concatenate([positions, first]))
+        take = np.where(np.isin(positions, first), -1, positions)
+    else:
+        take = positions
+
+    if (take < 0).any():
+        index = pd.MultiIndex.from_arrays(
+            [
+                df_matches.index.get_level_values(0).take(positions),
+                _take_column(df_matches.index.get_level_values(1), take),
+            ],
+            names=df_matches.index.names,
+        )
+        return pd.DataFrame(
+            {column: _take_column(df_matches[column], take) for column in df_matches.columns},
+            index=index,
+        ).__finalize__(df_matches)
+
+    return df_matches.iloc[positions]
+
+
+# Define function to take values from a column at positions
+def _take_column(column: pd.Series, positions: np.ndarray) -> Any:
+    '''
+        Take values from a column at positions, without copying the rest of
+        the column.
+
+            Parameters:
+                - column: The column to take values from
+                - positions: The positions to take. -1 gives a missing value
+
+            Returns:
+                - values: An array of the values at positions. Where a missing
+                value is needed, the dtype is changed as in DataFrame.merge()
+    '''
+    values = (
+        column.array if isinstance(column.dtype, pd.api.extensions.ExtensionDtype)
+        else column.to_numpy()
+    )
+
+    return pd.api.extensions.take(values, positions, allow_fill=True)
+
+
+# Define function to add a suffix to a column name
+def _add_suffix(column: Hashable, suffix: Optional[str]) -> Hashable:
+    '''
+        Add a suffix to a column name, as in DataFrame.merge().
+
+            Parameters:
+                - column: The column name
+                - suffix: The suffix to add. None leaves the name unchanged
+
+            Returns:
+                - column: The column name with suffix added
+    '''
+    return column if suffix is None else f'{column}{suffix}'
+
+
+# Define function to select columns from a dataframe
+def _select_columns(
+    df: pd.DataFrame,
+    columns: Optional[list[Hashable]],
+    name: str,
+) -> list[Hashable]:
+    '''
+        Select columns from a dataframe, checking they exist.
+
+            Parameters:
+                - df: The dataframe
+                - columns: The columns to select. None selects all columns
+                - name: The name of the dataframe, used in error messages
+
+            Returns:
+                - columns: The columns selected
+    '''
+    if columns is None:
+        return list(df.columns)
+
+    missing = [col for col in columns if col not in df.columns]
+    if missing:
+        raise KeyError(f'Columns not in {name}: {missing}')
+
+    return list(columns)
+
+
 # Define fuzzy merging function
 def fuzzy_merge(
     df_left: pd.DataFrame,
-    df_right: pd.DataFrame,
+    df_right: Union[pd.DataFrame, FuzzyIndex],
     column_left: Hashable,
     column_right: Hashable,
     score_cutoff: int = 90,
@@ -126,13 +3692,28 @@ def fuzzy_merge(
     scorer: Callable = fuzz.WRatio,
     scorer_kwargs: dict[str, Any] = {},
     suffixes: tuple[Optional[str], Optional[str]] = ('_df_left', '_df_right'),
+    engine: Literal['extract', 'cdist'] = 'extract',
+    chunk_size: int = 1000,
+    workers: int = 1,
+    n_jobs: int = 1,
+    executor: Optional[Executor] = None,
+    blocking: Literal[None, 'qgram', 'length'] = None,
+    qgram_size: int = 3,
+    exact_first: bool = False,
+    limit_duplicates: Literal['each', 'once'] = 'each',
+    prefilter: Optional[Callable] = None,
+    prefilter_cutoff: float = 50,
+    prefilter_sample: int = 0,
+    columns_left: Optional[list[Hashable]] = None,
+    columns_right: Optional[list[Hashable]] = None,
 ):
     '''
         Fuzzy merge two dataframes.
 
             Parameters:
                 - df_left: The base dataframe which we want to merge with df_right
-                - df_right: The dataframe in which we want to merge with df_left
+                - df_right: The dataframe in which we want to merge with df_left,
+                or a FuzzyIndex built from it
                 - column_left, column_right: Columns on which to match df_left
                 and df_right
                 - score_cutoff: A score below which any matches
@@ -156,6 +3737,13 @@ def fuzzy_merge(
                 - scorer: The scorer to use for fuzzy matching
                 - scorer_kwargs: Keyword arguments to pass to scorer
                 - suffixes: Suffixes to add to columns from df_left and df_right
+                - engine, chunk_size, workers, n_jobs, executor, blocking,
+                qgram_size, exact_first, limit_duplicates, prefilter,
+                prefilter_cutoff, prefilter_sample: How matches are found. See
+                fuzzy_match()
+                - columns_left, columns_right: The columns from df_left and
+                df_right to include in the output dataframe. None includes all
+                columns
 
             Returns:
                 - df_output: A dataframe of merged data with a MultiIndex
@@ -178,12 +3766,38 @@ def fuzzy_merge(
                 len(df_left) * limit
                 - None, np.nan and pd.NA in column_left or column_right are
                 considered not to match with anything
+                - Columns excluded by columns_left, columns_right or drop_cols
+                are never gathered, so the cost of building the output depends
+                on the number of matches and columns included rather than the
+                width of df_left and df_right
+                - Suffixes are only added to columns included from both
+                df_left and df_right, before drop_cols is applied
     '''
 
+    # Prepare df_right
+    # NB: See FuzzyIndex
+    right = (
+        df_right if isinstance(df_right, FuzzyIndex)
+        else FuzzyIndex(df_right, column_right, clean_strings)
+    )
+    df_right = right.frame
+
+    if drop_cols not in [None, 'left', 'right', 'both', 'match']:
+        raise ValueError(
+            f'Invalid value for drop_cols: {drop_cols}. '
+            'Valid values are None, "left", "right", "both", "match".'
+        )
+
+    # Select columns to include
+    # NB: This is done before matching, so that missing columns are found early
+    columns_left = _select_columns(df_left, columns_left, 'df_left')
+    columns_right = _select_columns(df_right, columns_right, 'df_right')
+
     # Fuzzy match datasets
-    df_matches = fuzzy_match(
+    # NB: The positions of matches in df_left and df_right are used to gather columns
+    df_matches, left_positions, right_positions = _fuzzy_match(
         df_left,
-        df_right,
+        right,
         column_left,
         column_right,
         score_cutoff=score_cutoff,
@@ -192,131 +3806,291 @@ def fuzzy_merge(
         drop_na=drop_na,
         scorer=scorer,
         scorer_kwargs=scorer_kwargs,
+        engine=engine,
+        chunk_size=chunk_size,
+        workers=workers,
+        n_jobs=n_jobs,
+        executor=executor,
+        blocking=blocking,
+        qgram_size=qgram_size,
+        exact_first=exact_first,
+        limit_duplicates=limit_duplicates,
+        prefilter=prefilter,
+        prefilter_cutoff=prefilter_cutoff,
+        prefilter_sample=prefilter_sample,
     )
 
-    # Convert indexes to tuples where df_left and/or df_right have MultiIndexes
-    # as otherwise any subsequent merging will fail
-    # NB: We do this on copies of df_left and/or df_right, and use these in the
-    # subsequent merge, so that we don't modify the original dataframes
-    df_left_flat_index = df_left.copy()
-    df_right_flat_index = df_right.copy()
-
-    if df_left.index.nlevels > 1:
-        df_left_flat_index.index = pd.MultiIndex.to_flat_index(df_left_flat_index.index)
-        df_left_flat_index.index.name = 'df_left_id'
-    if df_right.index.nlevels > 1:
-        df_right_flat_index.index = pd.MultiIndex.to_flat_index(df_right_flat_index.index)
-
-    # Merge data
-    # NB: Where we refer to df_left_id and df_right_id this is possible because fuzzy_match()
-    # applies this naming - suffixes is only used to set subsequent column naming
-    # NB: We need to handle the case where there are no matches, as merging df_left_flat_index
-    # and df_matches where df_matches is empty results in a dataframe featuring df_left_id
-    # but not df_right_id, causing a second merge() operation to fail
-    # NB: Where drop_na is True or all rows from df_left are matched, the output of the
-    # first merge() operation will have a MultiIndex made up of the indexes of df_left and
-    # df_right. Where there are some unmatched rows from df_left and drop_na is False,
-    # the output, df_interim, will have a single-level index consisting of
-    #   a. a tuple of the indexes of df_left and df_right where a match was found, and
-    #   b. NaNs where no match was found
-    # and df_left_id will have been added as a column
-    # NB: Where we have a single-level index, we replace the index with a MultiIndex
-    # in which NaNs - representing unmatched rows from df_left - are replaced with the
-    # index of df_left and the index of df_right, before proceeding with the merge
-    # NB: x.name accesses the index of the row
-    if df_matches.empty:
-        df_output = df_left_flat_index.merge(
-            df_matches,
-            how='inner',
-            left_index=True,
-            right_on='df_left_id',
-        ).set_index('df_left_id')
-        df_output = df_output.assign(df_right_id=[]).set_index('df_right_id', append=True)
-
-        # Add suffix to all columns bar match_string, match_score
-        # NB: We're not able to use the suffixes arg of merge() as the fact
-        # there are no matches means the suffixes aren't used
-        df_output.columns = [
-            col + suffixes[0] if col not in ['match_string', 'match_score'] else col
-            for col in df_output.columns
-        ]
+    # Choose columns to gather from df_left and df_right
+    # NB: Columns excluded by columns_left, columns_right or drop_cols are never gathered
+    # NB: Columns included from both df_left and df_right are given suffixes, as in
+    # DataFrame.merge(). Where there are no matches, all columns from df_left are given
+    # suffixes[0] and no columns from df_right are included
+    overlap = set(columns_left) & set(columns_right)
 
-    elif drop_na or df_left_flat_index.index.isin(
-        df_matches.index.get_level_values('df_left_id')
-    ).all():
-        df_output = df_left_flat_index.merge(
-            df_matches,
-            how='inner',
-            left_index=True,
-            right_on='df_left_id'
-        ).merge(
-            df_right_flat_index,
-            how='left',
-            left_on='df_right_id',
-            right_index=True,
-            suffixes=suffixes
-        )
+    if drop_cols in ['left', 'both']:
+        columns_left = []
+    if drop_cols in ['right', 'both'] or df_matches.empty:
+        columns_right = []
+
+    names_left = [
+        _add_suffix(col, suffixes[0]) if col in overlap or df_matches.empty else col
+        for col in columns_left
+    ]
+    names_right = [
+        _add_suffix(col, suffixes[1]) if col in overlap else col for col in columns_right
+    ]
+
+    # Gather columns at the positions of matches
+    # NB: Only the columns needed are taken, so neither df_left nor df_right is copied.
+    # Unmatched rows of df_left, where drop_na is False, have a df_right position of -1
+    # and get missing values in columns from df_right
+    # NB: Columns are keyed by position until all are gathered, so that the names
+    # given to them don't need to be unique
+    columns = (
+        ([] if drop_cols == 'match' else [df_matches['match_score'].array])
+        + [_take_column(df_left[col], left_positions) for col in columns_left]
+        + [_take_column(df_right[col], right_positions) for col in columns_right]
+    )
+    df_output = pd.DataFrame(dict(enumerate(columns)), index=df_matches.index)
+    df_output.columns = (
+        ([] if drop_cols == 'match' else ['match_score']) + names_left + names_right
+    )
+
+    df_output.attrs['stats'] = df_matches.attrs['stats']
+
+    return df_output
+
+
+# Define function to read a file in chunks
+def _read_file_chunks(
+    path: str,
+    columns: Optional[list[Hashable]],
+    chunk_size: int,
+) -> Iterator[pd.DataFrame]:
+    '''
+        Read a CSV or Parquet file in chunks.
+
+            Parameters:
+                - path: The path to the file. Files ending .parquet are read
+                as Parquet, and all others as CSV
+                - columns: The columns to read. None reads all columns
+                - chunk_size: The number of rows to read at a time
+
+            Yields:
+                - df_chunk: A dataframe of up to chunk_size rows
+
+            Notes:
+                - Reading Parquet files requires pyarrow
+    '''
+    if str(path).endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
     else:
-        df_interim = df_left_flat_index.merge(
-            df_matches,
-            how='outer',
-            left_index=True,
-            right_on='df_left_id'
-        )
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunk_size)
 
-        df_interim.index = df_interim.apply(
-            lambda x: (x['df_left_id'], float('NaN')) if pd.isnull(x.name) else x.name,
-            axis=1,
-        )
 
-        df_interim.drop(columns=['df_left_id'], inplace=True)
+# Define function to replace null types in a Parquet schema
+def _fill_null_types(schema: Any, sources: dict[str, pd.Series]) -> Any:
+    '''
+        Replace null types in the schema of output with the types of the
+        columns they are taken from.
 
-        df_interim.index = pd.MultiIndex.from_tuples(
-            df_interim.index,
-            names=['df_left_id', 'df_right_id']
-        )
+            Parameters:
+                - schema: The pyarrow schema of the first output written
+                - sources: The columns that output columns are taken from,
+                keyed by the names of output columns
 
-        df_output = df_interim.merge(
-            df_right_flat_index,
-            how='left',
-            left_on='df_right_id',
-            right_index=True,
-            suffixes=suffixes
-        )
+            Returns:
+                - schema: The schema, with null types replaced where the
+                source column has non-missing values
 
-    # Drop match_string column
-    df_output.drop(columns=['match_string'], inplace=True)
+            Notes:
+                - pyarrow gives columns holding only missing values a null
+                type, which no other values can be written as. This happens
+                where no rows of the first chunk are matched and drop_na is
+                False
+    '''
+    import pyarrow as pa
 
-    # Move match_score column to be first column
-    df_output = df_output[
-        ['match_score'] + [col for col in df_output.columns if col != 'match_score']
-    ]
+    for i, field in enumerate(schema):
+        if pa.types.is_null(field.type) and field.name in sources:
+            values = sources[field.name]
+            values = values[values.notna()].iloc[:1]
+            schema = schema.set(i, field.with_type(pa.Array.from_pandas(values).type))
 
-    # Drop columns
-    if drop_cols == 'left':
-        df_output.drop(
-            columns=[col for col in df_output.columns if col.endswith(suffixes[0])],
-            inplace=True
-        )
-    elif drop_cols == 'right':
-        df_output.drop(
-            columns=[col for col in df_output.columns if col.endswith(suffixes[1])],
-            inplace=True
-        )
-    elif drop_cols == 'both':
-        df_output.drop(
-            columns=[
-                col for col in df_output.columns
-                if col.endswith(suffixes[0]) or col.endswith(suffixes[1])
-            ],
-            inplace=True
-        )
-    elif drop_cols == 'match':
-        df_output.drop(columns=['match_score'], inplace=True)
-    elif drop_cols is not None:
-        raise ValueError(
-            f'Invalid value for drop_cols: {drop_cols}. '
-            'Valid values are None, "left", "right", "both", "match".'
-        )
+    return schema
 
-    return df_output
+
+# Define out-of-core fuzzy matching function
+def fuzzy_match_file(
+    path_left: str,
+    df_right: Union[pd.DataFrame, FuzzyIndex],
+    column_left: Hashable,
+    column_right: Hashable,
+    path_output: str,
+    merge: bool = False,
+    columns_left: Optional[list[Hashable]] = None,
+    index_left: Optional[Hashable] = None,
+    chunk_size: int = 1000,
+    clean_strings: bool = True,
+    **kwargs,
+) -> dict[str, int]:
+    '''
+        Fuzzy match or merge a CSV or Parquet file with a dataframe, reading
+        the file and writing output one chunk at a time.
+
+            Parameters:
+                - path_left: The path to the file holding the base dataset
+                which we want to find matches for. Files ending .parquet are
+                read as Parquet, and all others as CSV
+                - df_right: The dataframe in which we want to look for
+                matches, or a FuzzyIndex built from it
+                - column_left, column_right, clean_strings: See fuzzy_match()
+                - path_output: The path to write output to. Paths ending
+                .parquet are written as Parquet, and all others as CSV. Any
+                existing file is overwritten
+                - merge: Whether to write the output of fuzzy_merge() rather
+                than fuzzy_match()
+                - columns_left: Columns of the file to read, other than
+                column_left and index_left, where merge is True. None reads
+                all columns
+                - index_left: A column of the file to use as the index of the
+                base dataset. None uses the row number in the file
+                - chunk_size: The number of rows of the file to read at a
+                time. This is also passed to fuzzy_match() or fuzzy_merge() as
+                chunk_size
+                - kwargs: Keyword arguments to pass to fuzzy_match() or
+                fuzzy_merge()
+
+            Returns:
+                - summary: A dict with the number of rows read (rows_read),
+                the number of these with at least one match (rows_matched),
+                the number of matches found (matches) and the number of rows
+                written (rows_written)
+
+            Notes:
+                - df_right is prepared once, rather than once per chunk
+                - Output has df_left_id and df_right_id as columns rather than
+                an index
+                - Where merge is False, only column_left and index_left are
+                read from the file
+                - Peak memory use depends on chunk_size and df_right rather
+                than the size of the file
+                - Where no rows can be read from the file, no output is
+                written
+                - The schema of Parquet output is taken from the first output
+                written, with the types of match_string and columns from
+                df_right taken from df_right where they hold only missing
+                values
+                - Reading or writing Parquet files requires pyarrow
+    '''
+    right = (
+        df_right if isinstance(df_right, FuzzyIndex)
+        else FuzzyIndex(df_right, column_right, clean_strings)
+    )
+
+    # Only read the columns needed
+    if merge and columns_left is None:
+        columns = None
+    else:
+        columns = list(dict.fromkeys(
+            [column_left] + ([index_left] if index_left is not None else [])
+            + (list(columns_left) if merge else [])
+        ))
+
+    summary = {'rows_read': 0, 'rows_matched': 0, 'matches': 0, 'rows_written': 0}
+    writer = None
+    df_output = None
+
+    try:
+        for df_chunk in _read_file_chunks(path_left, columns, chunk_size):
+
+            # Index rows by their position in the file or by index_left
+            df_chunk.index = pd.RangeIndex(
+                summary['rows_read'], summary['rows_read'] + len(df_chunk)
+            )
+            if index_left is not None:
+                df_chunk = df_chunk.set_index(index_left)
+
+            # Match or merge chunk
+            if merge:
+                df_output = fuzzy_merge(
+                    df_chunk,
+                    right,
+                    column_left,
+                    column_right,
+                    chunk_size=chunk_size,
+                    clean_strings=clean_strings,
+                    **kwargs,
+                )
+            else:
+                df_output = fuzzy_match(
+                    df_chunk,
+                    right,
+                    column_left,
+                    column_right,
+                    chunk_size=chunk_size,
+                    clean_strings=clean_strings,
+                    **kwargs,
+                )
+
+            matched = df_output.index.get_level_values(1).notna()
+            df_output = df_output.reset_index()
+
+            summary['rows_read'] += len(df_chunk)
+            summary['rows_matched'] += df_output.loc[matched, 'df_left_id'].nunique()
+            summary['matches'] += int(matched.sum())
+
+            # Write output
+            # NB: Empty output is skipped, as its columns can differ from those of
+            # non-empty output, e.g. where merge is True no columns from df_right are
+            # included
+            if df_output.empty:
+                continue
+
+            if str(path_output).endswith('.parquet'):
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                if writer is None:
+                    sources = {'match_string': pd.Series(right.values)}
+                    if merge:
+                        suffix = kwargs.get(
+                            'suffixes',
+                            inspect.signature(fuzzy_merge).parameters['suffixes'].default
+                        )[1]
+                        for col in right.frame.columns:
+                            sources.setdefault(str(col), right.frame[col])
+                            sources.setdefault(str(_add_suffix(col, suffix)), right.frame[col])
+
+                    table = pa.Table.from_pandas(df_output, preserve_index=False)
+                    table = table.cast(_fill_null_types(table.schema, sources))
+                    writer = pq.ParquetWriter(path_output, table.schema)
+                else:
+                    table = pa.Table.from_pandas(
+                        df_output, schema=writer.schema, preserve_index=False
+                    )
+                writer.write_table(table)
+            else:
+                df_output.to_csv(
+                    path_output,
+                    mode='a' if summary['rows_written'] > 0 else 'w',
+                    header=summary['rows_written'] == 0,
+                    index=False,
+                )
+
+            summary['rows_written'] += len(df_output)
+
+        # Write empty output where no rows were written
+        if summary['rows_written'] == 0 and df_output is not None:
+            if str(path_output).endswith('.parquet'):
+                df_output.to_parquet(path_output, index=False)
+            else:
+                df_output.to_csv(path_output, index=False)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return summary